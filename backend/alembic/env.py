@@ -26,7 +26,7 @@ logger = logging.getLogger("alembic.env")
 from app.models.base import Base  # noqa: E402
 from app.models import user, flight, ticket, company, company_manager  # noqa: F401,E402
 from app.models import banner, offer  # noqa: F401,E402
-from app.models import ticket_reminder  # noqa: F401,E402
+from app.models import ticket_reminder, notification, notification_counter, background_job, daily_metric  # noqa: F401,E402
 
 target_metadata = Base.metadata
 
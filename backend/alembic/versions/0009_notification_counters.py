@@ -0,0 +1,36 @@
+"""add notification_counters table (per-user unread counter)
+
+Revision ID: 0009_notification_counters
+Revises: 0008_ticket_reminders
+Create Date: 2025-10-08
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_notification_counters'
+down_revision: Union[str, None] = '0008_ticket_reminders'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_email', sa.String(length=255), primary_key=True),
+        sa.Column('unread', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # Backfill from existing notifications (emails normalized to lower case)
+    op.execute(
+        """
+        INSERT INTO notification_counters (user_email, unread)
+        SELECT lower(user_email), COUNT(*)
+        FROM notifications
+        WHERE read = false
+        GROUP BY lower(user_email)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_counters')
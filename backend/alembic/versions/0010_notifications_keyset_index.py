@@ -0,0 +1,26 @@
+"""composite (user_email, id DESC) index for notifications keyset pagination
+
+Revision ID: 0010_notifications_keyset_index
+Revises: 0009_notification_counters
+Create Date: 2025-10-08
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0010_notifications_keyset_index'
+down_revision: Union[str, None] = '0009_notification_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Serves list_notifications (before_id / since_id) and WS resume replay.
+    # The leading user_email column also covers the old single-column index, so drop it.
+    op.create_index('ix_notifications_user_email_id', 'notifications', ['user_email', sa.text('id DESC')])
+    op.drop_index('ix_notifications_user_email', table_name='notifications')
+
+
+def downgrade() -> None:
+    op.create_index('ix_notifications_user_email', 'notifications', ['user_email'])
+    op.drop_index('ix_notifications_user_email_id', table_name='notifications')
@@ -0,0 +1,99 @@
+"""partition notifications by month (created_at)
+
+Revision ID: 0011_notifications_partitioning
+Revises: 0010_notifications_keyset_index
+Create Date: 2025-10-09
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0011_notifications_partitioning'
+down_revision: Union[str, None] = '0010_notifications_keyset_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of the current one; later months are added by the retention job
+# (app.services.notification_retention.ensure_partitions).
+PARTITIONS_AHEAD = 2
+
+
+def upgrade() -> None:
+    # Postgres can't convert a table in place: rebuild it as a partitioned one.
+    op.execute("ALTER TABLE notifications RENAME TO notifications_legacy")
+    op.execute("ALTER INDEX IF EXISTS notifications_pkey RENAME TO notifications_legacy_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_notifications_user_email_id")
+    # Keep ids stable: the new table continues the existing sequence
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE notifications (
+            id INTEGER NOT NULL DEFAULT nextval('notifications_id_seq'),
+            user_email VARCHAR(255) NOT NULL,
+            type VARCHAR(64) NOT NULL,
+            message VARCHAR(1024) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() at time zone 'utc'),
+            read BOOLEAN NOT NULL DEFAULT false,
+            -- partition key must be part of the primary key
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id")
+    op.execute("CREATE TABLE notifications_default PARTITION OF notifications DEFAULT")
+    # One partition per month from the oldest row up to PARTITIONS_AHEAD months ahead
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            m date := date_trunc('month', COALESCE((SELECT min(created_at) FROM notifications_legacy), now()))::date;
+            last date := (date_trunc('month', now()) + interval '{PARTITIONS_AHEAD} months')::date;
+        BEGIN
+            WHILE m <= last LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF notifications FOR VALUES FROM (%L) TO (%L)',
+                    'notifications_p' || to_char(m, 'YYYYMM'), m, (m + interval '1 month')::date
+                );
+                m := (m + interval '1 month')::date;
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO notifications (id, user_email, type, message, created_at, read)
+        SELECT id, user_email, type, message, created_at, read FROM notifications_legacy
+        """
+    )
+    op.execute("DROP TABLE notifications_legacy")
+    # Partitioned index: created on every partition (existing and future)
+    op.execute("CREATE INDEX ix_notifications_user_email_id ON notifications (user_email, id DESC)")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE notifications RENAME TO notifications_partitioned")
+    op.execute("ALTER INDEX IF EXISTS notifications_pkey RENAME TO notifications_partitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_notifications_user_email_id")
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE notifications (
+            id INTEGER NOT NULL DEFAULT nextval('notifications_id_seq') PRIMARY KEY,
+            user_email VARCHAR(255) NOT NULL,
+            type VARCHAR(64) NOT NULL,
+            message VARCHAR(1024) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            read BOOLEAN NOT NULL DEFAULT false
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id")
+    op.execute(
+        """
+        INSERT INTO notifications (id, user_email, type, message, created_at, read)
+        SELECT id, user_email, type, message, created_at, read FROM notifications_partitioned
+        """
+    )
+    # Drops all partitions as well (detached archive tables are left untouched)
+    op.execute("DROP TABLE notifications_partitioned")
+    op.execute("CREATE INDEX ix_notifications_user_email_id ON notifications (user_email, id DESC)")
@@ -0,0 +1,34 @@
+"""add background_jobs table (job run statistics)
+
+Revision ID: 0012_background_jobs
+Revises: 0011_notifications_partitioning
+Create Date: 2025-10-10
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0012_background_jobs'
+down_revision: Union[str, None] = '0011_notifications_partitioning'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'background_jobs',
+        sa.Column('name', sa.String(length=64), primary_key=True),
+        sa.Column('instance', sa.String(length=255), nullable=True),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_duration_ms', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_ok', sa.Boolean(), nullable=False, server_default=sa.text('true')),
+        sa.Column('last_error', sa.String(length=500), nullable=True),
+        sa.Column('runs', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('failures', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_duration_ms', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('max_duration_ms', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('background_jobs')
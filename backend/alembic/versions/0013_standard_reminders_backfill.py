@@ -0,0 +1,36 @@
+"""backfill standard 24h/2h reminders (now created at purchase time)
+
+Revision ID: 0013_standard_reminders_backfill
+Revises: 0012_background_jobs
+Create Date: 2025-10-10
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0013_standard_reminders_backfill'
+down_revision: Union[str, None] = '0012_background_jobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # The periodic scan that used to create these is gone; fill the gaps for tickets bought before
+    op.execute(
+        """
+        INSERT INTO ticket_reminders (ticket_id, user_email, hours_before, type, scheduled_at, sent, created_at)
+        SELECT t.id, t.user_email, h.hours, 'standard', f.departure - h.hours * interval '1 hour', false, now() AT TIME ZONE 'utc'
+        FROM tickets t
+        JOIN flights f ON f.id = t.flight_id
+        CROSS JOIN (VALUES (24), (2)) AS h(hours)
+        WHERE t.status = 'paid'
+          AND f.departure - h.hours * interval '1 hour' > now() AT TIME ZONE 'utc'
+          AND NOT EXISTS (
+              SELECT 1 FROM ticket_reminders r
+              WHERE r.ticket_id = t.id AND r.type = 'standard' AND r.hours_before = h.hours
+          )
+        """
+    )
+
+
+def downgrade() -> None:
+    pass
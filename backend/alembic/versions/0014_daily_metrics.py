@@ -0,0 +1,55 @@
+"""add daily_metrics rollup (day x company) + backfill
+
+Revision ID: 0014_daily_metrics
+Revises: 0013_standard_reminders_backfill
+Create Date: 2025-10-11
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0014_daily_metrics'
+down_revision: Union[str, None] = '0013_standard_reminders_backfill'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_metrics',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('company_id', sa.Integer(), primary_key=True),  # 0 = no company
+        sa.Column('passengers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('flights', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('capacity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refunds', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # company stats filter by company first
+    op.create_index('ix_daily_metrics_company_day', 'daily_metrics', ['company_id', 'day'])
+    # Backfill (same query as `python -m app.services.daily_metrics rebuild`)
+    op.execute(
+        """
+        INSERT INTO daily_metrics (day, company_id, passengers, revenue, flights, capacity, refunds)
+        SELECT day, company_id, sum(passengers), sum(revenue), sum(flights), sum(capacity), sum(refunds)
+        FROM (
+            SELECT date(t.purchased_at) AS day, COALESCE(f.company_id, 0) AS company_id,
+                   count(*) FILTER (WHERE t.status = 'paid') AS passengers,
+                   COALESCE(sum(t.price_paid) FILTER (WHERE t.status = 'paid'), 0) AS revenue,
+                   0 AS flights, 0 AS capacity,
+                   count(*) FILTER (WHERE t.status = 'refunded') AS refunds
+            FROM tickets t JOIN flights f ON f.id = t.flight_id
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT date(departure), COALESCE(company_id, 0), 0, 0, count(*), COALESCE(sum(seats_total), 0), 0
+            FROM flights
+            GROUP BY 1, 2
+        ) x
+        GROUP BY day, company_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_metrics_company_day', table_name='daily_metrics')
+    op.drop_table('daily_metrics')
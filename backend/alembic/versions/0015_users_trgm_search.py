@@ -0,0 +1,25 @@
+"""pg_trgm GIN indexes for admin user search
+
+Revision ID: 0015_users_trgm_search
+Revises: 0014_daily_metrics
+Create Date: 2025-10-12
+"""
+from typing import Sequence, Union
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0015_users_trgm_search'
+down_revision: Union[str, None] = '0014_daily_metrics'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Serves ILIKE '%term%' on email / full_name in admin list_users (terms of 3+ chars)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_users_email_trgm', 'users', ['email'], postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+    op.create_index('ix_users_full_name_trgm', 'users', ['full_name'], postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_full_name_trgm', table_name='users')
+    op.drop_index('ix_users_email_trgm', table_name='users')
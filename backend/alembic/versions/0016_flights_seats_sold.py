@@ -0,0 +1,35 @@
+"""flights.seats_sold counter + stored revenue_est column
+
+Revision ID: 0016_flights_seats_sold
+Revises: 0015_users_trgm_search
+Create Date: 2025-10-12
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0016_flights_seats_sold'
+down_revision: Union[str, None] = '0015_users_trgm_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('flights', sa.Column('seats_sold', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        """
+        UPDATE flights f SET seats_sold = t.cnt
+        FROM (SELECT flight_id, count(*) AS cnt FROM tickets WHERE status = 'paid' GROUP BY flight_id) t
+        WHERE t.flight_id = f.id
+        """
+    )
+    op.add_column('flights', sa.Column('revenue_est', sa.Numeric(14, 2), sa.Computed('price * seats_sold', persisted=True)))
+    op.create_index('ix_flights_company_revenue_est', 'flights', ['company_id', 'revenue_est'])
+    op.create_index('ix_flights_revenue_est', 'flights', ['revenue_est'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flights_revenue_est', table_name='flights')
+    op.drop_index('ix_flights_company_revenue_est', table_name='flights')
+    op.drop_column('flights', 'revenue_est')
+    op.drop_column('flights', 'seats_sold')
@@ -0,0 +1,28 @@
+"""tickets (flight_id, status, confirmation_id) index for the passenger manifest
+
+Revision ID: 0017_tickets_manifest_index
+Revises: 0016_flights_seats_sold
+Create Date: 2025-10-13
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0017_tickets_manifest_index'
+down_revision: Union[str, None] = '0016_flights_seats_sold'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # Keyset pagination + confirmation_id / email prefix search in company list_passengers
+    op.create_index(
+        'ix_tickets_flight_status_confirmation',
+        'tickets',
+        ['flight_id', 'status', sa.text('confirmation_id COLLATE "C"')],
+        postgresql_include=['user_email'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tickets_flight_status_confirmation', table_name='tickets')
@@ -0,0 +1,28 @@
+"""flights.cancelled_at soft delete + partial search index
+
+Revision ID: 0018_flights_cancelled_at
+Revises: 0017_tickets_manifest_index
+Create Date: 2025-10-13
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0018_flights_cancelled_at'
+down_revision: Union[str, None] = '0017_tickets_manifest_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column('flights', sa.Column('cancelled_at', sa.DateTime(), nullable=True))
+    # Public search (origin/destination/date) skips cancelled flights
+    op.create_index(
+        'ix_flights_search_active', 'flights', ['origin', 'destination', 'departure'],
+        postgresql_where=sa.text('cancelled_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flights_search_active', table_name='flights')
+    op.drop_column('flights', 'cancelled_at')
@@ -0,0 +1,31 @@
+"""partial indexes for the hourly admin stats series
+
+Revision ID: 0019_stats_series_hourly_indexes
+Revises: 0018_flights_cancelled_at
+Create Date: 2025-10-14
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0019_stats_series_hourly_indexes'
+down_revision: Union[str, None] = '0018_flights_cancelled_at'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    # /admin/stats/series?granularity=hour groups raw purchase / departure times
+    op.create_index(
+        'ix_tickets_paid_purchased_at', 'tickets', ['purchased_at'],
+        postgresql_include=['price_paid'], postgresql_where=sa.text("status = 'paid'"),
+    )
+    op.create_index(
+        'ix_flights_departure_active', 'flights', ['departure'],
+        postgresql_include=['seats_total'], postgresql_where=sa.text('cancelled_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_flights_departure_active', table_name='flights')
+    op.drop_index('ix_tickets_paid_purchased_at', table_name='tickets')
@@ -1,4 +1,5 @@
-from typing import List, Tuple
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import jwt
@@ -7,35 +8,48 @@ from app.core.config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_roles(token: str = Depends(oauth2_scheme)) -> List[str]:
+
+@dataclass
+class Principal:
+    """Caller identity decoded once per request from the signed JWT.
+
+    company_ids is the token's claim (None when absent); use
+    app.services.manager_scope.manager_company_ids() to resolve a manager's companies.
+    """
+    email: str
+    roles: List[str] = field(default_factory=list)
+    company_ids: Optional[List[int]] = None
+    issued_at: float = 0.0
+
+
+def get_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    # FastAPI caches dependencies per request: roles checks and identity share this decode
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        sub = payload.get("sub")
+        if not sub:
+            raise ValueError("Missing subject")
         roles = payload.get("roles") or []
         if not isinstance(roles, list):
             roles = [roles]
-        return roles
+        claim = payload.get("company_ids")
+        company_ids = [int(c) for c in claim] if isinstance(claim, list) else None
+        return Principal(sub, roles, company_ids, float(payload.get("iat") or 0))
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+def get_current_roles(principal: Principal = Depends(get_principal)) -> List[str]:
+    return principal.roles
+
 def require_roles(*allowed: str):
     def checker(roles: List[str] = Depends(get_current_roles)):
         if not any(r in roles for r in allowed):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
     return checker
 
-def get_current_identity(token: str = Depends(oauth2_scheme)) -> Tuple[str, List[str]]:
+def get_current_identity(principal: Principal = Depends(get_principal)) -> Tuple[str, List[str]]:
     """Return (email, roles) from the JWT token.
 
-    (Keeping signature backward-compatible; company_ids can be fetched separately if needed.)
+    (Keeping signature backward-compatible; use get_principal for company_ids.)
     """
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        sub = payload.get("sub")
-        if not sub:
-            raise ValueError("Missing subject")
-        roles = payload.get("roles") or []
-        if not isinstance(roles, list):
-            roles = [roles]
-        return sub, roles
-    except Exception:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return principal.email, principal.roles
@@ -1,59 +1,87 @@
 from typing import List
 from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import Response
-from sqlalchemy import func
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, text, or_
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 from app.api.deps import require_roles
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.user import User
 from app.models.company import Company
 from app.models.flight import Flight
-from app.models.ticket import Ticket
 from app.models.company_manager import CompanyManager
+from app.models.daily_metric import DailyMetric
+from app.services.notification_ws import manager as ws_manager
+from app.models.background_job import BackgroundJob
+from app.services import loop_monitor, manager_scope, password_hashing, reminder_scheduler
+from app.services.jobs import runner as job_runner
+from app.services.ttl_cache import TTLCache
+from app.services.daily_metrics import stats_range
+from app.services.exports import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, stream_csv, stream_xlsx
 
 router = APIRouter(dependencies=[Depends(require_roles("admin"))])
 
 
+def _like_pattern(term: str) -> str:
+    # "/" as LIKE escape char (a backslash would need extra quoting in the ESCAPE literal)
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
 @router.get("/users", response_model=dict)
 def list_users(
     company_id: int | None = None,
     page: int = 1,
     page_size: int = 25,
     search: str | None = None,
+    after_id: int | None = Query(None, ge=0, description="Keyset cursor: return users with id > after_id (skips OFFSET and the total count)"),
+    with_total: bool = False,
     db: Session = Depends(get_db),
 ):
     """Paginated list of users.
 
+    Two modes:
+      - keyset (after_id given): next page after the last seen id; pass back next_after_id.
+        total/pages are only computed when with_total=true.
+      - page (legacy): OFFSET pagination with total count.
+
     Returns:
         items: current page of users (with companies list for managers)
-        total: total number of users under current filter
-        page, page_size, pages
+        total: total number of users under current filter (None in keyset mode without with_total)
+        page, page_size, pages, next_after_id (None on the last page)
     """
     page = max(page, 1)
     page_size = max(1, min(page_size, 200))  # cap upper bound
 
     q = db.query(User)
     if company_id is not None:
-        # Filter: only managers of the specified company (keep non-managers so list doesn't lose them)
-        # Logic: keep users who are not company_manager OR are managers of this company.
-        q = q.join(CompanyManager, isouter=True).filter(
-            (User.role != "company_manager") | (CompanyManager.company_id == company_id)
+        # Filter: only managers of the specified company (keep non-managers so list doesn't lose them).
+        # Semi-join (EXISTS) instead of an outer join: one row per user whatever the number of links.
+        managed = (
+            db.query(CompanyManager.id)
+            .filter(CompanyManager.user_id == User.id, CompanyManager.company_id == company_id)
+            .exists()
         )
-    if search:
-        s = f"%{search.strip()}%"
-        # ILIKE for PostgreSQL (fallback to lower() for other DBs)
-        try:
-            q = q.filter((User.email.ilike(s)) | (User.full_name.ilike(s)))
-        except AttributeError:
-            # SQLite fallback emulation
-            q = q.filter((func.lower(User.email).like(s.lower())) | (func.lower(User.full_name).like(s.lower())))
+        q = q.filter(or_(User.role != "company_manager", managed))
+    if search and search.strip():
+        # ILIKE '%term%' is served by the pg_trgm GIN indexes (migration 0015)
+        s = _like_pattern(search.strip())
+        q = q.filter(or_(User.email.ilike(s, escape="/"), User.full_name.ilike(s, escape="/")))
+
+    keyset = after_id is not None
+    total = None
+    if not keyset or with_total:
+        total = q.count()
+    if keyset:
+        q = q.filter(User.id > after_id)
     q = q.order_by(User.id.asc())
-
-    total = q.count()
-    offset = (page - 1) * page_size
-    users = q.offset(offset).limit(page_size).all()
+    if not keyset:
+        q = q.offset((page - 1) * page_size)
+    users = q.limit(page_size + 1).all()
+    has_more = len(users) > page_size
+    users = users[:page_size]
 
     # Preload only for managers on this page
     manager_user_ids = [u.id for u in users if u.role == "company_manager"]
@@ -80,8 +108,15 @@ def list_users(
             data["company_names"] = cnames
         items.append(data)
 
-    pages = (total + page_size - 1) // page_size if total else 1
-    return {"items": items, "total": total, "page": page, "page_size": page_size, "pages": pages}
+    pages = ((total + page_size - 1) // page_size if total else 1) if total is not None else None
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "pages": pages,
+        "next_after_id": users[-1].id if has_more and users else None,
+    }
 
 
 @router.get("/companies", response_model=List[dict])
@@ -93,90 +128,174 @@ def list_companies(db: Session = Depends(get_db)):
     ]
 
 
-@router.get("/stats", response_model=dict)
-def service_stats(range: str = "all", db: Session = Depends(get_db)):
-    def _time_range(name: str):
-        now = datetime.utcnow()
-        if name == "today":
-            start = datetime(now.year, now.month, now.day)
-            end = start + timedelta(days=1)
-        elif name == "week":
-            start = now - timedelta(days=7)
-            end = now
-        elif name == "month":
-            start = now - timedelta(days=30)
-            end = now
-        else:
-            return None, None
-        return start, end
-
-    users = db.query(func.count(User.id)).scalar() or 0
-    companies = db.query(func.count(Company.id)).scalar() or 0
-    flights_q = db.query(Flight)
-    start, end = _time_range(range)
-    if start and end:
-        flights_q = flights_q.filter(Flight.departure >= start, Flight.departure < end)
-    flights = flights_q.count()
+@router.get("/metrics/ws", response_model=dict)
+def ws_metrics():
+    """Live WebSocket metrics of this process: connections, messages/s, pending pushes, send latency."""
+    return ws_manager.snapshot()
+
+
+@router.get("/metrics/loop", response_model=dict)
+def loop_metrics():
+    """Event loop blocking time of this process (lag histogram in ms, stalls over LOOP_LAG_WARN_MS)."""
+    return loop_monitor.snapshot()
+
+
+@router.get("/metrics/reminders", response_model=dict)
+def reminder_metrics():
+    """Reminder drainer of this process: scheduling lag histogram (fire time - scheduled_at, s), batches."""
+    return reminder_scheduler.snapshot()
+
+
+@router.get("/metrics/password-hashing", response_model=dict)
+def password_hashing_metrics():
+    """Hashing pool of this process: workers, in-flight calls, 503 rejections."""
+    return password_hashing.snapshot()
+
+
+@router.get("/jobs", response_model=dict)
+def background_jobs(db: Session = Depends(get_db)):
+    """Background job runs (shared across workers) + leadership state of the serving process."""
+    rows = db.query(BackgroundJob).order_by(BackgroundJob.name.asc()).all()
+    return {
+        "process": job_runner.snapshot(),
+        "jobs": [
+            {
+                "name": r.name,
+                "instance": r.instance,
+                "last_started_at": r.last_started_at.isoformat() if r.last_started_at else None,
+                "last_duration_ms": r.last_duration_ms,
+                "last_ok": r.last_ok,
+                "last_error": r.last_error,
+                "runs": r.runs,
+                "failures": r.failures,
+                "avg_duration_ms": round(r.total_duration_ms / r.runs, 1) if r.runs else 0.0,
+                "max_duration_ms": r.max_duration_ms,
+            }
+            for r in rows
+        ],
+    }
+
 
+_stats_cache = TTLCache(settings.admin_stats_cache_seconds)
+
+
+def _day_bounds(start: datetime, end: datetime):
+    """[start, end) datetime range -> inclusive day range for daily_metrics."""
+    return start.date(), (end - timedelta(microseconds=1)).date()
+
+
+def _compute_service_stats(range: str, db: Session) -> dict:
     now = datetime.utcnow()
-    active_flights = db.query(func.count(Flight.id)).filter(Flight.departure > now).scalar() or 0
-    completed_flights = db.query(func.count(Flight.id)).filter(Flight.departure <= now).scalar() or 0
-
-    tickets_q = db.query(Ticket).filter(Ticket.status == "paid")
-    if start and end:
-        tickets_q = tickets_q.filter(Ticket.purchased_at >= start, Ticket.purchased_at < end)
-    passengers = tickets_q.count()  # paid tickets treated as passengers
-
-    sales_q = db.query(func.coalesce(func.sum(Ticket.price_paid), 0)).filter(Ticket.status == "paid")
-    if start and end:
-        sales_q = sales_q.filter(Ticket.purchased_at >= start, Ticket.purchased_at < end)
-    sales = sales_q.scalar()
-    # Seats capacity and sold for range (capacity over flights in range; sold = paid tickets in range)
-    seats_capacity_q = db.query(func.coalesce(func.sum(Flight.seats_total), 0))
-    if start and end:
-        seats_capacity_q = seats_capacity_q.filter(Flight.departure >= start, Flight.departure < end)
-    seats_capacity = seats_capacity_q.scalar() or 0
+    start, end = stats_range(range, now)
+
+    # 1) users, companies, active/completed flights in one pass over flights
+    f = db.query(
+        db.query(func.count(User.id)).scalar_subquery().label("users"),
+        db.query(func.count(Company.id)).scalar_subquery().label("companies"),
+        func.count(Flight.id).filter(Flight.departure > now, Flight.cancelled_at.is_(None)).label("active_flights"),
+        func.count(Flight.id).filter(Flight.departure <= now, Flight.cancelled_at.is_(None)).label("completed_flights"),
+    ).one()
+    # 2) range totals from the daily rollup (passengers = paid tickets = sold seats)
+    mq = db.query(
+        func.coalesce(func.sum(DailyMetric.flights), 0).label("flights"),
+        func.coalesce(func.sum(DailyMetric.capacity), 0).label("seats_capacity"),
+        func.coalesce(func.sum(DailyMetric.passengers), 0).label("passengers"),
+        func.coalesce(func.sum(DailyMetric.revenue), 0).label("sales"),
+    )
+    if start:
+        first, last = _day_bounds(start, end)
+        mq = mq.filter(DailyMetric.day >= first, DailyMetric.day <= last)
+    m = mq.one()
+
+    passengers = int(m.passengers or 0)
+    seats_capacity = int(m.seats_capacity or 0)
     seats_sold = passengers
     load_factor = float(seats_sold) / float(seats_capacity) if seats_capacity else 0.0
     return {
-        "users": users,
-        "companies": companies,
-        "flights": flights,
-        "active_flights": active_flights,
-        "completed_flights": completed_flights,
+        "users": int(f.users or 0),
+        "companies": int(f.companies or 0),
+        "flights": int(m.flights or 0),
+        "active_flights": int(f.active_flights or 0),
+        "completed_flights": int(f.completed_flights or 0),
         "passengers": passengers,
-        "seats_capacity": int(seats_capacity),
+        "seats_capacity": seats_capacity,
         "seats_sold": int(seats_sold),
         "load_factor": load_factor,
-        "revenue": float(sales or 0),
-        "total_sales": float(sales or 0),  # backward compatibility
+        "revenue": float(m.sales or 0),
+        "total_sales": float(m.sales or 0),  # backward compatibility
     }
 
 
+@router.get("/stats", response_model=dict)
+def service_stats(range: str = "all", db: Session = Depends(get_db)):
+    """Service-wide counters (two aggregate queries, range totals from daily_metrics),
+    cached per range for ADMIN_STATS_CACHE_SECONDS. today / week / month are the last
+    1 / 7 / 30 whole UTC days including today."""
+    key = range if range in ("today", "week", "month") else "all"
+    return dict(_stats_cache.get_or_load(key, lambda: _compute_service_stats(key, db)))
+
+
 @router.get("/stats/export")
 def export_service_stats(range: str = "all", fmt: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db)):
     data = service_stats(range, db)
-    rows = [["metric", "value"]] + [[k, str(v)] for k, v in data.items()]
+    rows = [["metric", "value"]] + [[k, v] for k, v in data.items()]
     if fmt == "csv":
-        import io, csv
-        buf = io.StringIO()
-        w = csv.writer(buf)
-        for r in rows: w.writerow(r)
-        out = buf.getvalue().encode("utf-8-sig")
-        return Response(out, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename=service_stats_{range}.csv"})
-    else:
-        import html
-        def esc(s: str): return html.escape(s, quote=True)
-        xml_rows = []
-        for r in rows:
-            xml_rows.append('<Row>' + ''.join(f'<Cell><Data ss:Type="String">{esc(c)}</Data></Cell>' for c in r) + '</Row>')
-        xml = (
-            "<?xml version=\"1.0\"?>"\
-            "<?mso-application progid=\"Excel.Sheet\"?>"\
-            "<Workbook xmlns=\"urn:schemas-microsoft-com:office:spreadsheet\" xmlns:ss=\"urn:schemas-microsoft-com:office:spreadsheet\">"\
-            "<Worksheet ss:Name=\"ServiceStats\"><Table>" + ''.join(xml_rows) + "</Table></Worksheet></Workbook>"
-        )
-        return Response(xml.encode('utf-8'), media_type='application/vnd.ms-excel', headers={"Content-Disposition": f"attachment; filename=service_stats_{range}.xml"})
+        return StreamingResponse(stream_csv(rows), media_type=CSV_MEDIA_TYPE, headers={"Content-Disposition": f"attachment; filename=service_stats_{range}.csv"})
+    return StreamingResponse(stream_xlsx(rows, "ServiceStats"), media_type=XLSX_MEDIA_TYPE, headers={"Content-Disposition": f"attachment; filename=service_stats_{range}.xlsx"})
+
+
+# Longest history (days) a series may cover per granularity; hour buckets come from raw tables
+_SERIES_MAX_DAYS = {"hour": 31, "day": 365, "week": 3650, "month": 3650}
+_SERIES_LABEL = {"hour": "YYYY-MM-DD\"T\"HH24:00", "day": "YYYY-MM-DD", "week": "YYYY-MM-DD", "month": "YYYY-MM"}
+
+# Buckets generated in the DB and left-joined to the aggregates -> gaps come back as zeros.
+# day/week/month roll up daily_metrics; hour needs the raw tickets/flights timestamps
+# (partial indexes ix_tickets_paid_purchased_at / ix_flights_departure_active).
+# :start / :end are the inclusive first / last day
+_SERIES_SQL_ROLLUP = text(
+    """
+    WITH buckets AS (
+        SELECT generate_series(date_trunc(:g, CAST(:start AS timestamp)), date_trunc(:g, CAST(:end AS timestamp)),
+                               CAST(:step AS interval)) AS b
+    ), agg AS (
+        SELECT date_trunc(:g, CAST(day AS timestamp)) AS b,
+               sum(passengers) AS passengers, sum(revenue) AS revenue,
+               sum(flights) AS flights, sum(capacity) AS seats_capacity
+        FROM daily_metrics
+        WHERE day >= CAST(:start AS date) AND day <= CAST(:end AS date)
+        GROUP BY 1
+    )
+    SELECT to_char(buckets.b, :label) AS label,
+           COALESCE(agg.passengers, 0) AS passengers, COALESCE(agg.revenue, 0) AS revenue,
+           COALESCE(agg.flights, 0) AS flights, COALESCE(agg.seats_capacity, 0) AS seats_capacity
+    FROM buckets LEFT JOIN agg ON agg.b = buckets.b
+    ORDER BY buckets.b
+    """
+)
+_SERIES_SQL_HOURLY = text(
+    """
+    WITH buckets AS (
+        SELECT generate_series(date_trunc('hour', CAST(:start AS timestamp)),
+                               date_trunc('hour', CAST(:end AS timestamp) - interval '1 microsecond'),
+                               interval '1 hour') AS b
+    ), t AS (
+        SELECT date_trunc('hour', purchased_at) AS b, count(*) AS passengers, sum(price_paid) AS revenue
+        FROM tickets
+        WHERE status = 'paid' AND purchased_at >= :start AND purchased_at < :end
+        GROUP BY 1
+    ), f AS (
+        SELECT date_trunc('hour', departure) AS b, count(*) AS flights, sum(seats_total) AS seats_capacity
+        FROM flights
+        WHERE cancelled_at IS NULL AND departure >= :start AND departure < :end
+        GROUP BY 1
+    )
+    SELECT to_char(buckets.b, :label) AS label,
+           COALESCE(t.passengers, 0) AS passengers, COALESCE(t.revenue, 0) AS revenue,
+           COALESCE(f.flights, 0) AS flights, COALESCE(f.seats_capacity, 0) AS seats_capacity
+    FROM buckets LEFT JOIN t ON t.b = buckets.b LEFT JOIN f ON f.b = buckets.b
+    ORDER BY buckets.b
+    """
+)
 
 
 @router.get("/stats/series", response_model=dict)
@@ -184,22 +303,28 @@ def service_stats_series(
     range: str = "week",
     metrics: str | None = None,
     granularity: str = "day",
-    limit_days: int = Query(180, ge=1, le=365),
+    limit_days: int = Query(180, ge=1),
     db: Session = Depends(get_db),
 ):
-    """Return a time series of service metrics aggregated by day.
+    """Return a time series of service metrics aggregated by hour/day/week/month.
 
     Parameters:
-        range: all|today|week|month (all = entire history but limited by limit_days)
+        range: all|today|week|month (last 1/7/30 whole UTC days incl. today; all = entire
+            history but limited by limit_days)
         metrics: comma separated list of metrics (passengers,revenue,flights,seats_sold,seats_capacity,load_factor)
-        granularity: currently only 'day' is supported
-        limit_days: maximum length of the series for range=all
+        granularity: hour|day|week|month (week buckets start on Monday)
+        limit_days: maximum length of the series for range=all; capped at 31 (hour),
+            365 (day) or 3650 (week, month) days
 
     Response format:
         { range, granularity, metrics:[...], points:[ { date:'YYYY-MM-DD', values:{metric: value,...}} ] }
+        (date is 'YYYY-MM-DDTHH:00' for hour, the bucket's Monday for week, 'YYYY-MM' for month)
+        Buckets are aligned to the granularity but only count data inside the range, so the
+        first bucket may be partial (e.g. range=month&granularity=month).
     """
-    if granularity != "day":
-        raise HTTPException(status_code=400, detail="only 'day' granularity supported")
+    if granularity not in _SERIES_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="granularity must be one of hour, day, week, month")
+    limit_days = min(limit_days, _SERIES_MAX_DAYS[granularity])
 
     allowed = ["passengers", "revenue", "flights", "seats_sold", "seats_capacity", "load_factor"]
     if metrics:
@@ -212,85 +337,39 @@ def service_stats_series(
 
     # Date range
     now = datetime.utcnow()
-    def _time_range(name: str):
-        if name == "today":
-            start = datetime(now.year, now.month, now.day)
-            end = start + timedelta(days=1)
-        elif name == "week":
-            start = now - timedelta(days=7)
-            end = now
-        elif name == "month":
-            start = now - timedelta(days=30)
-            end = now
-        else:
-            return None, None
-        return start, end
-
-    start, end = _time_range(range)
+    start, end = stats_range(range, now)
     # For range=all determine earliest data point
     if range == "all":
-        # Minimum timestamps across tickets and flights
-        min_ticket_dt = db.query(func.min(Ticket.purchased_at)).scalar()
-        min_flight_dt = db.query(func.min(Flight.departure)).scalar()
-        earliest = None
-        for dt in (min_ticket_dt, min_flight_dt):
-            if dt and (earliest is None or dt < earliest):
-                earliest = dt
+        earliest = db.query(func.min(DailyMetric.day)).scalar()
         if earliest is None:
             # No data
             return {"range": range, "granularity": granularity, "metrics": requested, "points": []}
-    # Enforce limit_days cap
-        if (now - earliest).days > limit_days:
-            start = now - timedelta(days=limit_days)
-        else:
-            start = earliest
+        earliest = datetime(earliest.year, earliest.month, earliest.day)
+        # Enforce limit_days cap
+        start = max(earliest, now - timedelta(days=limit_days))
         end = now
     if start is None or end is None:
         # Safety fallback (unexpected range value)
         start = now - timedelta(days=7)
         end = now
+    if granularity == "hour" and (end - start).days > limit_days:
+        start = end - timedelta(days=limit_days)
 
-    # Normalize to start of the day boundaries
-    start_day = datetime(start.year, start.month, start.day)
-    end_day = datetime(end.year, end.month, end.day)
-    if end_day < end:
-    # ensure current day included
-        end_day = end_day
-
-    # Ticket aggregation (passengers / seats_sold / revenue)
-    tickets_q = db.query(
-        func.date(Ticket.purchased_at).label("d"),
-        func.count(Ticket.id).label("passengers"),
-        func.coalesce(func.sum(Ticket.price_paid), 0).label("revenue"),
-    ).filter(Ticket.status == "paid", Ticket.purchased_at >= start_day, Ticket.purchased_at <= end)
-    tickets_rows = tickets_q.group_by(func.date(Ticket.purchased_at)).all()
-    tickets_map = {str(r.d): r for r in tickets_rows}
-
-    # Flight aggregation (flights / seats_capacity)
-    flights_q = db.query(
-        func.date(Flight.departure).label("d"),
-        func.count(Flight.id).label("flights"),
-        func.coalesce(func.sum(Flight.seats_total), 0).label("seats_capacity"),
-    ).filter(Flight.departure >= start_day, Flight.departure <= end)
-    flights_rows = flights_q.group_by(func.date(Flight.departure)).all()
-    flights_map = {str(r.d): r for r in flights_rows}
-
-    # Build list of days
-    days = []
-    cursor = start_day
-    # Inclusive up to end day
-    while cursor.date() <= end.date():
-        days.append(cursor.strftime("%Y-%m-%d"))
-        cursor = cursor + timedelta(days=1)
+    # [start, end) like the other stats; the rollup takes the inclusive day range
+    params = {"start": start, "end": end, "label": _SERIES_LABEL[granularity]}
+    if granularity == "hour":
+        rows = db.execute(_SERIES_SQL_HOURLY, params).all()
+    else:
+        first, last = _day_bounds(start, end)
+        params.update(start=first, end=last, g=granularity, step=f"1 {granularity}")
+        rows = db.execute(_SERIES_SQL_ROLLUP, params).all()
 
     points = []
-    for day in days:
-        tr = tickets_map.get(day)
-        fr = flights_map.get(day)
-        passengers_val = int(getattr(tr, "passengers", 0) or 0)
-        revenue_val = float(getattr(tr, "revenue", 0) or 0)
-        flights_val = int(getattr(fr, "flights", 0) or 0)
-        capacity_val = int(getattr(fr, "seats_capacity", 0) or 0)
+    for r in rows:
+        passengers_val = int(r.passengers or 0)
+        revenue_val = float(r.revenue or 0)
+        flights_val = int(r.flights or 0)
+        capacity_val = int(r.seats_capacity or 0)
         seats_sold_val = passengers_val  # paid tickets = sold seats
         load_factor_val = float(seats_sold_val) / capacity_val if capacity_val else 0.0
         values = {}
@@ -300,15 +379,15 @@ def service_stats_series(
         if "seats_sold" in requested: values["seats_sold"] = seats_sold_val
         if "seats_capacity" in requested: values["seats_capacity"] = capacity_val
         if "load_factor" in requested: values["load_factor"] = load_factor_val
-        points.append({"date": day, "values": values})
+        points.append({"date": r.label, "values": values})
 
     return {
         "range": range,
         "granularity": granularity,
         "metrics": requested,
         "points": points,
-        "from": days[0] if days else None,
-        "to": days[-1] if days else None,
+        "from": points[0]["date"] if points else None,
+        "to": points[-1]["date"] if points else None,
     }
 
 
@@ -374,6 +453,7 @@ def deactivate_company(company_id: int, db: Session = Depends(get_db)):
                 if u.role == 'company_manager':
                     u.role = 'user'
     db.commit()
+    manager_scope.invalidate_all()
     return {"status": "ok", "unassigned_managers": removed}
 
 
@@ -411,6 +491,7 @@ def delete_company(company_id: int, db: Session = Depends(get_db)):
                 if u.role == 'company_manager':
                     u.role = 'user'
     db.commit()
+    manager_scope.invalidate_all()
     return {"status": "deleted"}
 
 
@@ -432,6 +513,7 @@ def assign_manager(company_id: int, payload: dict, db: Session = Depends(get_db)
         link = CompanyManager(user_id=user.id, company_id=company.id)
         db.add(link)
     db.commit()
+    manager_scope.invalidate(email)
     return {"status": "ok"}
 
 
@@ -451,4 +533,5 @@ def unassign_manager(company_id: int, payload: dict, db: Session = Depends(get_d
         return {"status": "noop"}
     db.delete(link)
     db.commit()
+    manager_scope.invalidate(email)
     return {"status": "ok"}
@@ -2,73 +2,119 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.security import create_access_token
 from app.models.company_manager import CompanyManager
 from app.models.company import Company
 from app.core.config import settings
 from app.schemas.auth import Token, UserRegister, UserOut, UserLogin
 from app.db.session import get_db
 from app.models.user import User
+from app.services import password_hashing
 
 router = APIRouter()
 
 # NOTE: DB-backed implementation with auto-provision by email lists (dev-friendly)
 
-@router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    """Classic login: user must already exist (no auto-creation).
-    Returns 401 if:
-        - user not found
-        - password incorrect
-    Returns 403 if user is blocked.
-    """
-    email = form_data.username.lower().strip()
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    if not user.is_active:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is blocked")
-    if not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+def _busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many logins, retry shortly", headers={"Retry-After": "1"})
+
+
+def _load_login_user(db: Session, email: str):
+    """Plain row (not an ORM instance, nothing to lazy-load later); the transaction is ended
+    right away so the pooled connection isn't held idle while the password is checked."""
+    try:
+        return db.query(User.id, User.role, User.is_active, User.hashed_password).filter(User.email == email).first()
+    finally:
+        db.rollback()
+
+
+def _login_token(db: Session, user, email: str, new_hash: str | None) -> str:
+    if new_hash:
+        # rehash-on-login: hash parameters / scheme changed; compare-and-set in case of a concurrent password change
+        db.query(User).filter(User.id == user.id, User.hashed_password == user.hashed_password).update(
+            {User.hashed_password: new_hash}, synchronize_session=False
+        )
+        db.commit()
     company_ids: list[int] = []
     if user.role == "company_manager":
         links = db.query(CompanyManager).filter(CompanyManager.user_id == user.id).all()
         company_ids = [l.company_id for l in links]
-    access_token = create_access_token(subject=email, roles=[user.role], company_ids=company_ids)
-    return {"access_token": access_token, "token_type": "bearer"}
+    return create_access_token(subject=email, roles=[user.role], company_ids=company_ids)
 
-@router.post("/login-json", response_model=Token)
-def login_json(payload: UserLogin, db: Session = Depends(get_db)):
-    """JSON login with no auto-creation. Behavior identical to /login."""
-    email = payload.email.lower().strip()
-    user = db.query(User).filter(User.email == email).first()
+
+async def _login(db: Session, email: str, password: str) -> dict:
+    """Shared by /login and /login-json. DB work runs in the threadpool, the password check
+    in the hashing process pool, so a login storm doesn't hold threadpool slots; no DB
+    connection is checked out while the check is queued or running."""
+    try:
+        # full queue -> 503 before taking a DB connection at all
+        password_hashing.check_capacity()
+    except password_hashing.HashingBusy:
+        raise _busy()
+    user = await run_in_threadpool(_load_login_user, db, email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is blocked")
-    if not verify_password(payload.password, user.hashed_password):
+    try:
+        ok, new_hash = await password_hashing.verify(password, user.hashed_password)
+    except password_hashing.HashingBusy:
+        raise _busy()
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
-    company_ids: list[int] = []
-    if user.role == "company_manager":
-        links = db.query(CompanyManager).filter(CompanyManager.user_id == user.id).all()
-        company_ids = [l.company_id for l in links]
-    access_token = create_access_token(subject=email, roles=[user.role], company_ids=company_ids)
+    access_token = await run_in_threadpool(_login_token, db, user, email, new_hash)
     return {"access_token": access_token, "token_type": "bearer"}
 
+
+@router.post("/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    """Classic login: user must already exist (no auto-creation).
+    Returns 401 if:
+        - user not found
+        - password incorrect
+    Returns 403 if user is blocked, 503 if the password hashing queue is full.
+    """
+    return await _login(db, form_data.username.lower().strip(), form_data.password)
+
+@router.post("/login-json", response_model=Token)
+async def login_json(payload: UserLogin, db: Session = Depends(get_db)):
+    """JSON login with no auto-creation. Behavior identical to /login."""
+    return await _login(db, payload.email.lower().strip(), payload.password)
+
+def _email_registered(db: Session, email: str) -> bool:
+    try:
+        return db.query(User.id).filter(User.email == email).first() is not None
+    finally:
+        db.rollback()  # release the connection while the password is hashed
+
+
+def _create_user(db: Session, user: User) -> User:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
 @router.post("/register", response_model=UserOut)
-def register(payload: UserRegister, db: Session = Depends(get_db)):
+async def register(payload: UserRegister, db: Session = Depends(get_db)):
     email = payload.email.lower()
-    existing = db.query(User).filter(User.email == email).first()
-    if existing:
+    try:
+        password_hashing.check_capacity()
+    except password_hashing.HashingBusy:
+        raise _busy()
+    if await run_in_threadpool(_email_registered, db, email):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     role = "user"
     if email in [e.lower() for e in settings.admin_emails]:
         role = "admin"
     elif email in [e.lower() for e in settings.manager_emails]:
         role = "company_manager"
-    user = User(email=email, full_name=payload.full_name, hashed_password=get_password_hash(payload.password), role=role, is_active=True)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    try:
+        hashed = await password_hashing.hash_password(payload.password)
+    except password_hashing.HashingBusy:
+        raise _busy()
+    user = User(email=email, full_name=payload.full_name, hashed_password=hashed, role=role, is_active=True)
+    user = await run_in_threadpool(_create_user, db, user)
     return {"id": user.id, "email": user.email, "full_name": user.full_name, "role": user.role, "is_active": user.is_active}
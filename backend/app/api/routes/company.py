@@ -1,48 +1,37 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from typing import Optional
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from app.api.deps import require_roles, get_current_identity
-from app.db.session import get_db
+from app.api.deps import Principal, require_roles, get_principal
+from app.core.config import settings
+from app.db.session import get_db, SessionLocal
 from app.models.flight import Flight
 from app.models.company import Company
-from app.models.user import User
 from app.models.ticket import Ticket
-from app.models.notification import Notification
-from app.models.company_manager import CompanyManager
+from app.models.daily_metric import DailyMetric
 from app.services.notification_ws import manager as ws_manager
-from sqlalchemy import func
+from app.services.flight_notifications import cancel_flight, notify_paid_passengers, notify_passengers_of_flights, format_template, fan_out
+from app.services.reminder_scheduler import notify_reminder_scheduled, reschedule_flight_reminders, reschedule_reminders
+from app.services.manager_scope import manager_company_ids
+from app.services.daily_metrics import record_flight, stats_range
+from app.services import flight_bulk, flight_import
+from app.services.exports import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, stream_csv, stream_xlsx
+from sqlalchemy import func, or_, select
 from datetime import datetime, timedelta
+import json
 
 router = APIRouter(dependencies=[Depends(require_roles("company_manager", "admin"))])
 
 
-def _get_manager_company_ids(db: Session, email: str) -> list[int]:
-    """Return list of company ids for manager email."""
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
-        return []
-    links = db.query(CompanyManager).filter(CompanyManager.user_id == user.id).all()
-    if links:
-        return [l.company_id for l in links]
-    # Fallback legacy (single heuristic)
-    if user.full_name:
-        company = db.query(Company).filter(Company.name == user.full_name).first()
-        if company:
-            return [company.id]
-    fallback = db.query(Company).filter(Company.is_active == True).first()
-    return [fallback.id] if fallback else []
-
-
 @router.get("/flights", response_model=dict)
 def list_company_flights(
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=200),
     sort: str = Query("departure_asc"),
-    status: str = Query("all", pattern="^(all|active|completed)$"),
+    status: str = Query("all", pattern="^(all|active|completed|cancelled)$"),
     db: Session = Depends(get_db),
-    identity=Depends(get_current_identity)
+    principal: Principal = Depends(get_principal)
 ):
     """List flights with pagination and sorting.
 
@@ -51,17 +40,21 @@ def list_company_flights(
             seats_available_desc|seats_available_asc|created_desc|revenue_est_desc|revenue_est_asc
     (created_desc = surrogate by id descending.)
     """
-    email, roles = identity
+    roles = principal.roles
     if "admin" in roles:
         q = db.query(Flight)
     else:
-        company_ids = _get_manager_company_ids(db, email)
+        company_ids = manager_company_ids(db, principal)
         if not company_ids:
             return {"items": [], "total": 0, "page": page, "page_size": page_size, "pages": 1}
         q = db.query(Flight).filter(Flight.company_id.in_(company_ids))
 
-    # Filter by status (active = future, completed = past)
+    # Filter by status (active = future, completed = past, cancelled = soft-deleted; all = not cancelled)
     now = datetime.utcnow()
+    if status == "cancelled":
+        q = q.filter(Flight.cancelled_at.isnot(None))
+    else:
+        q = q.filter(Flight.cancelled_at.is_(None))
     if status == "active":
         q = q.filter(Flight.departure > now)
     elif status == "completed":
@@ -87,13 +80,10 @@ def list_company_flights(
     elif sort == "created_desc":
         q = q.order_by(Flight.id.desc())
     elif sort == "revenue_est_desc":
-    # seats_sold = seats_total - seats_available; estimate = price * (seats_total - seats_available)
-    # For sorting we use an expression; price Numeric -> could cast to float (optional)
-        rev_expr = (Flight.price * (Flight.seats_total - Flight.seats_available))
-        q = q.order_by(rev_expr.desc())
+        # revenue_est = price * seats_sold, stored generated column with an index
+        q = q.order_by(Flight.revenue_est.desc())
     elif sort == "revenue_est_asc":
-        rev_expr = (Flight.price * (Flight.seats_total - Flight.seats_available))
-        q = q.order_by(rev_expr.asc())
+        q = q.order_by(Flight.revenue_est.asc())
     else:
         q = q.order_by(Flight.departure.asc())
 
@@ -125,19 +115,21 @@ def list_company_flights(
             "seats_available": f.seats_available,
             "company_id": f.company_id,
             "company_name": company_map.get(f.company_id) if f.company_id else None,
-            # Add server-side revenue estimate (sold * price)
-            "revenue_est": float(f.price) * max(0, (f.seats_total - f.seats_available)),
+            "seats_sold": f.seats_sold,
+            # Server-side revenue estimate (sold * price), generated column
+            "revenue_est": float(f.revenue_est or 0),
+            "cancelled_at": f.cancelled_at.isoformat() if f.cancelled_at else None,
         })
     return {"items": items, "total": total, "page": page, "page_size": page_size, "pages": pages}
 
 
 @router.post("/flights", response_model=dict)
-def create_company_flight(payload: dict, db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
+def create_company_flight(payload: dict, db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    roles = principal.roles
     if "admin" in roles:
         raise HTTPException(status_code=403, detail="Admin cannot create flights via this endpoint")
     else:
-        company_ids = _get_manager_company_ids(db, email)
+        company_ids = manager_company_ids(db, principal)
         if not company_ids:
             raise HTTPException(status_code=400, detail="No company mapped for manager")
         company_id = company_ids[0]  # default create first company
@@ -154,15 +146,84 @@ def create_company_flight(payload: dict, db: Session = Depends(get_db), identity
         company_id=company_id,
     )
     db.add(f)
+    db.flush()
+    record_flight(db, f.id, +1)
     db.commit()
     db.refresh(f)
     return {"id": f.id}
 
 
+def _import_company_id(db: Session, principal: Principal, company_id: Optional[int]) -> int:
+    if "admin" in principal.roles:
+        raise HTTPException(status_code=403, detail="Admin cannot create flights via this endpoint")
+    company_ids = manager_company_ids(db, principal)
+    if not company_ids:
+        raise HTTPException(status_code=400, detail="No company mapped for manager")
+    if company_id is None:
+        return company_ids[0]
+    if company_id not in company_ids:
+        raise HTTPException(status_code=403, detail="Not your company")
+    return company_id
+
+
+def _run_import(db: Session, rows, company_id: int, atomic: bool) -> dict:
+    try:
+        report = flight_import.import_flights(db, rows, company_id, settings.flight_import_max_rows)
+        rolled_back = atomic and report.rejected > 0
+        if rolled_back:
+            db.rollback()
+            report.imported = 0
+        else:
+            db.commit()
+    except flight_import.ImportFileError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        db.rollback()
+        raise
+    return {**report.as_dict(), "rolled_back": rolled_back}
+
+
+@router.post("/flights/import", response_model=dict)
+def import_company_flights(
+    file: UploadFile = File(...),
+    fmt: str = Query("csv", pattern="^(csv|ndjson)$"),
+    company_id: Optional[int] = Query(None),
+    atomic: bool = Query(False, description="Roll back everything if any row is invalid"),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_principal),
+):
+    """Bulk create flights from a CSV / NDJSON upload (format: services/flight_import.py).
+
+    Valid rows are inserted in one transaction; the response lists rejected rows by line.
+    """
+    cid = _import_company_id(db, principal, company_id)
+    return _run_import(db, flight_import.iter_file_rows(file.file, fmt), cid, atomic)
+
+
+@router.post("/flights/import/schedule", response_model=dict)
+def import_company_schedule(
+    payload: dict,
+    company_id: Optional[int] = Query(None),
+    atomic: bool = Query(False),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_principal),
+):
+    """Create flights from recurring schedule specs: {"schedules": [spec, ...]} or a single spec.
+
+    Errors are reported per spec ("line" = 1-based spec number).
+    """
+    cid = _import_company_id(db, principal, company_id)
+    specs = payload.get("schedules") if "schedules" in payload else [payload]
+    if not isinstance(specs, list) or not all(isinstance(x, dict) for x in specs):
+        raise HTTPException(status_code=400, detail="schedules must be a list of objects")
+    return _run_import(db, flight_import.iter_schedule_rows(specs), cid, atomic)
+
+
 @router.put("/flights/{flight_id}", response_model=dict)
-def update_company_flight(flight_id: int, payload: dict, db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email) if "admin" not in roles else []
+def update_company_flight(flight_id: int, payload: dict, db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
     f = db.query(Flight).filter(Flight.id == flight_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
@@ -173,8 +234,11 @@ def update_company_flight(flight_id: int, payload: dict, db: Session = Depends(g
     if f.departure <= now:
         raise HTTPException(status_code=400, detail="Past flight cannot be edited")
 
-    # Determine sold (paid) tickets
-    sold = db.query(func.count(Ticket.id)).filter(Ticket.flight_id == f.id, Ticket.status == "paid").scalar() or 0
+    # Sold (paid) seats: denormalized counter, row locked so a concurrent purchase can't slip in
+    db.refresh(f, with_for_update=True)
+    if f.cancelled_at:
+        raise HTTPException(status_code=400, detail="Cancelled flight cannot be edited")
+    sold = f.seats_sold or 0
 
     # Rule: seats_total cannot be reduced below sold
     new_seats_total = payload.get("seats_total", f.seats_total)
@@ -182,11 +246,17 @@ def update_company_flight(flight_id: int, payload: dict, db: Session = Depends(g
         raise HTTPException(status_code=400, detail="seats_total cannot be less than already sold seats")
 
     changed_fields = {}
+    # Rollup: take the flight out of its old departure day / capacity, re-add it below
+    rollup_moves = any(k in payload and getattr(f, k) != payload[k] for k in ("departure", "seats_total"))
+    if rollup_moves:
+        record_flight(db, f.id, -1)
     editable_keys = ["airline", "flight_number", "origin", "destination", "departure", "arrival", "price", "seats_total"]
     for key in editable_keys:
         if key in payload and getattr(f, key) != payload[key]:
             changed_fields[key] = {"old": getattr(f, key), "new": payload[key]}
             setattr(f, key, payload[key])
+    if rollup_moves:
+        record_flight(db, f.id, +1)
 
     seats_available_changed = False
     if "seats_total" in changed_fields:
@@ -211,73 +281,102 @@ def update_company_flight(flight_id: int, payload: dict, db: Session = Depends(g
     # Restriction: price can only change for future flights (already ensured f.departure > now)
     # Direct setting of seats_available via payload is ignored; it's calculated above
 
+    first_due = None
+    if "departure" in changed_fields:
+        db.flush()
+        # Move all reminders of the flight with it (one UPDATE, same transaction)
+        first_due = reschedule_flight_reminders(db, f.id, now)
+
     db.commit()
+    notify_reminder_scheduled(first_due)
 
-    # If there are changes — create notifications for users with paid tickets
+    # If there are changes — notify users with paid tickets (one set-based statement, one row per user)
     if changed_fields:
-        tickets_paid = db.query(Ticket).filter(Ticket.flight_id == f.id, Ticket.status == "paid").all()
-        if tickets_paid:
-            # Build short description of changes
-            def fmt_val(v):
-                if hasattr(v, 'isoformat'):
-                    try:
-                        return v.isoformat()
-                    except:  # noqa
-                        return str(v)
-                return str(v)
-            summary_parts = []
-            for k, diff in changed_fields.items():
-                summary_parts.append(f"{k}: {fmt_val(diff['old'])} -> {fmt_val(diff['new'])}")
-            summary = ", ".join(summary_parts)[:900]
-            created_notifications: list[Notification] = []
-            # Group by user_email so we don't send one per ticket
-            from collections import defaultdict
-            by_user: dict[str, int] = defaultdict(int)
-            for t in tickets_paid:
-                by_user[t.user_email] += 1
-            for user_email, count in by_user.items():
-                suffix = "" if count == 1 else f" (tickets: {count})"
-                n = Notification(
-                    user_email=user_email,
-                    type="flight_update",
-                    message=f"Your flight {f.flight_number} was updated: {summary}{suffix}"
-                )
-                db.add(n)
-                created_notifications.append(n)
-            db.commit()
-            # Push via WebSocket (fire & forget)
-            import asyncio
-            async def _push():
-                for n in created_notifications:
-                    await ws_manager.send_to_user(n.user_email, {"type": "notification", "data": {
-                        "id": n.id,
-                        "type": n.type,
-                        "message": n.message,
-                        "created_at": n.created_at.isoformat(),
-                        "read": n.read,
-                    }})
-            try:
-                asyncio.create_task(_push())
-            except RuntimeError:
-                # If there's no current loop (e.g. in a sync Uvicorn worker context) — ignore
-                pass
+        # Build short description of changes
+        def fmt_val(v):
+            if hasattr(v, 'isoformat'):
+                try:
+                    return v.isoformat()
+                except:  # noqa
+                    return str(v)
+            return str(v)
+        summary_parts = []
+        for k, diff in changed_fields.items():
+            summary_parts.append(f"{k}: {fmt_val(diff['old'])} -> {fmt_val(diff['new'])}")
+        summary = ", ".join(summary_parts)[:900]
+        template = format_template(f"Your flight {f.flight_number} was updated: {summary}", "%2$s")
+        rows = notify_paid_passengers(db, f.id, "flight_update", template)
+        db.commit()
+        # WS push is handed to the background dispatcher; the request doesn't wait for it
+        fan_out(rows)
 
     # If seats_total or seats_available changed — push updated seats_available
     if "seats_total" in changed_fields or seats_available_changed:
-        import asyncio
-        try:
-            asyncio.create_task(ws_manager.broadcast({
-                "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": f.seats_available}
-            }))
-        except RuntimeError:
-            pass
+        ws_manager.dispatch(ws_manager.broadcast({
+            "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": f.seats_available}
+        }))
     return {"status": "ok", "changed": list(changed_fields.keys())}
 
 
+@router.post("/flights/bulk-update", response_model=dict)
+def bulk_update_company_flights(payload: dict, db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    """Reprice / reschedule / resize many future flights at once (format: services/flight_bulk.py).
+
+    One locked SELECT + one UPDATE; flights breaking the sold-seat / past-departure rules are
+    skipped and listed. Each affected passenger gets a single notification.
+    """
+    roles = principal.roles
+    company_ids = None if "admin" in roles else manager_company_ids(db, principal)
+    if company_ids is not None and not company_ids:
+        raise HTTPException(status_code=400, detail="No company mapped for manager")
+    try:
+        conds = flight_bulk.parse_filter(payload.get("filter"))
+        op = flight_bulk.parse_op(payload.get("op"))
+    except flight_bulk.BulkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    now = datetime.utcnow()
+    try:
+        result = flight_bulk.apply(db, conds, op, company_ids, now)
+    except flight_bulk.BulkError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    updated = result["updated"]
+    first_due = reschedule_reminders(db, updated, now) if op.shift_minutes else None
+    notify_rows = []
+    if updated:
+        if len(updated) == 1:
+            prefix = f"Your flight {result['rows'][0]['flight_number']} was updated: {op.describe()}"
+        else:
+            prefix = f"Your flights were updated: {op.describe()}"
+        template = format_template(prefix[:900], "%2$s")
+        notify_rows = notify_passengers_of_flights(db, updated, "flight_update", template)
+    db.commit()
+    notify_reminder_scheduled(first_due)
+    fan_out(notify_rows)
+
+    if op.seats_total is not None and result["rows"]:
+        seat_rows = [(r["id"], r["seats_available"]) for r in result["rows"]]
+
+        async def _broadcast_seats():
+            for fid, available in seat_rows:
+                await ws_manager.broadcast({"type": "flight_seats", "data": {"flight_id": fid, "seats_available": available}})
+
+        ws_manager.dispatch(_broadcast_seats())
+    return {
+        "status": "ok",
+        "matched": result["matched"],
+        "updated": len(updated),
+        "updated_ids": updated,
+        "skipped": result["skipped"],
+        "notified_users": len(notify_rows),
+    }
+
+
 @router.delete("/flights/{flight_id}", response_model=dict)
-def delete_company_flight(flight_id: int, db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email) if "admin" not in roles else []
+def delete_company_flight(flight_id: int, db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
     f = db.query(Flight).filter(Flight.id == flight_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
@@ -288,59 +387,35 @@ def delete_company_flight(flight_id: int, db: Session = Depends(get_db), identit
     if "admin" not in roles and f.departure <= now:
         raise HTTPException(status_code=400, detail="Past flight cannot be deleted")
 
-    # Find all paid tickets and mark refund + create notifications
-    tickets_paid = db.query(Ticket).filter(Ticket.flight_id == f.id, Ticket.status == "paid").all()
-    refund_count = 0
-    created_notifications: list[Notification] = []
-    from collections import defaultdict
-    user_ticket_counts: dict[str, int] = defaultdict(int)
-    for t in tickets_paid:
-        t.status = "refunded"
-        refund_count += 1
-        user_ticket_counts[t.user_email] += 1
-    for user_email, count in user_ticket_counts.items():
-        plural = "" if count == 1 else f" (tickets: {count})"
-        n = Notification(
-            user_email=user_email,
-            type="flight_cancel",
-            message=f"Your flight {f.flight_number} was cancelled. Tickets refunded: {count}{plural}."
-        )
-        db.add(n)
-        created_notifications.append(n)
-
-    db.delete(f)
+    # Soft delete: cancelled_at + set-based refund / notification (tickets keep their flight)
+    rows = cancel_flight(db, f.id, now)
+    if rows is None:
+        db.rollback()
+        return {"status": "cancelled", "refunded_tickets": 0}
+    refund_count = sum(int(r["tickets"]) for r in rows)
     db.commit()
-    # WS push
-    import asyncio
-    async def _push():
-        for n in created_notifications:
-            await ws_manager.send_to_user(n.user_email, {"type": "notification", "data": {
-                "id": n.id,
-                "type": n.type,
-                "message": n.message,
-                "created_at": n.created_at.isoformat(),
-                "read": n.read,
-            }})
-    try:
-        asyncio.create_task(_push())
-    except RuntimeError:
-        pass
-    return {"status": "deleted", "refunded_tickets": refund_count}
+    # WS push (background)
+    fan_out(rows)
+    ws_manager.dispatch(ws_manager.broadcast({"type": "flight_seats", "data": {"flight_id": f.id, "seats_available": 0}}))
+    return {"status": "cancelled", "refunded_tickets": refund_count}
 
 
 @router.post("/flights/{flight_id}/seats-adjust", response_model=dict)
-def adjust_seats(flight_id: int, delta: int = Query(..., ge=-1000, le=1000), db: Session = Depends(get_db), identity=Depends(get_current_identity)):
+def adjust_seats(flight_id: int, delta: int = Query(..., ge=-1000, le=1000), db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
     """Quick adjustment of available seats by delta (can be negative/positive).
     Rules: 0 <= seats_available+delta <= seats_total; also >= sold (paid).
     """
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email) if "admin" not in roles else []
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
     f = db.query(Flight).filter(Flight.id == flight_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
     if "admin" not in roles and company_ids and f.company_id not in company_ids:
         raise HTTPException(status_code=403, detail="Not your company flight")
-    sold = db.query(func.count(Ticket.id)).filter(Ticket.flight_id == f.id, Ticket.status == "paid").scalar() or 0
+    db.refresh(f, with_for_update=True)
+    if f.cancelled_at:
+        raise HTTPException(status_code=400, detail="Cancelled flight cannot be edited")
+    sold = f.seats_sold or 0
     new_value = f.seats_available + delta
     if new_value < 0:
         raise HTTPException(status_code=400, detail="Resulting seats_available would be negative")
@@ -353,168 +428,271 @@ def adjust_seats(flight_id: int, delta: int = Query(..., ge=-1000, le=1000), db:
     f.seats_available = new_value
     db.commit()
     # WS broadcast
-    import asyncio
-    try:
-        asyncio.create_task(ws_manager.broadcast({
-            "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": f.seats_available}
-        }))
-    except RuntimeError:
-        pass
+    ws_manager.dispatch(ws_manager.broadcast({
+        "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": f.seats_available}
+    }))
     return {"status": "ok", "seats_available": f.seats_available}
 
 
-@router.get("/flights/{flight_id}/passengers", response_model=List[dict])
-def list_passengers(flight_id: int, db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email) if "admin" not in roles else []
+def _manifest_stmt(flight_id: int, q: Optional[str], *columns):
+    """Paid tickets of a flight ordered by confirmation_id (ix_tickets_flight_status_confirmation).
+
+    q is a prefix of the confirmation id or of the passenger email.
+    """
+    conf = Ticket.confirmation_id.collate("C")
+    stmt = select(*columns).where(Ticket.flight_id == flight_id, Ticket.status == "paid")
+    if q and q.strip():
+        term = q.strip().replace("/", "//").replace("%", "/%").replace("_", "/_")
+        stmt = stmt.where(or_(
+            conf.like(term.upper() + "%", escape="/"),
+            Ticket.user_email.collate("C").like(term.lower() + "%", escape="/"),
+        ))
+    return stmt.order_by(conf)
+
+
+_MANIFEST_COLUMNS = (Ticket.confirmation_id, Ticket.purchased_at, Ticket.user_email, Ticket.status)
+
+
+def _passenger_item(t) -> dict:
+    return {
+        "confirmation_id": t.confirmation_id,
+        "purchased_at": t.purchased_at.isoformat() if t.purchased_at else None,
+        "user_email": t.user_email,
+        "status": t.status,
+    }
+
+
+@router.get("/flights/{flight_id}/passengers", response_model=dict)
+def list_passengers(
+    flight_id: int,
+    q: Optional[str] = Query(None, max_length=64, description="Prefix of confirmation id or email"),
+    after: Optional[str] = Query(None, max_length=32, description="Keyset cursor: last confirmation_id seen"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_principal),
+):
+    """One page of the manifest: {items, next_after}; pass next_after back as `after` (None on the last page)."""
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
     f = db.query(Flight).filter(Flight.id == flight_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
     if "admin" not in roles and company_ids and f.company_id not in company_ids:
         raise HTTPException(status_code=403, detail="Not your company flight")
-    tickets = db.query(Ticket).filter(Ticket.flight_id == flight_id, Ticket.status == "paid").all()
-    return [
-        {
-            "confirmation_id": t.confirmation_id,
-            "purchased_at": t.purchased_at.isoformat() if t.purchased_at else None,
-            "user_email": t.user_email,
-            "status": t.status,
-        }
-        for t in tickets
-    ]
+    stmt = _manifest_stmt(flight_id, q, *_MANIFEST_COLUMNS)
+    if after:
+        stmt = stmt.where(Ticket.confirmation_id.collate("C") > after)
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [_passenger_item(t) for t in rows],
+        "next_after": rows[-1].confirmation_id if has_more else None,
+    }
+
+
+def _passenger_ndjson(flight_id: int, q: Optional[str]):
+    """NDJSON chunks of the manifest through a server-side cursor (own session, like the export)."""
+    db = SessionLocal()
+    try:
+        stmt = _manifest_stmt(flight_id, q, *_MANIFEST_COLUMNS).execution_options(stream_results=True, yield_per=1000)
+        buf: list[str] = []
+        for t in db.execute(stmt):
+            buf.append(json.dumps(_passenger_item(t)))
+            if len(buf) >= 500:
+                yield ("\n".join(buf) + "\n").encode()
+                buf = []
+        if buf:
+            yield ("\n".join(buf) + "\n").encode()
+    finally:
+        db.close()
+
+
+@router.get("/flights/{flight_id}/passengers/stream")
+def stream_passengers(flight_id: int, q: Optional[str] = Query(None, max_length=64), db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    """Whole manifest as NDJSON, one passenger per line (large charters)."""
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
+    f = db.query(Flight).filter(Flight.id == flight_id).first()
+    if not f:
+        raise HTTPException(status_code=404, detail="Flight not found")
+    if "admin" not in roles and company_ids and f.company_id not in company_ids:
+        raise HTTPException(status_code=403, detail="Not your company flight")
+    return StreamingResponse(_passenger_ndjson(flight_id, q), media_type="application/x-ndjson")
+
+
+PASSENGER_EXPORT_COLUMNS = [
+    "confirmation_id",
+    "user_email",
+    "status",
+    "purchased_at",
+    "price_paid",
+    "company_name",
+    "origin",
+    "destination",
+]
+
+
+def _passenger_export_rows(flight_id: int, company_name: str, origin: str, destination: str):
+    """Header + paid tickets read through a server-side cursor.
+
+    Uses its own session: the response body is produced after the request's
+    dependency-scoped session is gone.
+    """
+    yield PASSENGER_EXPORT_COLUMNS
+    db = SessionLocal()
+    try:
+        stmt = _manifest_stmt(
+            flight_id, None,
+            Ticket.confirmation_id, Ticket.user_email, Ticket.status, Ticket.purchased_at, Ticket.price_paid,
+        ).execution_options(stream_results=True, yield_per=1000)
+        for t in db.execute(stmt):
+            yield [
+                t.confirmation_id,
+                t.user_email,
+                t.status,
+                t.purchased_at.isoformat() if t.purchased_at else "",
+                t.price_paid or 0,
+                company_name,
+                origin,
+                destination,
+            ]
+    finally:
+        db.close()
 
 
 @router.get("/flights/{flight_id}/passengers/export")
-def export_passengers(flight_id: int, fmt: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email) if "admin" not in roles else []
+def export_passengers(flight_id: int, fmt: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    roles = principal.roles
+    company_ids = manager_company_ids(db, principal) if "admin" not in roles else []
     f = db.query(Flight).filter(Flight.id == flight_id).first()
     if not f:
         raise HTTPException(status_code=404, detail="Flight not found")
     if "admin" not in roles and company_ids and f.company_id not in company_ids:
         raise HTTPException(status_code=403, detail="Not your company flight")
-    tickets = db.query(Ticket).filter(Ticket.flight_id == flight_id, Ticket.status == "paid").all()
     # Additional fields: company and route (origin, destination)
     company_name = db.query(Company.name).filter(Company.id == f.company_id).scalar() if f.company_id else ""
-    rows = [
-        [
-            "confirmation_id",
-            "user_email",
-            "status",
-            "purchased_at",
-            "price_paid",
-            "company_name",
-            "origin",
-            "destination",
-        ],
-    ]
-    for t in tickets:
-        rows.append([
-            t.confirmation_id,
-            t.user_email,
-            t.status,
-            t.purchased_at.isoformat() if t.purchased_at else "",
-            str(t.price_paid or 0),
-            company_name,
-            f.origin,
-            f.destination,
-        ])
+    rows = _passenger_export_rows(flight_id, company_name or "", f.origin, f.destination)
+    # Streamed: bounded memory, first bytes go out before the whole manifest is read
     if fmt == "csv":
-        import io, csv
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerows(rows)
-        data = buf.getvalue().encode("utf-8-sig")
         filename = f"passengers_f{flight_id}.csv"
-        return Response(data, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={filename}"})
-    else:  # xlsx minimal (SpreadsheetML XML) – no external dependencies
-        # Very simple XML (Excel will open). For a full XLSX you need zip + sheets, but here we
-        # use the "XML Spreadsheet 2003" format.
-        def esc(s: str):
-            import html
-            return html.escape(s, quote=True)
-        cells_xml = []
-        for r in rows:
-            cells = ''.join([f'<Cell><Data ss:Type="String">{esc(c)}</Data></Cell>' for c in r])
-            cells_xml.append(f"<Row>{cells}</Row>")
-        xml = (
-            "<?xml version=\"1.0\"?>"\
-            "<?mso-application progid=\"Excel.Sheet\"?>"\
-            "<Workbook xmlns=\"urn:schemas-microsoft-com:office:spreadsheet\" xmlns:ss=\"urn:schemas-microsoft-com:office:spreadsheet\">"\
-            "<Worksheet ss:Name=\"Passengers\"><Table>" + ''.join(cells_xml) + "</Table></Worksheet></Workbook>"
-        )
-        data = xml.encode("utf-8")
-        filename = f"passengers_f{flight_id}.xml"  # xml extension, Excel will open
-        return Response(data, media_type="application/vnd.ms-excel", headers={"Content-Disposition": f"attachment; filename={filename}"})
-
-
-def _time_range(filter_name: str):
-    now = datetime.utcnow()
-    if filter_name == "today":
-        start = datetime(now.year, now.month, now.day)
-        end = start + timedelta(days=1)
-    elif filter_name == "week":
-        start = now - timedelta(days=7)
-        end = now
-    elif filter_name == "month":
-        start = now - timedelta(days=30)
-        end = now
-    else:  # all
-        return None, None
-    return start, end
+        return StreamingResponse(stream_csv(rows), media_type=CSV_MEDIA_TYPE, headers={"Content-Disposition": f"attachment; filename={filename}"})
+    filename = f"passengers_f{flight_id}.xlsx"
+    return StreamingResponse(stream_xlsx(rows, "Passengers"), media_type=XLSX_MEDIA_TYPE, headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @router.get("/stats", response_model=dict)
-def company_stats(range: str = "all", db: Session = Depends(get_db), identity=Depends(get_current_identity)):
-    email, roles = identity
-    company_ids = _get_manager_company_ids(db, email)
-    if "admin" in roles:
-        # aggregate for all companies (admin perspective) - reuse structure
-        company_ids = [c.id for c in db.query(Company).all()]
-    if not company_ids:
+def company_stats(range: str = "all", db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    """range: all | today | week | month (last 1 / 7 / 30 whole UTC days including today)."""
+    roles = principal.roles
+    # Admin: aggregate over all companies (flights with a company) without listing their ids
+    company_ids = None if "admin" in roles else manager_company_ids(db, principal)
+    if company_ids is not None and not company_ids:
         return {"flights": 0, "active": 0, "completed": 0, "passengers": 0, "revenue": 0.0, "seats_capacity": 0, "seats_sold": 0, "load_factor": 0.0}
-    start, end = _time_range(range)
+    start, end = stats_range(range, datetime.utcnow())
 
-    fq = db.query(Flight).filter(Flight.company_id.in_(company_ids))
-    if start and end:
-        fq = fq.filter(Flight.departure >= start, Flight.departure < end)
-    flights_total = fq.count()
-
-    # Seats capacity for flights in selected range
-    seats_capacity = db.query(func.coalesce(func.sum(Flight.seats_total), 0)).filter(Flight.company_id.in_(company_ids))
+    now = datetime.utcnow()
+    fq = db.query(
+        func.count(Flight.id).filter(Flight.departure > now).label("active"),
+        func.count(Flight.id).filter(Flight.departure <= now).label("completed"),
+    ).filter(Flight.cancelled_at.is_(None))
+    fq = fq.filter(Flight.company_id.isnot(None)) if company_ids is None else fq.filter(Flight.company_id.in_(company_ids))
+    fl = fq.one()
+
+    # Range totals from the daily rollup (paid tickets = passengers = seats sold)
+    mq = db.query(
+        func.coalesce(func.sum(DailyMetric.flights), 0).label("flights"),
+        func.coalesce(func.sum(DailyMetric.capacity), 0).label("seats_capacity"),
+        func.coalesce(func.sum(DailyMetric.passengers), 0).label("passengers"),
+        func.coalesce(func.sum(DailyMetric.revenue), 0).label("revenue"),
+    )
+    # company_id 0 = flights without a company
+    mq = mq.filter(DailyMetric.company_id != 0) if company_ids is None else mq.filter(DailyMetric.company_id.in_(company_ids))
     if start and end:
-        seats_capacity = seats_capacity.filter(Flight.departure >= start, Flight.departure < end)
-    seats_capacity = seats_capacity.scalar() or 0
-
+        mq = mq.filter(DailyMetric.day >= start.date(), DailyMetric.day <= (end - timedelta(microseconds=1)).date())
+    m = mq.one()
+    seats_capacity = int(m.seats_capacity or 0)
+    passengers = int(m.passengers or 0)
+    seats_sold = passengers
+    load_factor = float(seats_sold) / float(seats_capacity) if seats_capacity else 0.0
+    return {"flights": int(m.flights or 0), "active": int(fl.active or 0), "completed": int(fl.completed or 0), "passengers": passengers, "revenue": float(m.revenue or 0), "seats_capacity": seats_capacity, "seats_sold": int(seats_sold), "load_factor": load_factor}
+
+
+@router.get("/stats/breakdown", response_model=dict)
+def company_stats_breakdown(range: str = "all", db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
+    """Per-company stats (all companies for admin, own companies for a manager) in one statement:
+    companies LEFT JOIN (flights grouped by company) LEFT JOIN (daily_metrics grouped by company)."""
+    roles = principal.roles
+    company_ids = None if "admin" in roles else manager_company_ids(db, principal)
+    if company_ids is not None and not company_ids:
+        return {"range": range, "items": []}
+    start, end = stats_range(range, datetime.utcnow())
     now = datetime.utcnow()
-    active = db.query(Flight).filter(Flight.company_id.in_(company_ids), Flight.departure > now).count()
-    completed = db.query(Flight).filter(Flight.company_id.in_(company_ids), Flight.departure <= now).count()
 
-    tq = db.query(Ticket).join(Flight, Ticket.flight_id == Flight.id).filter(Flight.company_id.in_(company_ids), Ticket.status == "paid")
-    if start and end:
-        tq = tq.filter(Ticket.purchased_at >= start, Ticket.purchased_at < end)
-    passengers = tq.count()
-    revenue = db.query(func.coalesce(func.sum(Ticket.price_paid), 0)).join(Flight, Ticket.flight_id == Flight.id).filter(Flight.company_id.in_(company_ids), Ticket.status == "paid")
-    if start and end:
-        revenue = revenue.filter(Ticket.purchased_at >= start, Ticket.purchased_at < end)
-    revenue = revenue.scalar() or 0
-    # Seats sold (paid tickets) in selected range
-    seats_sold_q = db.query(func.count(Ticket.id)).join(Flight, Ticket.flight_id == Flight.id).filter(Flight.company_id.in_(company_ids), Ticket.status == "paid")
+    fq = db.query(
+        Flight.company_id.label("company_id"),
+        func.count(Flight.id).filter(Flight.departure > now).label("active"),
+        func.count(Flight.id).filter(Flight.departure <= now).label("completed"),
+    ).filter(Flight.cancelled_at.is_(None))
+    mq = db.query(
+        DailyMetric.company_id.label("company_id"),
+        func.sum(DailyMetric.flights).label("flights"),
+        func.sum(DailyMetric.capacity).label("seats_capacity"),
+        func.sum(DailyMetric.passengers).label("passengers"),
+        func.sum(DailyMetric.revenue).label("revenue"),
+    )
+    if company_ids is not None:
+        # the outer IN is not pushed through the GROUP BY: filter inside, or a manager
+        # request aggregates every airline's flights / metrics
+        fq = fq.filter(Flight.company_id.in_(company_ids))
+        mq = mq.filter(DailyMetric.company_id.in_(company_ids))
     if start and end:
-        seats_sold_q = seats_sold_q.filter(Ticket.purchased_at >= start, Ticket.purchased_at < end)
-    seats_sold = seats_sold_q.scalar() or 0
-    load_factor = float(seats_sold) / float(seats_capacity) if seats_capacity else 0.0
-    return {"flights": flights_total, "active": active, "completed": completed, "passengers": passengers, "revenue": float(revenue), "seats_capacity": int(seats_capacity), "seats_sold": int(seats_sold), "load_factor": load_factor}
+        mq = mq.filter(DailyMetric.day >= start.date(), DailyMetric.day <= (end - timedelta(microseconds=1)).date())
+    fl = fq.group_by(Flight.company_id).subquery()
+    m = mq.group_by(DailyMetric.company_id).subquery()
+
+    q = (
+        db.query(
+            Company.id, Company.name,
+            func.coalesce(m.c.flights, 0).label("flights"),
+            func.coalesce(fl.c.active, 0).label("active"),
+            func.coalesce(fl.c.completed, 0).label("completed"),
+            func.coalesce(m.c.passengers, 0).label("passengers"),
+            func.coalesce(m.c.revenue, 0).label("revenue"),
+            func.coalesce(m.c.seats_capacity, 0).label("seats_capacity"),
+        )
+        .outerjoin(fl, fl.c.company_id == Company.id)
+        .outerjoin(m, m.c.company_id == Company.id)
+    )
+    if company_ids is not None:
+        q = q.filter(Company.id.in_(company_ids))
+    items = []
+    for r in q.order_by(Company.name.asc(), Company.id.asc()).all():
+        capacity = int(r.seats_capacity)
+        sold = int(r.passengers)  # paid tickets = seats sold
+        items.append({
+            "company_id": r.id,
+            "company_name": r.name,
+            "flights": int(r.flights),
+            "active": int(r.active),
+            "completed": int(r.completed),
+            "passengers": sold,
+            "revenue": float(r.revenue),
+            "seats_capacity": capacity,
+            "seats_sold": sold,
+            "load_factor": float(sold) / float(capacity) if capacity else 0.0,
+        })
+    return {"range": range, "items": items}
 
 
 @router.get("/info", response_model=dict)
-def company_info(db: Session = Depends(get_db), identity=Depends(get_current_identity)):
+def company_info(db: Session = Depends(get_db), principal: Principal = Depends(get_principal)):
     """Return list of companies (id, name) accessible to current manager or all for admin."""
-    email, roles = identity
+    roles = principal.roles
     if "admin" in roles:
         companies = db.query(Company).all()
     else:
-        ids = _get_manager_company_ids(db, email)
+        ids = manager_company_ids(db, principal)
         if not ids:
             return {"companies": []}
         companies = db.query(Company).filter(Company.id.in_(ids)).all()
@@ -6,6 +6,9 @@ from app.db.session import get_db
 from app.models.flight import Flight
 from app.models.company import Company
 from app.api.deps import require_roles
+from app.services.daily_metrics import record_flight
+from app.services.flight_notifications import cancel_flight, fan_out
+from app.services.reminder_scheduler import notify_reminder_scheduled, reschedule_flight_reminders
 from datetime import datetime
 
 router = APIRouter()
@@ -37,7 +40,8 @@ def list_flights(
     stops_min: int | None = Query(None, ge=0),
     stops_max: int | None = Query(None, ge=0),
 ):
-    q = db.query(Flight)
+    # Cancelled flights never show up in search (partial index ix_flights_search_active)
+    q = db.query(Flight).filter(Flight.cancelled_at.is_(None))
     if origin:
         q = q.filter(Flight.origin == origin)
     if destination:
@@ -199,6 +203,7 @@ def flight_detail(flight_id: int, db: Session = Depends(get_db)):
         "duration_minutes": duration_minutes,
         "company_name": company_name,
         "layovers": [],  # placeholder for future implementation
+        "cancelled_at": f.cancelled_at.isoformat() if f.cancelled_at else None,
     }
 
 @router.post("/", dependencies=[Depends(require_roles("company_manager", "admin"))])
@@ -219,6 +224,8 @@ def create_flight(payload: dict, db: Session = Depends(get_db)):
     except Exception:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload")
     db.add(f)
+    db.flush()
+    record_flight(db, f.id, +1)
     db.commit()
     db.refresh(f)
     return {"id": f.id}
@@ -228,6 +235,12 @@ def update_flight(flight_id: int, payload: dict, db: Session = Depends(get_db)):
     f = db.get(Flight, flight_id)
     if not f:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if f.cancelled_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cancelled flight cannot be edited")
+    # daily_metrics: move the flight to its new departure day / capacity
+    rollup_moves = "departure" in payload or "seats_total" in payload
+    if rollup_moves:
+        record_flight(db, f.id, -1)
     for key in ["airline", "flight_number", "origin", "destination"]:
         if key in payload:
             setattr(f, key, payload[key])
@@ -246,7 +259,15 @@ def update_flight(flight_id: int, payload: dict, db: Session = Depends(get_db)):
         if val < 0:
             raise HTTPException(status_code=400, detail="stops must be >= 0")
         f.stops = val
+    if rollup_moves:
+        record_flight(db, f.id, +1)
+    first_due = None
+    if "departure" in payload:
+        db.flush()
+        # Move all reminders of the flight with it (one UPDATE, same transaction)
+        first_due = reschedule_flight_reminders(db, f.id, datetime.utcnow())
     db.commit()
+    notify_reminder_scheduled(first_due)
     return {"status": "ok"}
 
 @router.delete("/{flight_id}", dependencies=[Depends(require_roles("company_manager", "admin"))])
@@ -254,6 +275,8 @@ def delete_flight(flight_id: int, db: Session = Depends(get_db)):
     f = db.get(Flight, flight_id)
     if not f:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
-    db.delete(f)
+    # Same soft delete as the company endpoint: tickets are refunded, the row stays
+    rows = cancel_flight(db, f.id, datetime.utcnow())
     db.commit()
-    return {"status": "deleted"}
+    fan_out(rows or [])
+    return {"status": "cancelled", "refunded_tickets": sum(int(r["tickets"]) for r in rows or [])}
@@ -1,17 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Request
+from fastapi.responses import StreamingResponse
+import asyncio
 import logging
+import json
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.api.deps import get_current_identity
 from app.models.notification import Notification
-from app.services.notification_ws import manager
+from app.services.notification_ws import manager, notification_frame, StreamSubscriber
+from app.services.notification_counters import get_unread, decrement_unread, reset_unread, push_unread
 from app.core.security import decode_access_token
+from app.core.config import settings
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
+# Upper bound for events replayed to a reconnecting socket; beyond that the client refetches the list
+RESUME_REPLAY_LIMIT = 200
+
+def _load_missed(email: str, resume: int) -> list[Notification]:
+    db = SessionLocal()
+    try:
+        return (
+            db.query(Notification)
+            .filter(Notification.user_email == email, Notification.id > resume)
+            .order_by(Notification.id.asc())
+            .limit(RESUME_REPLAY_LIMIT)
+            .all()
+        )
+    finally:
+        db.close()
+
+async def _client_loop(websocket: WebSocket, email: str, ws_manager=manager):
+    """Read client frames (always JSON text) until disconnect. Any frame proves liveness
+    for the heartbeat; {"type": "ping"} is answered with a pong and
+    {"type": "hello", "encoding": "json|deflate|msgpack"} switches the frame encoding."""
+    while True:
+        raw = await websocket.receive_text()
+        ws_manager.touch(websocket)
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(msg, dict):
+            continue
+        if msg.get("type") == "ping":
+            await ws_manager.send_direct(email, websocket, {"type": "pong"})
+        elif msg.get("type") == "hello":
+            enc = ws_manager.set_encoding(websocket, msg.get("encoding"))
+            await ws_manager.send_direct(email, websocket, {"type": "hello_ack", "encoding": enc})
+
+async def _replay_missed(websocket: WebSocket, email: str, resume: int | None, ws_manager=manager):
+    """Replay notifications created while the client was offline.
+
+    `resume` is the highest notification id the client has seen. Ends with a
+    {"type": "resume"} frame; `truncated` tells the client to refetch the list instead.
+    """
+    if resume is None:
+        return
+    missed = await run_in_threadpool(_load_missed, email, resume)
+    for n in missed:
+        await ws_manager.send_direct(email, websocket, notification_frame(n))
+    token = missed[-1].id if missed else resume
+    await ws_manager.send_direct(email, websocket, {"type": "resume", "data": {
+        "token": token, "replayed": len(missed), "truncated": len(missed) >= RESUME_REPLAY_LIMIT,
+    }})
+
 class NotificationOut(BaseModel):
     id: int
     type: str
@@ -26,16 +83,36 @@ class NotificationMark(BaseModel):
     read: bool
 
 @router.get("/", response_model=list[NotificationOut])
-def list_notifications(db: Session = Depends(get_db), identity=Depends(get_current_identity)):
+def list_notifications(
+    before_id: int | None = Query(None, ge=1, description="Older page: rows with id < before_id"),
+    since_id: int | None = Query(None, ge=0, description="Incremental sync: only rows with id > since_id"),
+    limit: int = Query(200, ge=1, le=200),
+    db: Session = Depends(get_db),
+    identity=Depends(get_current_identity),
+):
+    """Newest-first notifications with keyset pagination on id.
+
+    - no params: latest `limit` rows (previous behavior)
+    - since_id: what's new since the client's newest known id (usually 0-1 rows)
+    - before_id: next (older) page
+    Served by the (user_email, id DESC) index.
+    """
     email, _roles = identity
-    items = db.query(Notification).filter(Notification.user_email == email.lower()).order_by(Notification.created_at.desc()).limit(200).all()
-    return items
+    q = db.query(Notification).filter(Notification.user_email == email.lower())
+    if since_id is not None:
+        q = q.filter(Notification.id > since_id)
+    if before_id is not None:
+        q = q.filter(Notification.id < before_id)
+    return q.order_by(Notification.id.desc()).limit(limit).all()
 
 @router.get("/unread-count", response_model=dict)
 def unread_count(db: Session = Depends(get_db), identity=Depends(get_current_identity)):
+    """Unread counter (O(1) lookup in notification_counters, COUNT(*) fallback only if the row is missing).
+
+    Clients with an open WebSocket receive {"type": "unread_count"} pushes and don't need to poll.
+    """
     email, _roles = identity
-    count = db.query(Notification).filter(Notification.user_email == email, Notification.read == False).count()
-    return {"unread": count}
+    return {"unread": get_unread(db, email)}
 
 @router.post("/{notif_id}/read")
 def mark_notification(notif_id: int, db: Session = Depends(get_db), identity=Depends(get_current_identity)):
@@ -43,15 +120,15 @@ def mark_notification(notif_id: int, db: Session = Depends(get_db), identity=Dep
     n = db.query(Notification).filter(Notification.id == notif_id, Notification.user_email == email.lower()).first()
     if not n:
         raise HTTPException(status_code=404, detail="Not found")
-    n.read = True
+    unread = None
+    if not n.read:
+        n.read = True
+        unread = decrement_unread(db, email)
     db.commit()
     # WS push
-    import asyncio
-    try:
-        from app.services.notification_ws import manager as ws_manager  # local import to avoid circular
-        asyncio.create_task(ws_manager.send_to_user(email.lower(), {"type": "notification_read", "data": {"id": n.id}}))
-    except RuntimeError:
-        pass
+    manager.dispatch(manager.send_to_user(email.lower(), {"type": "notification_read", "data": {"id": n.id}}))
+    if unread is not None:
+        push_unread({email.lower(): unread}, {email.lower(): -1})
     return {"status": "ok"}
 
 
@@ -59,24 +136,90 @@ def mark_notification(notif_id: int, db: Session = Depends(get_db), identity=Dep
 def mark_all_read(db: Session = Depends(get_db), identity=Depends(get_current_identity)):
     """Пометить все уведомления пользователя прочитанными."""
     email, _roles = identity
-    db.query(Notification).filter(Notification.user_email == email.lower(), Notification.read == False).update({Notification.read: True})  # type: ignore
+    changed = db.query(Notification).filter(Notification.user_email == email.lower(), Notification.read == False).update({Notification.read: True})  # type: ignore
+    reset_unread(db, email)
     db.commit()
-    import asyncio
-    try:
-        from app.services.notification_ws import manager as ws_manager
-        asyncio.create_task(ws_manager.send_to_user(email.lower(), {"type": "notification_mark_all", "data": {}}))
-    except RuntimeError:
-        pass
+    manager.dispatch(manager.send_to_user(email.lower(), {"type": "notification_mark_all", "data": {}}))
+    push_unread({email.lower(): 0}, {email.lower(): -int(changed or 0)})
     return {"status": "ok"}
 
 
+def _sse_event(payload: dict) -> str:
+    lines = []
+    if payload.get("type") == "notification" and isinstance(payload.get("data"), dict) and payload["data"].get("id"):
+        # Notification id = Last-Event-ID the browser sends back on reconnect
+        lines.append(f"id: {payload['data']['id']}")
+    lines.append(f"event: {payload.get('type', 'message')}")
+    lines.append("data: " + json.dumps(payload.get("data", payload), ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/stream")
+async def notifications_stream(
+    request: Request,
+    token: str | None = Query(None, description="Access token (EventSource can't send headers)"),
+    topics: str = Query("notifications,seats", description="Comma separated: notifications, seats"),
+    last_event_id: int | None = Query(None, ge=0, description="Resume point if the Last-Event-ID header can't be used"),
+):
+    """Server-Sent Events stream: a read-only alternative to the WebSocket for kiosks / status boards.
+
+    Same events and routing as the WS (NotificationConnectionManager); `event:` is the
+    WS message type, `data:` its data. Resume: Last-Event-ID header (or ?last_event_id=)
+    replays missed notifications from the table. Keep-alive comments every SSE_KEEPALIVE_SECONDS.
+    """
+    if not token:
+        auth_header = request.headers.get("authorization")
+        if auth_header and auth_header.lower().startswith("bearer "):
+            token = auth_header.split(None, 1)[1].strip()
+    try:
+        email = (decode_access_token(token or "").get("sub") or "").lower()
+    except Exception:
+        email = ""
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    resume = last_event_id
+    header_id = request.headers.get("last-event-id")
+    if header_id and header_id.isdigit():
+        resume = int(header_id)
+    wanted = {t.strip() for t in topics.split(",")} & set(StreamSubscriber.TOPICS) or {"notifications"}
+    # Subscribe before replaying so nothing falls in between (client de-duplicates by id)
+    sub = manager.subscribe(email, wanted)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            if resume is not None and "notifications" in wanted:
+                for n in await run_in_threadpool(_load_missed, email, resume):
+                    yield _sse_event(notification_frame(n))
+            while not sub.overflowed:
+                if await request.is_disconnected():
+                    break
+                try:
+                    payload = await asyncio.wait_for(sub.queue.get(), timeout=max(1, settings.sse_keepalive_seconds))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(payload)
+            # overflowed -> close; the browser reconnects with Last-Event-ID and replays from the table
+        finally:
+            manager.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.websocket("/ws/notifications")
-async def websocket_notifications(websocket: WebSocket, token: str | None = Query(None)):
+async def websocket_notifications(websocket: WebSocket, token: str | None = Query(None), resume: int | None = Query(None, ge=0), encoding: str | None = Query(None)):
     """WebSocket для мгновенных уведомлений.
     Клиент передаёт access token в query (?token=...). Мы декодируем email.
+    Переподключение: ?resume=<последний известный id уведомления> — сервер досылает
+    пропущенные уведомления из таблицы и завершает их кадром {"type": "resume"}.
     Сообщения сервер шлёт в формате:
       {"type": "notification", "data": { NotificationOut }}
-    Дополнительно возможно будущее: unread_count diff, ping/pong.
+      {"type": "unread_count", "data": {"unread": N, "delta": d}}  (после любого изменения счётчика)
+    Heartbeat: сервер шлёт {"type": "ping"}, клиент отвечает {"type": "pong"} (любой кадр
+    считается признаком жизни); молчащие соединения закрываются с кодом 4408.
+    Кодирование кадров: ?encoding=json|deflate|msgpack или первое сообщение
+    {"type": "hello", "encoding": ...} (см. app.services.ws_encoding).
     """
     # Попытка декодировать токен
     logger = logging.getLogger("notifications.ws")
@@ -101,13 +244,11 @@ async def websocket_notifications(websocket: WebSocket, token: str | None = Quer
 
     logger.debug("WS connect email=%s", email)
 
-    await manager.connect(email, websocket)
+    await manager.connect(email, websocket, encoding or "json")
     try:
-        while True:
-            # Ожидаем входящих сообщений (пока не нужны) — поддерживаем ping от клиента
-            _ = await websocket.receive_text()
-            # Можно реализовать простую эхо-реакцию / ping.
-            # Сейчас игнорируем.
+        await _replay_missed(websocket, email, resume)
+        # Входящие: pong на серверный ping (heartbeat), ping и hello от клиента
+        await _client_loop(websocket, email)
     except WebSocketDisconnect:
         await manager.disconnect(email, websocket)
     except Exception:
@@ -124,7 +265,7 @@ from app.services.notification_ws import manager as _alias_manager
 from fastapi import WebSocket as _WebSocket, WebSocketDisconnect as _WebSocketDisconnect, Query as _Query
 
 @router.websocket("/alias/ws/notifications")  # mounted under /notifications -> /notifications/alias/ws/notifications
-async def websocket_notifications_internal_alias(websocket: _WebSocket, token: str | None = _Query(None)):
+async def websocket_notifications_internal_alias(websocket: _WebSocket, token: str | None = _Query(None), resume: int | None = _Query(None, ge=0), encoding: str | None = _Query(None)):
     # Not intended for external use, internal alias kept for compatibility if path rewriting needed later.
     try:
         if not token:
@@ -140,10 +281,10 @@ async def websocket_notifications_internal_alias(websocket: _WebSocket, token: s
             await websocket.close(code=4401); return
     except Exception:
         await websocket.close(code=4401); return
-    await _alias_manager.connect(email, websocket)
+    await _alias_manager.connect(email, websocket, encoding or "json")
     try:
-        while True:
-            _ = await websocket.receive_text()
+        await _replay_missed(websocket, email, resume, _alias_manager)
+        await _client_loop(websocket, email, _alias_manager)
     except _WebSocketDisconnect:
         await _alias_manager.disconnect(email, websocket)
     except Exception:
@@ -12,8 +12,10 @@ from app.models.notification import Notification
 from app.models.ticket_reminder import TicketReminder
 from datetime import timedelta
 from app.api.deps import get_current_identity
-from app.services.notification_ws import manager as ws_manager
-import asyncio
+from app.services.notification_ws import manager as ws_manager, notification_frame
+from app.services.notification_counters import bump_unread, push_unread
+from app.services.reminder_scheduler import create_standard_reminders, notify_reminder_scheduled
+from app.services.daily_metrics import record_purchase, record_refund
 
 router = APIRouter()
 
@@ -50,6 +52,8 @@ def create_ticket(payload: CreateTicketBody, db: Session = Depends(get_db), iden
     flight = db.get(Flight, flight_id)
     if not flight:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Flight not found")
+    if flight.cancelled_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Flight is cancelled")
 
     # Atomic seat decrement (Postgres) using UPDATE ... WHERE ... RETURNING to avoid race conditions
     dialect_name = db.bind.dialect.name if db.bind else ""
@@ -57,8 +61,9 @@ def create_ticket(payload: CreateTicketBody, db: Session = Depends(get_db), iden
         text(
             """
             UPDATE flights
-            SET seats_available = seats_available - :qty
-            WHERE id = :fid AND seats_available >= :qty
+            SET seats_available = seats_available - :qty,
+                seats_sold = seats_sold + :qty
+            WHERE id = :fid AND seats_available >= :qty AND cancelled_at IS NULL
             RETURNING seats_available
             """
         ),
@@ -88,22 +93,28 @@ def create_ticket(payload: CreateTicketBody, db: Session = Depends(get_db), iden
         )
         db.add(ticket)
         confirmations.append(ticket)
+    db.flush()
+    # Standard 24h/2h reminders are created with the purchase (same transaction)
+    first_due = create_standard_reminders(db, confirmations, flight.departure, now)
+    record_purchase(db, flight.company_id, now, qty, float(price_snapshot) * qty)
     # Notification (one aggregated notification if multiple seats)
     msg = f"Purchase confirmed: {qty} seat(s) on flight {flight.flight_number} {flight.origin}->{flight.destination}"
     notif = Notification(user_email=email.lower(), type="purchase", message=msg, read=False)
     db.add(notif)
+    unread = bump_unread(db, {email.lower(): 1})
     db.commit()
+    ws_manager.dispatch(ws_manager.send_to_user(email.lower(), notification_frame(notif)))
+    push_unread(unread, {email.lower(): 1})
+    # Standard reminders may be due sooner than the scheduler's next wakeup
+    notify_reminder_scheduled(first_due)
     confirmation_ids = [t.confirmation_id for t in confirmations]
     result = {"confirmation_ids": confirmation_ids, "quantity": qty}
     if qty == 1:
         result["confirmation_id"] = confirmation_ids[0]
     # Push обновлённых seats
-    try:
-        asyncio.create_task(ws_manager.broadcast({
-            "type": "flight_seats", "data": {"flight_id": flight_id, "seats_available": flight.seats_available}
-        }))
-    except RuntimeError:
-        pass
+    ws_manager.dispatch(ws_manager.broadcast({
+        "type": "flight_seats", "data": {"flight_id": flight_id, "seats_available": flight.seats_available}
+    }))
     return result
 
 @router.get("/my")
@@ -156,6 +167,7 @@ def my_tickets(
                 "departure": f.departure.isoformat(),
                 "arrival": f.arrival.isoformat(),
                 "stops": f.stops,
+                "cancelled_at": f.cancelled_at.isoformat() if f.cancelled_at else None,
             }
         rems = []
         for r in reminders_map.get(t.id, []):
@@ -224,18 +236,28 @@ def cancel_ticket(confirmation_id: str, db: Session = Depends(get_db), identity=
     if time_left < timedelta(hours=24):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot cancel within 24 hours of departure")
     # Early cancellation: return seat & mark refunded
-    # Возвращаем место
-    f.seats_available += 1
-    # TODO: при наличии отдельного ws канала обновления рейсов можно пушить изменение seats_available
+    # Возвращаем место (атомарно, вместе со счётчиком проданных мест)
+    seats_available = db.execute(
+        text(
+            """
+            UPDATE flights
+            SET seats_available = seats_available + 1,
+                seats_sold = GREATEST(seats_sold - 1, 0)
+            WHERE id = :fid
+            RETURNING seats_available
+            """
+        ),
+        {"fid": f.id},
+    ).scalar_one()
     t.status = "refunded"
+    record_refund(db, f.company_id, t.purchased_at, float(t.price_paid))
+    # Pending reminders of a refunded ticket must not fire
+    db.query(TicketReminder).filter(TicketReminder.ticket_id == t.id, TicketReminder.sent == False).delete(synchronize_session=False)  # noqa: E712
     db.commit()
     # broadcast seats update
-    try:
-        asyncio.create_task(ws_manager.broadcast({
-            "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": f.seats_available}
-        }))
-    except RuntimeError:
-        pass
+    ws_manager.dispatch(ws_manager.broadcast({
+        "type": "flight_seats", "data": {"flight_id": f.id, "seats_available": seats_available}
+    }))
     return {"status": t.status}
 
 class ReminderCreateBody(BaseModel):
@@ -263,6 +285,7 @@ def set_custom_reminder(confirmation_id: str, body: ReminderCreateBody, db: Sess
     r = TicketReminder(ticket_id=t.id, user_email=email.lower(), hours_before=body.hours_before, type="custom", scheduled_at=sched_at)
     db.add(r)
     db.commit(); db.refresh(r)
+    notify_reminder_scheduled(r.scheduled_at)
     return {"id": r.id, "hours_before": r.hours_before, "scheduled_at": r.scheduled_at.isoformat(), "type": r.type}
 
 @router.delete("/{confirmation_id}/reminder/{reminder_id}")
@@ -20,6 +20,35 @@ class Settings(BaseSettings):
     seed_manager_email: Optional[str] = Field(default=None, alias="SEED_MANAGER_EMAIL")
     seed_manager_password: Optional[str] = Field(default=None, alias="SEED_MANAGER_PASSWORD")
     seed_update_passwords: bool = Field(default=False, alias="SEED_UPDATE_PASSWORDS")
+    # Notifications retention (monthly partitions of `notifications`, see notification_retention service)
+    notification_retention_days: int = Field(default=180, alias="NOTIFICATION_RETENTION_DAYS", description="Read notifications older than this are purged; 0 disables purging")
+    notification_retention_mode: str = Field(default="drop", alias="NOTIFICATION_RETENTION_MODE", description="drop | archive (keep detached partition as notifications_archive_YYYYMM)")
+    notification_partitions_ahead: int = Field(default=2, alias="NOTIFICATION_PARTITIONS_AHEAD")
+    notification_retention_interval_minutes: int = Field(default=360, alias="NOTIFICATION_RETENTION_INTERVAL_MINUTES")
+    # WebSocket heartbeat: server pings every interval; sockets silent for interval + timeout are reaped
+    ws_ping_interval_seconds: int = Field(default=25, alias="WS_PING_INTERVAL_SECONDS")
+    ws_ping_timeout_seconds: int = Field(default=10, alias="WS_PING_TIMEOUT_SECONDS")
+    ws_max_connections_per_user: int = Field(default=5, alias="WS_MAX_CONNECTIONS_PER_USER")
+    # SSE (/notifications/stream): keep-alive comment interval instead of WS pings
+    sse_keepalive_seconds: int = Field(default=15, alias="SSE_KEEPALIVE_SECONDS")
+    # Event loop lag monitor (see services/loop_monitor.py)
+    loop_lag_interval_ms: int = Field(default=500, alias="LOOP_LAG_INTERVAL_MS")
+    loop_lag_warn_ms: int = Field(default=100, alias="LOOP_LAG_WARN_MS")
+    # Background jobs: one leader process (Postgres advisory lock) runs the scheduler / retention
+    job_leader_poll_seconds: int = Field(default=15, alias="JOB_LEADER_POLL_SECONDS", description="How often followers try to take over leadership (failover delay)")
+    # Reminder scheduler: due reminders are fired in batches until the queue is empty or the budget is spent
+    reminder_batch_size: int = Field(default=500, alias="REMINDER_BATCH_SIZE")
+    reminder_drain_budget_ms: int = Field(default=2000, alias="REMINDER_DRAIN_BUDGET_MS", description="Max DB time per drain pass; the rest continues right after pushing frames")
+    reminder_max_sleep_seconds: int = Field(default=60, alias="REMINDER_MAX_SLEEP_SECONDS", description="Longest scheduler sleep / load window; bounds the delay for reminders created in non-leader workers")
+    # Admin stats cache (/admin/stats)
+    admin_stats_cache_seconds: int = Field(default=10, alias="ADMIN_STATS_CACHE_SECONDS", description="TTL of the cached /admin/stats result per range; 0 disables")
+    # Manager company scope (JWT company_ids claim / per-process cache, services/manager_scope.py)
+    manager_scope_cache_seconds: int = Field(default=60, alias="MANAGER_SCOPE_CACHE_SECONDS", description="How long a manager's company ids (JWT claim or DB lookup) are trusted without re-reading company_managers; 0 disables")
+    # Bulk flight import (services/flight_import.py)
+    flight_import_max_rows: int = Field(default=100_000, alias="FLIGHT_IMPORT_MAX_ROWS", description="Upper bound of rows per bulk flight import request")
+    # Password hashing process pool (services/password_hashing.py)
+    password_hash_workers: int = Field(default=2, alias="PASSWORD_HASH_WORKERS", description="Processes hashing/verifying passwords; 0 = hash in the request threadpool")
+    password_hash_queue_max: int = Field(default=32, alias="PASSWORD_HASH_QUEUE_MAX", description="Hash calls running or waiting per process before auth routes answer 503")
 
     class Config:
         # Load env from backend/.env regardless of CWD
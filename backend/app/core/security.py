@@ -15,8 +15,10 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def create_access_token(subject: str | Any, roles: list[str], expires_delta: Optional[timedelta] = None, company_ids: list[int] | None = None) -> str:
-    expire = datetime.now(tz=timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
-    to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "roles": roles}
+    now = datetime.now(tz=timezone.utc)
+    expire = now + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
+    # iat lets the server ignore company_ids claims issued before a manager mapping change
+    to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "iat": now, "roles": roles}
     if company_ids:
         to_encode["company_ids"] = company_ids
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
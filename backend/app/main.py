@@ -4,6 +4,10 @@ import os
 from pathlib import Path
 from fastapi.middleware.cors import CORSMiddleware
 from app.services.reminder_scheduler import reminder_loop
+from app.services.notification_retention import retention_loop
+from app.services.loop_monitor import loop_lag_monitor
+from app.services.jobs import runner as job_runner
+from app.services import password_hashing
 
 from app.api.router import api_router
 from app.core.config import settings
@@ -97,6 +101,17 @@ def startup():
     if settings.env.lower() in {"dev", "development"}:
         seed_demo_data()
     try:
-        asyncio.create_task(reminder_loop())
+        # Scheduler / retention run only in the leader process (advisory lock), see services/jobs.py
+        job_runner.register("reminders", reminder_loop)
+        job_runner.register("notification_retention", retention_loop)
+        job_runner.register("loop_lag_monitor", loop_lag_monitor, leader_only=False)
+        asyncio.create_task(job_runner.run())
     except Exception:
         pass
+    # Password hashing workers (spawned now, not on the first login)
+    asyncio.create_task(password_hashing.start())
+
+
+@app.on_event("shutdown")
+def shutdown():
+    password_hashing.shutdown()
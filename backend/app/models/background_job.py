@@ -0,0 +1,20 @@
+from sqlalchemy import String, Integer, Boolean, DateTime, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+from app.models.base import Base
+
+class BackgroundJob(Base):
+    """Aggregated run statistics per background job (one row per job, upserted after each run)."""
+    __tablename__ = "background_jobs"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    instance: Mapped[str | None] = mapped_column(String(255), nullable=True)  # host:pid of the last runner
+    last_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_duration_ms: Mapped[int] = mapped_column(Integer, default=0)
+    last_ok: Mapped[bool] = mapped_column(Boolean, default=True)
+    last_error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    runs: Mapped[int] = mapped_column(BigInteger, default=0)
+    failures: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_duration_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    max_duration_ms: Mapped[int] = mapped_column(Integer, default=0)
@@ -0,0 +1,23 @@
+from sqlalchemy import Integer, Date, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import date
+
+from app.models.base import Base
+
+class DailyMetric(Base):
+    """Per-day, per-company rollup maintained incrementally by the write paths
+    (see services/daily_metrics.py).
+
+    passengers / revenue / refunds are keyed by the ticket purchase day (refunds = tickets
+    bought that day and refunded later); flights / capacity by the flight departure day.
+    company_id 0 = flights without a company.
+    """
+    __tablename__ = "daily_metrics"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    company_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    passengers: Mapped[int] = mapped_column(Integer, default=0)
+    revenue: Mapped[float] = mapped_column(Numeric(14, 2), default=0)
+    flights: Mapped[int] = mapped_column(Integer, default=0)
+    capacity: Mapped[int] = mapped_column(Integer, default=0)
+    refunds: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Numeric
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Numeric, Computed, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -6,6 +6,18 @@ from app.models.base import Base
 
 class Flight(Base):
     __tablename__ = "flights"
+    # revenue_est sorts in the company dashboard (migration 0016)
+    __table_args__ = (
+        Index("ix_flights_company_revenue_est", "company_id", "revenue_est"),
+        Index("ix_flights_revenue_est", "revenue_est"),
+        # Public search only sees flights that aren't cancelled (migration 0018)
+        Index("ix_flights_search_active", "origin", "destination", "departure", postgresql_where=text("cancelled_at IS NULL")),
+        # Hourly admin stats series: flights by departure hour (migration 0019)
+        Index(
+            "ix_flights_departure_active", "departure",
+            postgresql_include=["seats_total"], postgresql_where=text("cancelled_at IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     airline: Mapped[str] = mapped_column(String(120))
@@ -17,6 +29,12 @@ class Flight(Base):
     price: Mapped[float] = mapped_column(Numeric(10, 2))
     seats_total: Mapped[int] = mapped_column(Integer)
     seats_available: Mapped[int] = mapped_column(Integer)
+    # Paid tickets, maintained by purchase / cancel / refund (services/seat_counters.py checks & repairs)
+    seats_sold: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Stored generated column: price * seats_sold (read-only for the ORM)
+    revenue_est: Mapped[float] = mapped_column(Numeric(14, 2), Computed("price * seats_sold", persisted=True))
+    # Soft delete: set when the flight is cancelled (tickets refunded); the row stays for ticket history
+    cancelled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     company_id: Mapped[int | None] = mapped_column(ForeignKey("companies.id"), nullable=True)
     # Number of stopovers (0 = direct flight). Used for filtering.
     stops: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Boolean, DateTime
+from sqlalchemy import Integer, String, Boolean, DateTime, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -6,10 +6,14 @@ from app.models.base import Base
 
 class Notification(Base):
     __tablename__ = "notifications"
+    # Partitioned by month on created_at (migration 0011): the DB primary key is (id, created_at),
+    # id alone stays unique (single sequence) so the ORM keeps using it as identity.
+    # Keyset pagination / since_id sync (see migration 0010)
+    __table_args__ = (Index("ix_notifications_user_email_id", "user_email", text("id DESC")),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_email: Mapped[str] = mapped_column(String(255), index=True)
+    user_email: Mapped[str] = mapped_column(String(255))
     type: Mapped[str] = mapped_column(String(64))
     message: Mapped[str] = mapped_column(String(1024))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    read: Mapped[bool] = mapped_column(Boolean, default=False)
\ No newline at end of file
+    read: Mapped[bool] = mapped_column(Boolean, default=False)
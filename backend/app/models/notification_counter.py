@@ -0,0 +1,15 @@
+from sqlalchemy import String, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+class NotificationCounter(Base):
+    """Per-user unread notifications counter.
+
+    Maintained in the same transaction as notification inserts / read marks so
+    that GET /notifications/unread-count is a primary key lookup instead of COUNT(*).
+    """
+    __tablename__ = "notification_counters"
+
+    user_email: Mapped[str] = mapped_column(String(255), primary_key=True)
+    unread: Mapped[int] = mapped_column(Integer, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Boolean, Numeric
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Boolean, Numeric, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -6,6 +6,21 @@ from app.models.base import Base
 
 class Ticket(Base):
     __tablename__ = "tickets"
+    # Passenger manifest: keyset pages / prefix search per flight (migration 0017).
+    # COLLATE "C" so LIKE 'prefix%' and ORDER BY can both use the btree; user_email is
+    # carried in the index for email prefix filtering without heap reads.
+    __table_args__ = (
+        Index(
+            "ix_tickets_flight_status_confirmation",
+            "flight_id", "status", text('confirmation_id COLLATE "C"'),
+            postgresql_include=["user_email"],
+        ),
+        # Hourly admin stats series: paid tickets by purchase hour (migration 0019)
+        Index(
+            "ix_tickets_paid_purchased_at", "purchased_at",
+            postgresql_include=["price_paid"], postgresql_where=text("status = 'paid'"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     confirmation_id: Mapped[str] = mapped_column(String(32), unique=True, index=True)
@@ -1,10 +1,15 @@
-from sqlalchemy import String, Boolean, Integer
+from sqlalchemy import String, Boolean, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.base import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Trigram indexes for admin search (ILIKE '%term%'), migration 0015
+    __table_args__ = (
+        Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+        Index("ix_users_full_name_trgm", "full_name", postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     email: Mapped[str] = mapped_column(String(255), unique=True, index=True)
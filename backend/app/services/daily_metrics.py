@@ -0,0 +1,152 @@
+"""daily_metrics rollup: incremental maintenance + rebuild.
+
+Every helper adds deltas inside the caller's transaction (no commit), so the rollup
+changes atomically with the tickets/flights it describes. Stats endpoints read
+O(days) rows from here instead of aggregating raw tickets/flights.
+
+Rebuild / backfill (e.g. after manual data fixes):
+    python -m app.services.daily_metrics rebuild [--since YYYY-MM-DD]
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+_COLUMNS = "day, company_id, passengers, revenue, flights, capacity, refunds"
+_ADD = """
+    ON CONFLICT (day, company_id) DO UPDATE SET
+        passengers = daily_metrics.passengers + excluded.passengers,
+        revenue = daily_metrics.revenue + excluded.revenue,
+        flights = daily_metrics.flights + excluded.flights,
+        capacity = daily_metrics.capacity + excluded.capacity,
+        refunds = daily_metrics.refunds + excluded.refunds
+"""
+
+_ADD_ROW = text(
+    f"INSERT INTO daily_metrics ({_COLUMNS}) "
+    "VALUES (:day, :company_id, :passengers, :revenue, :flights, :capacity, :refunds)" + _ADD
+)
+
+# Flight's current row (flushed state) counted with the given sign: call with -1 before
+# changing departure/seats_total/deleting, +1 after creating/changing it.
+_FLIGHT_DELTA = text(
+    f"INSERT INTO daily_metrics ({_COLUMNS}) "
+    "SELECT date(departure), COALESCE(company_id, 0), 0, 0, :sign, :sign * seats_total, 0 "
+    "FROM flights WHERE id = :fid" + _ADD
+)
+
+# All paid tickets of a flight move from passengers/revenue to refunds (run before the UPDATE)
+_REFUND_FLIGHT = text(
+    f"INSERT INTO daily_metrics ({_COLUMNS}) "
+    "SELECT date(t.purchased_at), COALESCE(f.company_id, 0), -count(*), -COALESCE(sum(t.price_paid), 0), 0, 0, count(*) "
+    "FROM tickets t JOIN flights f ON f.id = t.flight_id "
+    "WHERE t.flight_id = :fid AND t.status = 'paid' "
+    "GROUP BY 1, 2" + _ADD
+)
+
+_REBUILD = text(
+    f"""
+    INSERT INTO daily_metrics ({_COLUMNS})
+    SELECT day, company_id, sum(passengers), sum(revenue), sum(flights), sum(capacity), sum(refunds)
+    FROM (
+        SELECT date(t.purchased_at) AS day, COALESCE(f.company_id, 0) AS company_id,
+               count(*) FILTER (WHERE t.status = 'paid') AS passengers,
+               COALESCE(sum(t.price_paid) FILTER (WHERE t.status = 'paid'), 0) AS revenue,
+               0 AS flights, 0 AS capacity,
+               count(*) FILTER (WHERE t.status = 'refunded') AS refunds
+        FROM tickets t JOIN flights f ON f.id = t.flight_id
+        WHERE CAST(:since AS date) IS NULL OR t.purchased_at >= CAST(:since AS date)
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT date(departure), COALESCE(company_id, 0), 0, 0, count(*), COALESCE(sum(seats_total), 0), 0
+        FROM flights
+        WHERE cancelled_at IS NULL AND (CAST(:since AS date) IS NULL OR departure >= CAST(:since AS date))
+        GROUP BY 1, 2
+    ) x
+    GROUP BY day, company_id
+    """
+)
+
+
+def _company(company_id: int | None) -> int:
+    return company_id or 0
+
+
+def record_purchase(db: Session, company_id: int | None, purchased_at: datetime, qty: int, amount: float) -> None:
+    db.execute(_ADD_ROW, {"day": purchased_at.date(), "company_id": _company(company_id), "passengers": qty,
+                          "revenue": amount, "flights": 0, "capacity": 0, "refunds": 0})
+
+
+def record_refund(db: Session, company_id: int | None, purchased_at: datetime, amount: float, qty: int = 1) -> None:
+    db.execute(_ADD_ROW, {"day": purchased_at.date(), "company_id": _company(company_id), "passengers": -qty,
+                          "revenue": -amount, "flights": 0, "capacity": 0, "refunds": qty})
+
+
+def record_flight(db: Session, flight_id: int, sign: int) -> None:
+    """Add (+1) or remove (-1) the flight's current departure day / seats_total (flush first)."""
+    db.flush()
+    db.execute(_FLIGHT_DELTA, {"fid": flight_id, "sign": sign})
+
+
+def record_flights(db: Session, company_id: int | None, per_day: dict[date, list[int]]) -> None:
+    """Add flight deltas in bulk: per_day maps departure day -> [flights, seats_total sum] (may be negative)."""
+    if not per_day:
+        return
+    db.execute(_ADD_ROW, [
+        {"day": day, "company_id": _company(company_id), "passengers": 0, "revenue": 0,
+         "flights": n, "capacity": capacity, "refunds": 0}
+        for day, (n, capacity) in sorted(per_day.items())
+    ])
+
+
+def record_flight_refund(db: Session, flight_id: int) -> None:
+    db.execute(_REFUND_FLIGHT, {"fid": flight_id})
+
+
+# Stats ranges are whole UTC days ending with today: a daily row can't be split
+RANGE_DAYS = {"today": 1, "week": 7, "month": 30}
+
+
+def stats_range(name: str, now: datetime) -> tuple[datetime | None, datetime | None]:
+    """[start, end) for today / week / month = the last 1 / 7 / 30 days including today;
+    (None, None) for all."""
+    days = RANGE_DAYS.get(name)
+    if days is None:
+        return None, None
+    end = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    return end - timedelta(days=days), end
+
+
+def rebuild(db: Session, since: date | None = None) -> int:
+    """Recompute the rollup from raw tickets/flights (all history or from `since`). Caller commits."""
+    if since is None:
+        db.execute(text("DELETE FROM daily_metrics"))
+    else:
+        db.execute(text("DELETE FROM daily_metrics WHERE day >= :since"), {"since": since})
+    return db.execute(_REBUILD, {"since": since}).rowcount
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.daily_metrics")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("rebuild", help="recompute daily_metrics from tickets/flights")
+    p.add_argument("--since", type=date.fromisoformat, default=None, help="only days >= YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, args.since)
+        db.commit()
+        print(f"[daily_metrics] rebuilt {rows} rows" + (f" since {args.since}" if args.since else ""))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
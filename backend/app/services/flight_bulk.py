@@ -0,0 +1,219 @@
+"""Set-based bulk update / repricing of future flights.
+
+Request body (POST /company/flights/bulk-update):
+    {"filter": {"flight_ids": [..], "flight_number": "KC101", "origin": "ALA", "destination": "NQZ",
+                "departure_from": "2026-11-01", "departure_to": "2026-12-01T00:00:00"},
+     "op": {"price": 120.0 | "price_scale": 1.1, "shift_minutes": 30, "seats_total": 200}}
+
+At least one filter key and one op are required. Matching future flights are locked
+(FOR UPDATE) and changed by a single UPDATE whose WHERE re-checks the per-flight rules
+of PUT /company/flights/{id} (seats_total >= sold, still in the future after a shift,
+new price within the column ranges); flights failing them are reported as skipped. Passengers get one notification per user,
+however many of their flights changed.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models.flight import Flight
+from app.services.daily_metrics import record_flights
+
+MAX_FLIGHTS = 5000
+MAX_SHIFT_MINUTES = 366 * 24 * 60
+# Numeric(10, 2) price and Numeric(14, 2) revenue_est (= price * seats_sold) upper bounds
+MAX_PRICE = Decimal("1e8")
+MAX_REVENUE = Decimal("1e12")
+
+_FILTER_KEYS = ("flight_ids", "flight_number", "origin", "destination", "departure_from", "departure_to")
+
+
+class BulkError(ValueError):
+    pass
+
+
+@dataclass
+class BulkOp:
+    price: Optional[float] = None
+    price_scale: Optional[float] = None
+    shift_minutes: int = 0
+    seats_total: Optional[int] = None
+
+    @property
+    def moves_rollup(self) -> bool:
+        return bool(self.shift_minutes) or self.seats_total is not None
+
+    def describe(self) -> str:
+        parts = []
+        if self.price is not None:
+            parts.append(f"price: {self.price:.2f}")
+        if self.price_scale is not None:
+            parts.append(f"price: x{self.price_scale:g}")
+        if self.shift_minutes:
+            parts.append(f"departure/arrival shifted by {self.shift_minutes:+d} min")
+        if self.seats_total is not None:
+            parts.append(f"seats_total: {self.seats_total}")
+        return ", ".join(parts)
+
+
+def _parse_bound(value: Any, name: str, end: bool) -> datetime:
+    try:
+        if len(str(value)) == 10:
+            d = date.fromisoformat(str(value))
+            # date-only upper bound includes the whole day
+            return datetime.combine(d + timedelta(days=1) if end else d, datetime.min.time())
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise BulkError(f"filter.{name}: expected ISO date/datetime")
+
+
+def parse_filter(raw: Any) -> list:
+    if not isinstance(raw, dict) or not any(raw.get(k) not in (None, "", []) for k in _FILTER_KEYS):
+        raise BulkError(f"filter: at least one of {', '.join(_FILTER_KEYS)} is required")
+    conds = []
+    ids = raw.get("flight_ids")
+    if ids:
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise BulkError("filter.flight_ids: expected a list of integers")
+        conds.append(Flight.id.in_(ids))
+    for key, col in (("flight_number", Flight.flight_number), ("origin", Flight.origin), ("destination", Flight.destination)):
+        if raw.get(key):
+            conds.append(col == str(raw[key]).strip())
+    if raw.get("departure_from"):
+        conds.append(Flight.departure >= _parse_bound(raw["departure_from"], "departure_from", False))
+    if raw.get("departure_to"):
+        bound = _parse_bound(raw["departure_to"], "departure_to", True)
+        conds.append(Flight.departure < bound if len(str(raw["departure_to"])) == 10 else Flight.departure <= bound)
+    return conds
+
+
+def parse_op(raw: Any) -> BulkOp:
+    if not isinstance(raw, dict):
+        raise BulkError("op: expected an object")
+    op = BulkOp()
+    try:
+        if raw.get("price") is not None and raw.get("price_scale") is not None:
+            raise BulkError("op: use either price or price_scale")
+        if raw.get("price") is not None:
+            op.price = round(float(raw["price"]), 2)
+            if not 0 <= op.price < 1e8:
+                raise BulkError("op.price: out of range")
+        if raw.get("price_scale") is not None:
+            op.price_scale = float(raw["price_scale"])
+            if not 0 < op.price_scale <= 100:
+                raise BulkError("op.price_scale: must be in (0, 100]")
+        op.shift_minutes = int(raw.get("shift_minutes") or 0)
+        if abs(op.shift_minutes) > MAX_SHIFT_MINUTES:
+            raise BulkError("op.shift_minutes: out of range")
+        if raw.get("seats_total") is not None:
+            op.seats_total = int(raw["seats_total"])
+            if op.seats_total <= 0:
+                raise BulkError("op.seats_total: must be positive")
+    except (TypeError, ValueError) as e:
+        if isinstance(e, BulkError):
+            raise
+        raise BulkError("op: invalid number")
+    if op.price is None and op.price_scale is None and not op.shift_minutes and op.seats_total is None:
+        raise BulkError("op: nothing to change")
+    return op
+
+
+def _update_sql(op: BulkOp) -> str:
+    sets, guards = [], []
+    new_price = None
+    if op.price is not None:
+        new_price = ":price"
+    if op.price_scale is not None:
+        new_price = "round(price * CAST(:price_scale AS numeric), 2)"
+    if new_price is not None:
+        sets.append(f"price = {new_price}")
+        # out of Numeric(10, 2) / revenue_est Numeric(14, 2) -> skip instead of failing the statement
+        guards.append(f"{new_price} < :max_price AND {new_price} * seats_sold < :max_revenue")
+    if op.shift_minutes:
+        sets.append("departure = departure + make_interval(mins => CAST(:shift AS int))")
+        sets.append("arrival = arrival + make_interval(mins => CAST(:shift AS int))")
+        guards.append("departure + make_interval(mins => CAST(:shift AS int)) > :now")
+    if op.seats_total is not None:
+        sets.append("seats_total = :seats_total")
+        # same rule as the single-flight edit: available = total - sold
+        sets.append("seats_available = GREATEST(:seats_total - seats_sold, 0)")
+        guards.append("seats_sold <= :seats_total")
+    where = " AND ".join(["id = ANY(:ids)", *guards])
+    # old: pre-update snapshot of the same rows (all CTEs see one snapshot) for the rollup
+    return f"""
+    WITH old AS (
+        SELECT id, departure, seats_total FROM flights WHERE id = ANY(:ids)
+    ), upd AS (
+        UPDATE flights SET {", ".join(sets)}
+        WHERE {where}
+        RETURNING id, company_id, flight_number, departure, seats_total, seats_available
+    )
+    SELECT upd.*, old.departure AS old_departure, old.seats_total AS old_seats_total
+    FROM upd JOIN old USING (id)
+    ORDER BY upd.id
+    """
+
+
+def _price_fits(op: BulkOp, r) -> bool:
+    if op.price is not None:
+        price = Decimal(str(op.price))
+    elif op.price_scale is not None:
+        price = round(Decimal(str(r.price)) * Decimal(str(op.price_scale)), 2)
+    else:
+        return True
+    return price < MAX_PRICE and price * (r.seats_sold or 0) < MAX_REVENUE
+
+
+def apply(db: Session, conds: list, op: BulkOp, company_ids: Optional[List[int]], now: datetime) -> Dict[str, Any]:
+    """Lock the matching future flights and apply `op` to them (caller commits).
+
+    company_ids=None means all companies (admin). Returns matched/updated ids and the
+    skipped flights with the rule they failed.
+    """
+    q = select(Flight.id, Flight.departure, Flight.price, Flight.seats_sold).where(*conds, Flight.departure > now, Flight.cancelled_at.is_(None))
+    if company_ids is not None:
+        q = q.where(Flight.company_id.in_(company_ids))
+    locked = db.execute(q.order_by(Flight.id).limit(MAX_FLIGHTS + 1).with_for_update()).all()
+    if len(locked) > MAX_FLIGHTS:
+        raise BulkError(f"filter matches more than {MAX_FLIGHTS} flights; narrow it down")
+    if not locked:
+        return {"matched": 0, "updated": [], "skipped": [], "rows": []}
+
+    params = {
+        "ids": [r.id for r in locked], "now": now, "shift": op.shift_minutes,
+        "price": op.price, "price_scale": op.price_scale, "seats_total": op.seats_total,
+        "max_price": MAX_PRICE, "max_revenue": MAX_REVENUE,
+    }  # unused keys are ignored by text()
+    rows = db.execute(text(_update_sql(op)), params).mappings().all()
+
+    updated = {r["id"] for r in rows}
+    skipped = []
+    for r in locked:
+        if r.id in updated:
+            continue
+        if op.seats_total is not None and (r.seats_sold or 0) > op.seats_total:
+            reason = "seats_total cannot be less than already sold seats"
+        elif not _price_fits(op, r):
+            reason = "new price out of range"
+        else:
+            reason = "departure would be in the past"
+        skipped.append({"id": r.id, "reason": reason})
+
+    if op.moves_rollup:
+        per_company: Dict[int | None, Dict[date, List[int]]] = {}
+        for r in rows:
+            days = per_company.setdefault(r["company_id"], {})
+            old = days.setdefault(r["old_departure"].date(), [0, 0])
+            old[0] -= 1
+            old[1] -= r["old_seats_total"]
+            new = days.setdefault(r["departure"].date(), [0, 0])
+            new[0] += 1
+            new[1] += r["seats_total"]
+        for company_id, per_day in per_company.items():
+            record_flights(db, company_id, {d: v for d, v in per_day.items() if v != [0, 0]})
+
+    return {"matched": len(locked), "updated": sorted(updated), "skipped": skipped, "rows": [dict(r) for r in rows]}
@@ -0,0 +1,273 @@
+"""Bulk flight import for company managers (CSV / NDJSON / recurring schedule).
+
+Rows are parsed and validated one at a time and streamed into a single
+COPY flights (...) FROM STDIN inside the request transaction, so a season of
+tens of thousands of flights costs one round trip instead of one INSERT+commit each.
+Invalid rows are skipped and reported by line number (first MAX_REPORTED_ERRORS);
+with atomic=True any invalid row rolls the whole import back.
+
+CSV header / NDJSON keys:
+    airline, flight_number, origin, destination, departure, arrival (ISO 8601),
+    price, seats_total, [seats_available = seats_total], [stops = 0]
+
+Schedule spec (expanded server side, one flight per matching day):
+    {"airline": "...", "flight_number": "...", "origin": "...", "destination": "...",
+     "price": 99.0, "seats_total": 180, "start_date": "2026-11-01", "days": 180,
+     "departure_time": "08:15", "duration_minutes": 95, "weekdays": [0, 2, 4]}
+    weekdays (0 = Monday) is optional, default every day.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import codecs
+import csv
+import json
+
+from sqlalchemy.orm import Session
+
+from app.services.daily_metrics import record_flights
+
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 1000
+MAX_SCHEDULE_DAYS = 731
+
+COPY_COLUMNS = (
+    "airline", "flight_number", "origin", "destination", "departure", "arrival",
+    "price", "seats_total", "seats_available", "stops", "company_id",
+)
+_COPY_SQL = f"COPY flights ({', '.join(COPY_COLUMNS)}) FROM STDIN"
+
+# column -> max length (mirrors models.flight)
+_TEXT_FIELDS = {"airline": 120, "flight_number": 32, "origin": 64, "destination": 64}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportFileError(ValueError):
+    """The upload as a whole can't be read (e.g. undecodable CSV header); the route answers 400."""
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    rejected: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+
+def _parse_dt(value: Any, name: str) -> datetime:
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            raise RowError(f"{name}: expected ISO 8601 datetime")
+    # flights store naive UTC
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _parse_int(value: Any, name: str, default: Optional[int] = None) -> int:
+    if value is None or value == "":
+        if default is None:
+            raise RowError(f"{name}: required")
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"{name}: expected integer")
+
+
+def validate_row(raw: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Validate one input row and return it as a COPY tuple (company_id filled in later)."""
+    out: Dict[str, Any] = {}
+    for name, limit in _TEXT_FIELDS.items():
+        v = str(raw.get(name) or "").strip()
+        if not v:
+            raise RowError(f"{name}: required")
+        if len(v) > limit:
+            raise RowError(f"{name}: longer than {limit} characters")
+        out[name] = v
+    if out["origin"].lower() == out["destination"].lower():
+        raise RowError("destination: same as origin")
+    if not raw.get("departure") or not raw.get("arrival"):
+        raise RowError("departure/arrival: required")
+    out["departure"] = _parse_dt(raw["departure"], "departure")
+    out["arrival"] = _parse_dt(raw["arrival"], "arrival")
+    if out["arrival"] <= out["departure"]:
+        raise RowError("arrival: must be after departure")
+    try:
+        price = round(float(raw.get("price")), 2)
+    except (TypeError, ValueError):
+        raise RowError("price: expected number")
+    if not 0 <= price < 1e8:
+        raise RowError("price: out of range")
+    out["price"] = price
+    out["seats_total"] = _parse_int(raw.get("seats_total"), "seats_total")
+    if out["seats_total"] <= 0:
+        raise RowError("seats_total: must be positive")
+    out["seats_available"] = _parse_int(raw.get("seats_available"), "seats_available", out["seats_total"])
+    if not 0 <= out["seats_available"] <= out["seats_total"]:
+        raise RowError("seats_available: must be between 0 and seats_total")
+    out["stops"] = _parse_int(raw.get("stops"), "stops", 0)
+    if out["stops"] < 0:
+        raise RowError("stops: must be >= 0")
+    return tuple(out[c] for c in COPY_COLUMNS[:-1])
+
+
+_NOT_UTF8 = "not valid UTF-8 (save the file as UTF-8)"
+
+
+def _decoded_lines(fileobj: IO[bytes], bad: set) -> Iterator[str]:
+    """Decode the upload line by line; numbers of lines that aren't UTF-8 go to `bad`
+    (decoded with replacement characters so parsing can go on)."""
+    for line_no, raw in enumerate(fileobj, start=1):
+        if line_no == 1 and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            yield raw.decode("utf-8")
+        except UnicodeDecodeError:
+            bad.add(line_no)
+            yield raw.decode("utf-8", errors="replace")
+
+
+def iter_file_rows(fileobj: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, raw row) from an uploaded file without loading it whole.
+
+    A raw row is a dict, or a RowError for lines that can't be decoded / parsed, so a
+    cp1251 export or a broken quote costs those rows, not the whole import. Raises
+    ImportFileError when the CSV header itself is unreadable.
+    """
+    bad: set = set()
+    lines = _decoded_lines(fileobj, bad)
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        try:
+            reader.fieldnames
+        except csv.Error as e:
+            raise ImportFileError(f"CSV header: {e}")
+        if 1 in bad:
+            raise ImportFileError(f"CSV header: {_NOT_UTF8}")
+        prev = reader.line_num
+        while True:
+            first = prev + 1
+            try:
+                row = next(reader)
+                # line_num points at the last physical line of the record (quoted newlines)
+                prev = reader.line_num
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # the failing line isn't counted in line_num yet; parsing resumes on the next one
+                row, prev = RowError(f"malformed CSV: {e}"), first
+            if not isinstance(row, RowError) and any(n in bad for n in range(first, prev + 1)):
+                row = RowError(_NOT_UTF8)
+            yield prev, row
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            if line_no in bad:
+                yield line_no, RowError(_NOT_UTF8)
+                continue
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, RowError("invalid JSON")
+                continue
+            yield line_no, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def _parse_hm(value: Any) -> time:
+    try:
+        return datetime.strptime(str(value), "%H:%M").time()
+    except ValueError:
+        raise RowError("departure_time: expected HH:MM")
+
+
+def expand_schedule(spec: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Expand one recurring schedule spec into flight rows (see module docstring)."""
+    try:
+        start = date.fromisoformat(str(spec.get("start_date")))
+    except ValueError:
+        raise RowError("start_date: expected YYYY-MM-DD")
+    days = _parse_int(spec.get("days"), "days")
+    if not 1 <= days <= MAX_SCHEDULE_DAYS:
+        raise RowError(f"days: must be between 1 and {MAX_SCHEDULE_DAYS}")
+    dep_time = _parse_hm(spec.get("departure_time"))
+    duration = _parse_int(spec.get("duration_minutes"), "duration_minutes")
+    if duration <= 0:
+        raise RowError("duration_minutes: must be positive")
+    weekdays = spec.get("weekdays")
+    if weekdays is not None:
+        if not isinstance(weekdays, list) or not all(isinstance(d, int) and 0 <= d <= 6 for d in weekdays):
+            raise RowError("weekdays: expected a list of 0..6 (0 = Monday)")
+        weekdays = set(weekdays)
+    base = {k: spec.get(k) for k in (*_TEXT_FIELDS, "price", "seats_total", "seats_available", "stops")}
+    for i in range(days):
+        day = start + timedelta(days=i)
+        if weekdays is not None and day.weekday() not in weekdays:
+            continue
+        departure = datetime.combine(day, dep_time)
+        yield {**base, "departure": departure, "arrival": departure + timedelta(minutes=duration)}
+
+
+def iter_schedule_rows(specs: Iterable[Dict[str, Any]]) -> Iterator[Tuple[int, Any]]:
+    """Yield (spec index, row) pairs; the "line" of a schedule row is its 1-based spec number."""
+    for n, spec in enumerate(specs, start=1):
+        try:
+            for row in expand_schedule(spec):
+                yield n, row
+        except RowError as e:
+            yield n, e
+
+
+def import_flights(
+    db: Session,
+    rows: Iterable[Tuple[int, Any]],
+    company_id: int,
+    max_rows: int,
+) -> ImportReport:
+    """COPY valid rows into flights and add them to daily_metrics. Caller commits/rolls back."""
+    report = ImportReport()
+    per_day: Dict[date, List[int]] = {}
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        with cursor.copy(_COPY_SQL) as copy:
+            for line, raw in rows:
+                if report.imported + report.rejected >= max_rows:
+                    report.reject(line, f"import limited to {max_rows} rows")
+                    break
+                try:
+                    if isinstance(raw, RowError):
+                        raise raw
+                    values = validate_row(raw)
+                except RowError as e:
+                    report.reject(line, str(e))
+                    continue
+                copy.write_row(values + (company_id,))
+                report.imported += 1
+                totals = per_day.setdefault(values[4].date(), [0, 0])
+                totals[0] += 1
+                totals[1] += values[7]
+    finally:
+        cursor.close()
+    record_flights(db, company_id, per_day)
+    return report
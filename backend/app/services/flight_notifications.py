@@ -0,0 +1,131 @@
+"""Set-based passenger notifications for flight updates / cancellations.
+
+One statement (data-modifying CTEs) does the whole DB side:
+  [UPDATE tickets -> refunded RETURNING user_email]  (cancellation only)
+  [UPDATE flights.seats_sold -= refunded]            (cancellation only)
+  INSERT INTO notifications ... SELECT ... GROUP BY user_email RETURNING ...
+  INSERT INTO notification_counters ... ON CONFLICT DO UPDATE (unread + 1)
+so the request never materializes Ticket / Notification ORM objects. The WS fan-out
+is handed to the event loop (fan_out) and the request returns right after commit.
+"""
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.daily_metrics import record_flight, record_flight_refund
+from app.services.notification_ws import manager as ws_manager
+
+
+def format_template(prefix: str, tail: str) -> str:
+    """Build a Postgres format() template: literal prefix + placeholders.
+
+    Placeholders available in `tail`: %1$s = number of the user's tickets,
+    %2$s = " (tickets: N)" when N > 1 else "".
+    """
+    return prefix.replace("%", "%%") + tail
+
+
+_SQL = """
+WITH affected AS (
+    {affected}
+){sold}, grouped AS (
+    SELECT user_email, count(*) AS tickets FROM affected GROUP BY user_email
+), ins AS (
+    INSERT INTO notifications (user_email, type, message, created_at, read)
+    SELECT user_email,
+           :ntype,
+           left(format(CAST(:template AS text), tickets, CASE WHEN tickets = 1 THEN '' ELSE ' (tickets: ' || tickets || ')' END), 1024),
+           :now,
+           false
+    FROM grouped
+    RETURNING id, user_email, type, message, created_at, read
+), cnt AS (
+    INSERT INTO notification_counters (user_email, unread)
+    SELECT lower(user_email), 1 FROM ins
+    ON CONFLICT (user_email) DO UPDATE SET unread = notification_counters.unread + 1
+    RETURNING user_email, unread
+)
+SELECT ins.id, ins.user_email, ins.type, ins.message, ins.created_at, ins.read, cnt.unread, grouped.tickets
+FROM ins
+JOIN grouped ON grouped.user_email = ins.user_email
+JOIN cnt ON cnt.user_email = lower(ins.user_email)
+"""
+
+_AFFECTED_PAID = "SELECT user_email FROM tickets WHERE flight_id = :fid AND status = 'paid'"
+_AFFECTED_PAID_MANY = "SELECT user_email FROM tickets WHERE flight_id = ANY(:fids) AND status = 'paid'"
+_AFFECTED_REFUND = "UPDATE tickets SET status = 'refunded' WHERE flight_id = :fid AND status = 'paid' RETURNING user_email"
+# data-modifying CTE: runs even though nothing selects from it
+_SOLD_REFUND = """, sold AS (
+    UPDATE flights SET seats_sold = GREATEST(seats_sold - (SELECT count(*) FROM affected), 0) WHERE id = :fid
+)"""
+
+
+def notify_paid_passengers(db: Session, flight_id: int, ntype: str, template: str, refund: bool = False) -> list[dict]:
+    """Insert one notification per passenger with paid tickets on the flight (no commit).
+
+    refund=True also marks those tickets refunded (and decrements flights.seats_sold)
+    in the same statement.
+    Returns the inserted rows (with the new unread counter and the user's ticket count)
+    for fan_out() after commit.
+    """
+    sql = _SQL.format(affected=_AFFECTED_REFUND if refund else _AFFECTED_PAID, sold=_SOLD_REFUND if refund else "")
+    rows = db.execute(text(sql), {"fid": flight_id, "ntype": ntype, "template": template, "now": datetime.utcnow()}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def notify_passengers_of_flights(db: Session, flight_ids: list[int], ntype: str, template: str) -> list[dict]:
+    """Like notify_paid_passengers for many flights: still one notification per user
+    (%1$s / %2$s count the user's paid tickets across all of them)."""
+    if not flight_ids:
+        return []
+    sql = _SQL.format(affected=_AFFECTED_PAID_MANY, sold="")
+    rows = db.execute(text(sql), {"fids": list(flight_ids), "ntype": ntype, "template": template, "now": datetime.utcnow()}).mappings().all()
+    return [dict(r) for r in rows]
+
+
+_CLAIM_CANCEL = text(
+    "UPDATE flights SET cancelled_at = :now, seats_available = 0 "
+    "WHERE id = :fid AND cancelled_at IS NULL RETURNING flight_number"
+)
+_DROP_PENDING_REMINDERS = text(
+    "DELETE FROM ticket_reminders r USING tickets t "
+    "WHERE r.ticket_id = t.id AND t.flight_id = :fid AND r.sent = false"
+)
+
+
+def cancel_flight(db: Session, flight_id: int, now: datetime) -> list[dict] | None:
+    """Soft-delete a flight: set cancelled_at, refund its paid tickets, notify each passenger once.
+
+    A constant number of statements whatever the passenger count (no commit). The claim UPDATE
+    locks the row first, so a concurrent purchase (which requires cancelled_at IS NULL) fails.
+    Returns the notification rows for fan_out(), or None if the flight was already cancelled.
+    """
+    claimed = db.execute(_CLAIM_CANCEL, {"fid": flight_id, "now": now}).first()
+    if claimed is None:
+        return None
+    # Rollup first (reads the still-paid tickets)
+    record_flight_refund(db, flight_id)
+    record_flight(db, flight_id, -1)
+    template = format_template(f"Your flight {claimed.flight_number} was cancelled. Tickets refunded: ", "%1$s%2$s.")
+    rows = notify_paid_passengers(db, flight_id, "flight_cancel", template, refund=True)
+    db.execute(_DROP_PENDING_REMINDERS, {"fid": flight_id})
+    return rows
+
+
+def fan_out(rows: list[dict]) -> None:
+    """Hand WS delivery of inserted notifications to the background dispatcher."""
+    if not rows:
+        return
+    items: list[tuple[str, dict]] = []
+    for r in rows:
+        email = r["user_email"]
+        items.append((email, {"type": "notification", "data": {
+            "id": r["id"],
+            "type": r["type"],
+            "message": r["message"],
+            "created_at": r["created_at"].isoformat(),
+            "read": r["read"],
+        }}))
+        items.append((email, {"type": "unread_count", "data": {"unread": r["unread"], "delta": 1}}))
+    ws_manager.dispatch(ws_manager.send_many(items))
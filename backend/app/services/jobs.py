@@ -0,0 +1,161 @@
+"""Background job runner with single-leader election.
+
+Every process runs JobRunner.run(); exactly one of them holds the session-level
+Postgres advisory lock LEADER_LOCK_KEY on a dedicated connection and runs the
+leader-only jobs (reminder scheduler, notifications retention). If the leader dies,
+its connection closes, the lock is released and another process takes over on its
+next poll (JOB_LEADER_POLL_SECONDS). Per-process jobs (leader_only=False) run everywhere.
+
+record_run() upserts per-job run statistics into `background_jobs`
+(GET /admin/jobs), so the view is the same whichever worker serves the request.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import socket
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.models.background_job import BackgroundJob
+
+logger = logging.getLogger("jobs")
+
+LEADER_LOCK_KEY = 0x666C6A62  # "fljb"
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+@dataclass
+class _Job:
+    name: str
+    factory: Callable[[], Awaitable[None]]
+    leader_only: bool
+    task: Optional[asyncio.Task] = None
+
+
+def record_run(name: str, started_at: datetime, duration_ms: float, error: BaseException | None = None) -> None:
+    """Upsert one run into background_jobs (blocking; call from worker threads)."""
+    ok = error is None
+    dur = int(duration_ms)
+    values = {
+        "name": name,
+        "instance": INSTANCE_ID,
+        "last_started_at": started_at,
+        "last_duration_ms": dur,
+        "last_ok": ok,
+        "last_error": None if ok else f"{error.__class__.__name__}: {error}"[:500],
+        "runs": 1,
+        "failures": 0 if ok else 1,
+        "total_duration_ms": dur,
+        "max_duration_ms": dur,
+    }
+    stmt = pg_insert(BackgroundJob).values(**values)
+    ex = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[BackgroundJob.name],
+        set_={
+            "instance": ex.instance,
+            "last_started_at": ex.last_started_at,
+            "last_duration_ms": ex.last_duration_ms,
+            "last_ok": ex.last_ok,
+            "last_error": ex.last_error,
+            "runs": BackgroundJob.runs + 1,
+            "failures": BackgroundJob.failures + ex.failures,
+            "total_duration_ms": BackgroundJob.total_duration_ms + ex.total_duration_ms,
+            "max_duration_ms": text("GREATEST(background_jobs.max_duration_ms, excluded.max_duration_ms)"),
+        },
+    )
+    db = SessionLocal()
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:  # stats must never break the job itself
+        db.rollback()
+        logger.debug("record_run(%s) failed: %s", name, e)
+    finally:
+        db.close()
+
+
+class JobRunner:
+    def __init__(self) -> None:
+        self._jobs: Dict[str, _Job] = {}
+        self._conn = None  # dedicated connection holding the advisory lock while leader
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+
+    def register(self, name: str, factory: Callable[[], Awaitable[None]], leader_only: bool = True) -> None:
+        self._jobs[name] = _Job(name, factory, leader_only)
+
+    def _check_leadership(self) -> bool:
+        """Blocking: keep / try to take the leader lock."""
+        if self._conn is not None:
+            try:
+                self._conn.execute(text("SELECT 1"))
+                self._conn.commit()
+                return True
+            except Exception:
+                # connection lost -> the lock is gone with it
+                try:
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+                return False
+        conn = engine.connect()
+        try:
+            got = conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": LEADER_LOCK_KEY}).scalar()
+            conn.commit()  # session-level lock survives the transaction
+        except Exception:
+            conn.close()
+            raise
+        if got:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def _supervise(self, leader: bool) -> None:
+        """Start jobs that should run here (restarting crashed ones), stop those that shouldn't."""
+        for job in self._jobs.values():
+            should_run = leader or not job.leader_only
+            running = job.task is not None and not job.task.done()
+            if should_run and not running:
+                if job.task is not None and job.task.done() and not job.task.cancelled() and job.task.exception():
+                    logger.warning("job %s crashed: %r, restarting", job.name, job.task.exception())
+                job.task = asyncio.create_task(job.factory(), name=f"job:{job.name}")
+            elif not should_run and running:
+                job.task.cancel()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                leader = await asyncio.to_thread(self._check_leadership)
+            except Exception as e:
+                logger.debug("leader check failed: %s", e)
+                leader = False
+            if leader != self.is_leader:
+                logger.info("jobs: %s leadership (%s)", "acquired" if leader else "lost", INSTANCE_ID)
+                self.leader_since = datetime.utcnow() if leader else None
+            self.is_leader = leader
+            self._supervise(leader)
+            await asyncio.sleep(max(1, settings.job_leader_poll_seconds))
+
+    def snapshot(self) -> dict:
+        return {
+            "instance": INSTANCE_ID,
+            "leader": self.is_leader,
+            "leader_since": self.leader_since.isoformat() if self.leader_since else None,
+            "jobs": [
+                {"name": j.name, "leader_only": j.leader_only, "running": j.task is not None and not j.task.done()}
+                for j in self._jobs.values()
+            ],
+        }
+
+
+runner = JobRunner()
@@ -0,0 +1,89 @@
+"""Login storm benchmark: login throughput vs. search latency on a running server.
+
+Fires --logins concurrent logins (--concurrency at a time) while a steady stream of
+flight searches runs alongside, then prints logins/s, how many got 503 (hashing queue
+full) and the search latency percentiles. Run it once against the current build and
+once with PASSWORD_HASH_WORKERS=0 (hashing in the threadpool) to compare:
+
+    python -m app.services.login_bench --base-url http://localhost:8000 \\
+        --email user@example.com --password secret --logins 500 --concurrency 64
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def _pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, int(p * len(s)))] * 1000, 1)
+
+
+async def _storm(args) -> dict:
+    results = {"ok": 0, "busy": 0, "failed": 0}
+    search_latency: list[float] = []
+    sem = asyncio.Semaphore(args.concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        async def one_login():
+            async with sem:
+                try:
+                    r = await client.post("/auth/login-json", json={"email": args.email, "password": args.password})
+                except httpx.HTTPError:
+                    results["failed"] += 1
+                    return
+                if r.status_code == 200:
+                    results["ok"] += 1
+                elif r.status_code == 503:
+                    results["busy"] += 1
+                else:
+                    results["failed"] += 1
+
+        async def searcher():
+            while not done.is_set():
+                started = time.perf_counter()
+                try:
+                    await client.get("/flights/", params={"origin": args.origin, "page_size": 20})
+                    search_latency.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(args.search_interval)
+
+        searchers = [asyncio.create_task(searcher()) for _ in range(args.searchers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*searchers)
+
+    return {
+        **results,
+        "elapsed_s": round(elapsed, 2),
+        "logins_per_s": round(results["ok"] / elapsed, 1) if elapsed else 0.0,
+        "search_requests": len(search_latency),
+        "search_ms": {"p50": _pct(search_latency, 0.5), "p95": _pct(search_latency, 0.95), "p99": _pct(search_latency, 0.99)},
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.login_bench")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--searchers", type=int, default=4, help="parallel search loops during the storm")
+    parser.add_argument("--search-interval", type=float, default=0.05)
+    parser.add_argument("--origin", default="", help="origin filter for the search requests")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args(argv)
+    print(f"[login_bench] {asyncio.run(_storm(args))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Event-loop lag monitor.
+
+A task sleeps LOOP_LAG_INTERVAL_MS and measures how late it wakes up: that delay is
+time the loop spent blocked by synchronous work (sync DB calls in async code, CPU
+work...). Stalls above LOOP_LAG_WARN_MS are logged; GET /admin/metrics/loop shows the histogram.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+from app.services.metrics import Histogram
+
+logger = logging.getLogger("loop.monitor")
+
+lag_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000])
+_state = {"stalls": 0, "last_stall_ms": 0.0, "last_stall_at": None}
+
+
+async def loop_lag_monitor():
+    interval = max(10, settings.loop_lag_interval_ms) / 1000.0
+    warn_ms = settings.loop_lag_warn_ms
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, (time.perf_counter() - started - interval) * 1000.0)
+        lag_ms.observe(lag)
+        if lag >= warn_ms:
+            _state["stalls"] += 1
+            _state["last_stall_ms"] = round(lag, 1)
+            _state["last_stall_at"] = time.time()
+            logger.warning("event loop blocked for %.1f ms", lag)
+
+
+def snapshot() -> dict:
+    return {"lag_ms": lag_ms.snapshot(), **_state, "warn_ms": settings.loop_lag_warn_ms}
@@ -0,0 +1,73 @@
+"""Which companies a company manager may act on, without a DB round trip per request.
+
+Resolution order:
+  1. the token's company_ids claim, while the token is younger than
+     MANAGER_SCOPE_CACHE_SECONDS and no mapping change happened after it was issued
+     (in this process);
+  2. a process-wide TTL cache keyed by email, loaded from company_managers.
+
+Admin routes that change the mapping call invalidate()/invalidate_all(); other worker
+processes converge within MANAGER_SCOPE_CACHE_SECONDS.
+"""
+from __future__ import annotations
+from typing import Dict
+import time
+
+from sqlalchemy.orm import Session
+
+from app.api.deps import Principal
+from app.core.config import settings
+from app.models.company import Company
+from app.models.company_manager import CompanyManager
+from app.models.user import User
+from app.services.ttl_cache import TTLCache
+
+_cache = TTLCache(settings.manager_scope_cache_seconds)
+# wall-clock time of the last mapping change per email ("*" = every manager)
+_changed_at: Dict[str, float] = {}
+
+
+def load_company_ids(db: Session, email: str) -> list[int]:
+    """Return list of company ids for manager email (uncached)."""
+    user = db.query(User).filter(User.email == email).first()
+    if not user:
+        return []
+    links = db.query(CompanyManager.company_id).filter(CompanyManager.user_id == user.id).all()
+    if links:
+        return [row[0] for row in links]
+    # Fallback legacy (single heuristic)
+    if user.full_name:
+        company = db.query(Company).filter(Company.name == user.full_name).first()
+        if company:
+            return [company.id]
+    fallback = db.query(Company).filter(Company.is_active == True).first()
+    return [fallback.id] if fallback else []
+
+
+def _claim_usable(principal: Principal) -> bool:
+    if principal.company_ids is None or not principal.issued_at:
+        return False
+    ttl = settings.manager_scope_cache_seconds
+    if ttl <= 0 or time.time() - principal.issued_at > ttl:
+        return False
+    changed = max(_changed_at.get(principal.email, 0.0), _changed_at.get("*", 0.0))
+    return principal.issued_at > changed
+
+
+def manager_company_ids(db: Session, principal: Principal) -> list[int]:
+    if _claim_usable(principal):
+        return list(principal.company_ids or [])
+    return list(_cache.get_or_load(principal.email, lambda: load_company_ids(db, principal.email)))
+
+
+def invalidate(email: str) -> None:
+    """Call after the manager's company links changed (assign/unassign)."""
+    _changed_at[email] = time.time()
+    _cache.invalidate(email)
+
+
+def invalidate_all() -> None:
+    """Call after a company was deactivated/deleted (affects links and the legacy fallback)."""
+    _changed_at.clear()
+    _changed_at["*"] = time.time()
+    _cache.invalidate()
@@ -0,0 +1,37 @@
+"""Tiny in-process metrics primitives (no external dependency).
+
+Values are per process; admin endpoints expose snapshots.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+import threading
+
+
+class Histogram:
+    """Fixed-bucket histogram (upper bounds, + overflow bucket), thread-safe."""
+
+    def __init__(self, buckets: list[float]) -> None:
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"<={b:g}" for b in self.buckets] + [f">{self.buckets[-1]:g}"]
+            return {
+                "count": self.count,
+                "avg": round(self.total / self.count, 3) if self.count else 0.0,
+                "max": round(self.max, 3),
+                "buckets": dict(zip(labels, self._counts)),
+            }
@@ -0,0 +1,68 @@
+"""Per-user unread notification counters.
+
+All helpers operate inside the caller's transaction (no commit here) so the counter
+always changes together with the notifications it describes. After commit, call
+``push_unread`` to deliver the new values over WebSocket.
+"""
+from __future__ import annotations
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification
+from app.models.notification_counter import NotificationCounter
+from app.services.notification_ws import manager as ws_manager
+
+
+def bump_unread(db: Session, deltas: dict[str, int]) -> dict[str, int]:
+    """Increment users' unread counters (new notifications) with one upsert.
+
+    Returns {email: new_unread_value}.
+    """
+    merged: dict[str, int] = {}
+    for email, d in deltas.items():
+        if d > 0:
+            merged[email.lower()] = merged.get(email.lower(), 0) + d
+    if not merged:
+        return {}
+    stmt = pg_insert(NotificationCounter).values([{"user_email": e, "unread": d} for e, d in merged.items()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[NotificationCounter.user_email],
+        set_={"unread": NotificationCounter.unread + stmt.excluded.unread},
+    ).returning(NotificationCounter.user_email, NotificationCounter.unread)
+    return {r.user_email: r.unread for r in db.execute(stmt)}
+
+
+def decrement_unread(db: Session, email: str, by: int = 1) -> int:
+    email = email.lower()
+    row = db.query(NotificationCounter).filter(NotificationCounter.user_email == email).with_for_update().first()
+    if row is None:
+        return get_unread(db, email)
+    row.unread = max(0, row.unread - by)
+    return row.unread
+
+
+def reset_unread(db: Session, email: str) -> None:
+    stmt = pg_insert(NotificationCounter).values(user_email=email.lower(), unread=0)
+    stmt = stmt.on_conflict_do_update(index_elements=[NotificationCounter.user_email], set_={"unread": 0})
+    db.execute(stmt)
+
+
+def get_unread(db: Session, email: str) -> int:
+    """Read the counter; falls back to COUNT(*) (and seeds the row) if it is missing."""
+    email = email.lower()
+    value = db.query(NotificationCounter.unread).filter(NotificationCounter.user_email == email).scalar()
+    if value is not None:
+        return int(value)
+    count = db.query(func.count(Notification.id)).filter(Notification.user_email == email, Notification.read == False).scalar() or 0  # noqa: E712
+    stmt = pg_insert(NotificationCounter).values(user_email=email, unread=count).on_conflict_do_nothing()
+    db.execute(stmt)
+    db.commit()
+    return int(count)
+
+
+def push_unread(values: dict[str, int], deltas: dict[str, int] | None = None) -> None:
+    """Push {"type": "unread_count"} frames (fire & forget, safe from sync routes)."""
+    for email, unread in values.items():
+        delta = (deltas or {}).get(email)
+        ws_manager.dispatch(ws_manager.send_to_user(email, {"type": "unread_count", "data": {"unread": unread, "delta": delta}}))
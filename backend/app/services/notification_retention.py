@@ -0,0 +1,139 @@
+"""Retention for the month-partitioned `notifications` table.
+
+Old data is removed with partition operations (DETACH + DROP / rename to archive)
+instead of row-by-row DELETEs:
+  - ensure_partitions(): creates upcoming monthly partitions ahead of time
+  - purge_expired(): for every partition that ends before the retention cutoff,
+    detaches it, re-inserts its still-unread rows into the parent (they land in
+    notifications_default, so unread counters stay valid) and drops or archives it.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta, date
+import asyncio
+import logging
+import re
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.jobs import record_run
+
+logger = logging.getLogger("notifications.retention")
+
+# Arbitrary constant key for pg_try_advisory_xact_lock: only one worker runs DDL at a time
+RETENTION_LOCK_KEY = 0x6E6F7469  # "noti"
+_PARTITION_RE = re.compile(r"^notifications_p(\d{4})(\d{2})$")
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"notifications_p{month:%Y%m}"
+
+
+def list_partitions(db: Session) -> list[tuple[str, date]]:
+    """Return [(partition_name, month_start)] for monthly partitions, oldest first."""
+    rows = db.execute(text(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'notifications'
+        """
+    )).scalars().all()
+    result = []
+    for name in rows:
+        m = _PARTITION_RE.match(name)
+        if m:
+            result.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(result, key=lambda x: x[1])
+
+
+def ensure_partitions(db: Session, today: date, ahead: int) -> list[str]:
+    existing = {name for name, _ in list_partitions(db)}
+    created = []
+    month = _month_start(today)
+    for i in range(ahead + 1):
+        m = _add_months(month, i)
+        name = _partition_name(m)
+        if name in existing:
+            continue
+        # Fails if notifications_default already holds rows for that month; skip it then
+        try:
+            with db.begin_nested():
+                db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF notifications FOR VALUES FROM ('{m.isoformat()}') TO ('{_add_months(m, 1).isoformat()}')"
+                ))
+            created.append(name)
+        except Exception as e:  # pragma: no cover - depends on DB state
+            logger.warning("partition %s not created: %s", name, e.__class__.__name__)
+    return created
+
+
+def purge_expired(db: Session, now: datetime, retention_days: int, mode: str = "drop") -> list[str]:
+    """Detach and drop/archive partitions whose whole range is older than the cutoff."""
+    if retention_days <= 0:
+        return []
+    cutoff = (now - timedelta(days=retention_days)).date()
+    purged = []
+    for name, month in list_partitions(db):
+        if _add_months(month, 1) > cutoff:
+            break
+        db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+        # Unread rows are kept (routed to notifications_default now that the range is detached)
+        db.execute(text(
+            f"INSERT INTO notifications (id, user_email, type, message, created_at, read) "
+            f"SELECT id, user_email, type, message, created_at, read FROM {name} WHERE read = false"
+        ))
+        if mode == "archive":
+            db.execute(text(f"ALTER TABLE {name} RENAME TO notifications_archive_{month:%Y%m}"))
+        else:
+            db.execute(text(f"DROP TABLE {name}"))
+        purged.append(name)
+    return purged
+
+
+def run_retention(now: datetime | None = None) -> dict:
+    """One retention pass (blocking; run it off the event loop)."""
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    error: BaseException | None = None
+    db = SessionLocal()
+    try:
+        locked = db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": RETENTION_LOCK_KEY}).scalar()
+        if not locked:
+            db.rollback()
+            return {"skipped": True}
+        created = ensure_partitions(db, now.date(), settings.notification_partitions_ahead)
+        purged = purge_expired(db, now, settings.notification_retention_days, settings.notification_retention_mode)
+        db.commit()
+        if created or purged:
+            logger.info("notifications retention: created=%s purged=%s", created, purged)
+        return {"created": created, "purged": purged}
+    except Exception as e:
+        error = e
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        record_run("notification_retention", now, (time.perf_counter() - started) * 1000, error)
+
+
+async def retention_loop():
+    await asyncio.sleep(10)
+    while True:
+        try:
+            await asyncio.to_thread(run_retention)
+        except Exception as e:
+            logger.warning("notifications retention failed: %s", e)
+        await asyncio.sleep(max(1, settings.notification_retention_interval_minutes) * 60)
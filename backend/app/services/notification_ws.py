@@ -1,53 +1,328 @@
 from __future__ import annotations
-from typing import Dict, Set
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Coroutine, Dict, Optional, Set
 from fastapi import WebSocket
-import json
 import asyncio
+import time
+
+from app.core.config import settings
+from app.services.ws_encoding import DEFAULT_ENCODING, FrameCache, normalize_encoding
+
+# Close code for sockets evicted by the per-user cap / reaped by the heartbeat
+CLOSE_TOO_MANY_CONNECTIONS = 4429
+CLOSE_IDLE_TIMEOUT = 4408
+
+
+@dataclass
+class _SocketState:
+    email: str
+    encoding: str = DEFAULT_ENCODING
+    opened_at: float = field(default_factory=time.monotonic)
+    last_seen: float = field(default_factory=time.monotonic)
+
+
+class StreamSubscriber:
+    """Queue-backed subscriber for non-WebSocket transports (SSE).
+
+    Receives the same events as the user's sockets, filtered by topic:
+    "notifications" (everything addressed to the user) and "seats" (flight_seats broadcasts).
+    A consumer that falls QUEUE_SIZE events behind is marked overflowed and should be
+    disconnected; it resumes from the notifications table via Last-Event-ID.
+    """
+    QUEUE_SIZE = 256
+    TOPICS = ("notifications", "seats")
+
+    def __init__(self, email: str, topics: Set[str]) -> None:
+        self.email = email
+        self.topics = topics
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, payload: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+def event_topic(payload: dict) -> str:
+    return "seats" if payload.get("type") == "flight_seats" else "notifications"
+
+
+class _WsMetrics:
+    """Cheap in-process counters for the admin metrics endpoint."""
+    WINDOW_SECONDS = 60
+
+    def __init__(self) -> None:
+        self.sent_total = 0
+        self.send_errors = 0
+        self.reaped_total = 0
+        self.evicted_total = 0
+        self.pending_pushes = 0
+        self.max_pending_pushes = 0
+        self._rate: deque[list[int]] = deque(maxlen=self.WINDOW_SECONDS)  # [second, count]
+        self._latencies: deque[float] = deque(maxlen=1000)
+
+    def record_send(self, latency: float) -> None:
+        self.sent_total += 1
+        sec = int(time.monotonic())
+        if self._rate and self._rate[-1][0] == sec:
+            self._rate[-1][1] += 1
+        else:
+            self._rate.append([sec, 1])
+        self._latencies.append(latency)
+
+    def snapshot(self) -> dict:
+        now = int(time.monotonic())
+        recent = sum(c for s, c in self._rate if s > now - self.WINDOW_SECONDS)
+        lat = sorted(self._latencies)
+
+        def pct(p: float) -> float:
+            if not lat:
+                return 0.0
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 3)
+
+        return {
+            "messages_total": self.sent_total,
+            "messages_per_second": round(recent / self.WINDOW_SECONDS, 3),
+            "send_errors": self.send_errors,
+            "reaped_total": self.reaped_total,
+            "evicted_total": self.evicted_total,
+            "pending_pushes": self.pending_pushes,
+            "max_pending_pushes": self.max_pending_pushes,
+            "send_latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(lat)},
+        }
+
 
 class NotificationConnectionManager:
     """Manager of WebSocket connections per user email.
     We keep a set of active WebSockets for each user.
+
+    A single heartbeat task pings every socket each WS_PING_INTERVAL_SECONDS; a socket
+    that hasn't sent anything (pong or other message) for interval + WS_PING_TIMEOUT_SECONDS
+    is considered half-open and reaped.
     """
     def __init__(self) -> None:
         self._user_sockets: Dict[str, Set[WebSocket]] = {}
+        self._state: Dict[WebSocket, _SocketState] = {}
+        self._user_streams: Dict[str, Set[StreamSubscriber]] = {}
         self._lock = asyncio.Lock()
+        # Event loop serving the sockets; sync (threadpool) routes schedule pushes onto it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.metrics = _WsMetrics()
+
+    def dispatch(self, coro: Coroutine) -> None:
+        """Fire & forget a push coroutine from async code or from a sync route/thread.
 
-    async def connect(self, email: str, websocket: WebSocket):
+        Plain asyncio.create_task() raises RuntimeError inside FastAPI's threadpool,
+        so from there we hand the coroutine to the loop that owns the sockets.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None:
+            running.create_task(self._tracked(coro))
+        elif self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._tracked(coro), self._loop)
+        else:
+            coro.close()  # nobody connected yet -> nothing to deliver
+
+    async def _tracked(self, coro: Coroutine):
+        m = self.metrics
+        m.pending_pushes += 1
+        m.max_pending_pushes = max(m.max_pending_pushes, m.pending_pushes)
+        try:
+            await coro
+        finally:
+            m.pending_pushes -= 1
+
+    async def connect(self, email: str, websocket: WebSocket, encoding: str = DEFAULT_ENCODING):
         await websocket.accept()
+        self._loop = asyncio.get_running_loop()
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        evicted: list[WebSocket] = []
         async with self._lock:
             if email not in self._user_sockets:
                 self._user_sockets[email] = set()
-            self._user_sockets[email].add(websocket)
+            conns = self._user_sockets[email]
+            conns.add(websocket)
+            self._state[websocket] = _SocketState(email, normalize_encoding(encoding))
+            # Per-user cap: drop the oldest connections (stale tabs) first
+            cap = max(1, settings.ws_max_connections_per_user)
+            if len(conns) > cap:
+                by_age = sorted(conns, key=lambda w: self._state[w].opened_at)
+                evicted = by_age[: len(conns) - cap]
+        for ws in evicted:
+            self.metrics.evicted_total += 1
+            await self._close(email, ws, CLOSE_TOO_MANY_CONNECTIONS)
 
     async def disconnect(self, email: str, websocket: WebSocket):
         async with self._lock:
+            self._state.pop(websocket, None)
             conns = self._user_sockets.get(email)
             if conns and websocket in conns:
                 conns.remove(websocket)
                 if not conns:
                     self._user_sockets.pop(email, None)
 
+    def set_encoding(self, websocket: WebSocket, encoding: str) -> str:
+        """Switch the socket's frame encoding (client "hello" message). Returns the effective one."""
+        enc = normalize_encoding(encoding)
+        st = self._state.get(websocket)
+        if st:
+            st.encoding = enc
+        return enc
+
+    def subscribe(self, email: str, topics: Set[str]) -> StreamSubscriber:
+        """Register a stream (SSE) subscriber; must run on the event loop."""
+        self._loop = asyncio.get_running_loop()
+        sub = StreamSubscriber(email, topics)
+        self._user_streams.setdefault(email, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: StreamSubscriber) -> None:
+        subs = self._user_streams.get(sub.email)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                self._user_streams.pop(sub.email, None)
+
+    def _publish_user(self, email: str, payload: dict) -> None:
+        topic = event_topic(payload)
+        for sub in self._user_streams.get(email, ()):
+            if topic in sub.topics:
+                sub.offer(payload)
+
+    def touch(self, websocket: WebSocket) -> None:
+        """Mark the socket alive (call on every received message, including pongs)."""
+        st = self._state.get(websocket)
+        if st:
+            st.last_seen = time.monotonic()
+
+    async def _close(self, email: str, websocket: WebSocket, code: int):
+        await self.disconnect(email, websocket)
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def _send(self, email: str, ws: WebSocket, frames: FrameCache) -> bool:
+        st = self._state.get(ws)
+        frame = frames.get(st.encoding if st else DEFAULT_ENCODING)
+        started = time.perf_counter()
+        try:
+            if isinstance(frame, bytes):
+                await ws.send_bytes(frame)
+            else:
+                await ws.send_text(frame)
+        except Exception:
+            self.metrics.send_errors += 1
+            # Silently remove the problematic connection
+            await self.disconnect(email, ws)
+            return False
+        self.metrics.record_send(time.perf_counter() - started)
+        return True
+
     async def send_to_user(self, email: str, payload: dict):
-        # Send to every open tab/session of the user
-        message = json.dumps(payload, ensure_ascii=False)
+        # Send to every open tab/session of the user (each encoding produced once)
+        self._publish_user(email, payload)
+        frames = FrameCache(payload)
         async with self._lock:
             conns = list(self._user_sockets.get(email, []))
         for ws in conns:
-            try:
-                await ws.send_text(message)
-            except Exception:
-                # Silently remove the problematic connection
-                await self.disconnect(email, ws)
+            await self._send(email, ws, frames)
+
+    async def send_direct(self, email: str, websocket: WebSocket, payload: dict):
+        """Send to one specific socket in its negotiated encoding (replay, acks)."""
+        await self._send(email, websocket, FrameCache(payload))
+
+    async def send_many(self, items: list[tuple[str, dict]], concurrency: int = 64):
+        """Deliver many per-user payloads (bulk fan-out) with bounded concurrency.
+
+        Only users with open sockets cost anything; frames for one user keep their order.
+        """
+        for email, payload in items:
+            self._publish_user(email, payload)
+        async with self._lock:
+            online = {email for email, _ in items if email in self._user_sockets}
+        by_user: Dict[str, list[FrameCache]] = {}
+        for email, payload in items:
+            if email in online:
+                by_user.setdefault(email, []).append(FrameCache(payload))
+        if not by_user:
+            return
+        sem = asyncio.Semaphore(concurrency)
+
+        async def _deliver(email: str, messages: list[FrameCache]):
+            async with sem:
+                async with self._lock:
+                    conns = list(self._user_sockets.get(email, []))
+                for message in messages:
+                    for ws in conns:
+                        await self._send(email, ws, message)
+
+        await asyncio.gather(*(_deliver(e, msgs) for e, msgs in by_user.items()))
 
     async def broadcast(self, payload: dict):
-        message = json.dumps(payload, ensure_ascii=False)
+        # One encoded frame per encoding in use, shared by every socket
+        topic = event_topic(payload)
+        for subs in self._user_streams.values():
+            for sub in subs:
+                if topic in sub.topics:
+                    sub.offer(payload)
+        frames = FrameCache(payload)
         async with self._lock:
-            all_conns = [ws for conns in self._user_sockets.values() for ws in conns]
-        for ws in all_conns:
+            all_conns = [(email, ws) for email, conns in self._user_sockets.items() for ws in conns]
+        for email, ws in all_conns:
+            await self._send(email, ws, frames)
+
+    async def _heartbeat(self):
+        while True:
+            interval = max(1, settings.ws_ping_interval_seconds)
+            await asyncio.sleep(interval)
             try:
-                await ws.send_text(message)
+                await self.ping_and_reap(interval + max(1, settings.ws_ping_timeout_seconds))
             except Exception:
-                # Ignore — it will be cleaned up on the next cycle
                 pass
 
+    async def ping_and_reap(self, max_silence: float):
+        now = time.monotonic()
+        async with self._lock:
+            states = [(ws, st.email, st.last_seen) for ws, st in self._state.items()]
+        ping = FrameCache({"type": "ping", "ts": int(time.time())})
+        for ws, email, last_seen in states:
+            if now - last_seen > max_silence:
+                self.metrics.reaped_total += 1
+                await self._close(email, ws, CLOSE_IDLE_TIMEOUT)
+            else:
+                await self._send(email, ws, ping)
+
+    def snapshot(self) -> dict:
+        users = len(self._user_sockets)
+        connections = sum(len(c) for c in self._user_sockets.values())
+        return {
+            "connections": connections,
+            "users": users,
+            "streams": sum(len(s) for s in self._user_streams.values()),
+            "stream_queue_depth": max((sub.queue.qsize() for subs in self._user_streams.values() for sub in subs), default=0),
+            "busiest_user_connections": max((len(c) for c in self._user_sockets.values()), default=0),
+            **self.metrics.snapshot(),
+        }
+
+def notification_frame(n) -> dict:
+    """WS frame for a persisted Notification row (id doubles as the client's resume token)."""
+    return {"type": "notification", "data": {
+        "id": n.id,
+        "type": n.type,
+        "message": n.message,
+        "created_at": n.created_at.isoformat() if n.created_at else None,
+        "read": n.read,
+    }}
+
 manager = NotificationConnectionManager()
@@ -0,0 +1,121 @@
+"""Password hashing off the request threadpool.
+
+argon2 is CPU-bound (tens of ms per call); run inline in sync routes, a login spike
+would take every threadpool slot and search / purchase requests would queue behind it.
+Hashing runs in a small process pool (PASSWORD_HASH_WORKERS) awaited from async routes;
+at most PASSWORD_HASH_QUEUE_MAX calls may be running or queued per process, beyond
+that callers get HashingBusy (the auth routes answer 503 + Retry-After).
+
+verify() also returns a new hash when pwd_context.needs_update() says the stored one uses
+old parameters / a deprecated scheme, so the login route can store it (rehash-on-login).
+
+PASSWORD_HASH_WORKERS=0 hashes in the threadpool instead (tests, tiny deployments).
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+import asyncio
+import multiprocessing
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.security import get_password_hash, pwd_context
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full (or the pool just died); retry shortly."""
+
+
+def _verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    # runs in a worker process
+    try:
+        return pwd_context.verify_and_update(plain, hashed)
+    except (ValueError, TypeError):
+        # unknown / malformed hash -> treat as a wrong password
+        return False, None
+
+
+def _noop() -> None:
+    return None
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_inflight = 0  # touched only from the event loop thread
+_stats = {"completed": 0, "rejected": 0, "max_inflight": 0, "pool_restarts": 0}
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that already runs threads (threadpool, DB pool) is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def check_capacity() -> None:
+    """Raise HashingBusy if a hash call would be rejected now; lets routes fail fast
+    before they touch the DB (the cap is enforced again when the call is submitted)."""
+    if _inflight >= max(1, settings.password_hash_queue_max):
+        _stats["rejected"] += 1
+        raise HashingBusy()
+
+
+async def _submit(fn: Callable[..., Any], *args: Any) -> Any:
+    global _executor, _inflight
+    check_capacity()
+    _inflight += 1
+    _stats["max_inflight"] = max(_stats["max_inflight"], _inflight)
+    try:
+        if settings.password_hash_workers <= 0:
+            result = await run_in_threadpool(fn, *args)
+        else:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(_pool(), fn, *args)
+            except BrokenProcessPool:
+                # a worker was killed (OOM etc.): start a fresh pool for the next caller
+                _executor = None
+                _stats["pool_restarts"] += 1
+                raise HashingBusy()
+        _stats["completed"] += 1
+        return result
+    finally:
+        _inflight -= 1
+
+
+async def verify(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(password ok, replacement hash or None)."""
+    return await _submit(_verify_and_update, plain, hashed)
+
+
+async def hash_password(plain: str) -> str:
+    return await _submit(get_password_hash, plain)
+
+
+async def start() -> None:
+    """Spawn the workers up front so the first logins don't pay for process start-up."""
+    if settings.password_hash_workers <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    pool = _pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, _noop) for _ in range(settings.password_hash_workers)))
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def snapshot() -> dict:
+    return {
+        "workers": settings.password_hash_workers,
+        "queue_max": settings.password_hash_queue_max,
+        "inflight": _inflight,
+        **_stats,
+    }
@@ -1,106 +1,286 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, insert, text
 from app.db.session import SessionLocal
 from app.models.flight import Flight
 from app.models.ticket import Ticket
 from app.models.ticket_reminder import TicketReminder
 from app.models.notification import Notification
-from app.services.notification_ws import manager as ws_manager
+from app.services.notification_ws import manager as ws_manager, notification_frame
+from app.services.notification_counters import bump_unread, push_unread
+from app.services.jobs import record_run
+from app.services.metrics import Histogram
+from app.core.config import settings
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import heapq
+import threading
+import time
 
 STANDARD_HOURS = [24, 2]
-SCAN_INTERVAL_SECONDS = 60
-LOOKAHEAD_HOURS = 26
-MAX_BATCH = 200
-
-async def _send_notification(email: str, message: str):
-    try:
-        await ws_manager.send_to_user(email, {"type": "notification", "data": {"type": "reminder", "message": message, "created_at": datetime.utcnow().isoformat()}})
-    except Exception:
-        pass
-
-def _create_notification(db: Session, email: str, message: str):
-    n = Notification(user_email=email, type="reminder", message=message)
-    db.add(n)
-
-def _process_standard(db: Session, now: datetime):
-    window_start = now
-    window_end = now + timedelta(hours=LOOKAHEAD_HOURS)
-    flights = db.query(Flight).filter(Flight.departure >= window_start, Flight.departure <= window_end).all()
-    if not flights:
-        return []
-    flight_map = {f.id: f for f in flights}
-    flight_ids = list(flight_map.keys())
-    tickets = db.query(Ticket).filter(Ticket.flight_id.in_(flight_ids), Ticket.status == "paid").all()
-    if not tickets:
-        return []
-    existing = db.query(TicketReminder).filter(TicketReminder.ticket_id.in_([t.id for t in tickets]), TicketReminder.type == "standard").all()
-    existing_map = {(r.ticket_id, r.hours_before): r for r in existing}
-    created = []
-    for t in tickets:
-        f = flight_map.get(t.flight_id)
-        if not f:
-            continue
-        for h in STANDARD_HOURS:
-            sched_at = f.departure - timedelta(hours=h)
-            if sched_at <= now:
-                continue
-            key = (t.id, h)
-            if key in existing_map:
-                continue
-            r = TicketReminder(ticket_id=t.id, user_email=t.user_email, hours_before=h, type="standard", scheduled_at=sched_at)
-            db.add(r)
-            existing_map[key] = r
-            created.append(r)
-            if len(created) >= MAX_BATCH:
-                break
-        if len(created) >= MAX_BATCH:
-            break
-    return created
-
-def _fire_due(db: Session, now: datetime):
-    due = db.query(TicketReminder).filter(and_(TicketReminder.sent == False, TicketReminder.scheduled_at <= now)).limit(MAX_BATCH).all()  # noqa: E712
+# Due times are loaded for REMINDER_MAX_SLEEP_SECONDS ahead; the window is reloaded when it
+# ends, which bounds how late a reminder created in another worker (whose notify() only
+# reaches its own process) can fire.
+LOAD_LIMIT = 1000
+
+# fire time - scheduled_at, seconds
+reminder_lag = Histogram([1, 5, 15, 30, 60, 300, 900, 3600])
+_stats = {"fired_total": 0, "drains": 0, "budget_exhausted": 0, "last_drain_fired": 0, "last_drain_ms": 0.0}
+
+def create_standard_reminders(db: Session, tickets: list[Ticket], departure: datetime, now: datetime) -> datetime | None:
+    """Insert the standard 24h/2h reminders for freshly bought tickets (caller's transaction).
+
+    Tickets must be flushed (ids assigned). Returns the earliest scheduled_at, to wake the scheduler.
+    """
+    rows = [
+        {"ticket_id": t.id, "user_email": t.user_email, "hours_before": h, "type": "standard",
+         "scheduled_at": departure - timedelta(hours=h), "sent": False, "created_at": now}
+        for t in tickets
+        for h in STANDARD_HOURS
+        if departure - timedelta(hours=h) > now
+    ]
+    if not rows:
+        return None
+    db.execute(insert(TicketReminder), rows)
+    return min(r["scheduled_at"] for r in rows)
+
+
+_RESCHEDULE_SQL = text(
+    """
+    UPDATE ticket_reminders r
+    SET scheduled_at = f.departure - r.hours_before * interval '1 hour',
+        -- moved later -> remind again; already in the past -> skip (the update notification covers it)
+        sent = (f.departure - r.hours_before * interval '1 hour') <= :now
+    FROM tickets t JOIN flights f ON f.id = t.flight_id
+    WHERE t.id = r.ticket_id AND t.flight_id = ANY(:fids) AND t.status = 'paid'
+      AND r.scheduled_at <> f.departure - r.hours_before * interval '1 hour'
+    RETURNING r.scheduled_at, r.sent
+    """
+)
+
+
+def reschedule_flight_reminders(db: Session, flight_id: int, now: datetime) -> datetime | None:
+    """Re-derive scheduled_at from the flight's (changed) departure for all its reminders.
+
+    Runs in the caller's transaction after the new departure is flushed. Returns the earliest
+    pending scheduled_at.
+    """
+    return reschedule_reminders(db, [flight_id], now)
+
+
+def reschedule_reminders(db: Session, flight_ids: list[int], now: datetime) -> datetime | None:
+    """Set-based variant of reschedule_flight_reminders for many flights (one UPDATE)."""
+    if not flight_ids:
+        return None
+    rows = db.execute(_RESCHEDULE_SQL, {"fids": list(flight_ids), "now": now}).all()
+    pending = [r.scheduled_at for r in rows if not r.sent]
+    return min(pending) if pending else None
+
+def _fire_due(db: Session, now: datetime, limit: int):
+    """Fire one batch of due reminders: claim (SKIP LOCKED), bulk insert the notifications,
+    mark the reminders sent with one UPDATE. Returns the inserted notification rows."""
+    due = (
+        db.query(
+            TicketReminder.id, TicketReminder.user_email, TicketReminder.hours_before, TicketReminder.scheduled_at,
+            Flight.flight_number, Flight.origin, Flight.destination, Flight.departure,
+        )
+        .join(Ticket, Ticket.id == TicketReminder.ticket_id)
+        .join(Flight, Flight.id == Ticket.flight_id)
+        .filter(and_(TicketReminder.sent == False, TicketReminder.scheduled_at <= now))  # noqa: E712
+        .order_by(TicketReminder.scheduled_at.asc())
+        .limit(limit)
+        # a concurrent runner (e.g. during leader failover) skips claimed rows instead of double-firing
+        .with_for_update(skip_locked=True, of=TicketReminder)
+        .all()
+    )
     if not due:
         return []
-    ticket_ids = {r.ticket_id for r in due}
-    tickets = {t.id: t for t in db.query(Ticket).filter(Ticket.id.in_(ticket_ids)).all()}
-    flight_ids = {t.flight_id for t in tickets.values()}
-    flights = {f.id: f for f in db.query(Flight).filter(Flight.id.in_(flight_ids)).all()}
-    fired = []
+    fired_at = datetime.utcnow()
+    values = []
     for r in due:
-        t = tickets.get(r.ticket_id)
-        if not t:
-            continue
-        f = flights.get(t.flight_id)
-        if not f:
-            continue
-        hours = r.hours_before
-        message = f"Reminder: Flight {f.flight_number} {f.origin}->{f.destination} departs at {f.departure.isoformat()} (in ~{hours}h)."
-        _create_notification(db, r.user_email, message)
-        r.sent = True
-        fired.append((r, message))
-    return fired
+        message = f"Reminder: Flight {r.flight_number} {r.origin}->{r.destination} departs at {r.departure.isoformat()} (in ~{r.hours_before}h)."
+        values.append({"user_email": r.user_email, "type": "reminder", "message": message, "created_at": fired_at, "read": False})
+        reminder_lag.observe(max(0.0, (fired_at - r.scheduled_at).total_seconds()))
+    rows = db.execute(
+        insert(Notification).returning(
+            Notification.id, Notification.user_email, Notification.type,
+            Notification.message, Notification.created_at, Notification.read,
+            sort_by_parameter_order=True,
+        ),
+        values,
+    ).all()
+    db.execute(
+        text("UPDATE ticket_reminders SET sent = true WHERE id = ANY(:ids)"),
+        {"ids": [r.id for r in due]},
+    )
+    return rows
 
-async def reminder_loop():
-    await asyncio.sleep(3)
-    while True:
-        now = datetime.utcnow()
+class ReminderScheduler:
+    """Deadline-driven reminder loop.
+
+    Keeps a min-heap of upcoming TicketReminder.scheduled_at values (loaded for
+    REMINDER_MAX_SLEEP_SECONDS ahead) and sleeps exactly until the earliest one or the end
+    of the window. notify() wakes it early when a new, earlier reminder appears in this
+    process (custom reminder set, purchase, flight rescheduled); reminders created in other
+    workers are picked up by the next window reload. Standard reminders are created by the
+    purchase itself (create_standard_reminders), there is no periodic scan.
+
+    All blocking DB work (tick) runs on a dedicated single worker thread so the event
+    loop (WebSockets, async endpoints) never waits on the scans; heap state is shared
+    with the loop thread under self._lock.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[datetime] = []
+        self._window_end: datetime | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    # --- signals (thread-safe: called from sync routes after commit) ---
+    def notify(self, scheduled_at: datetime) -> None:
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+        loop.call_soon_threadsafe(self._on_signal, scheduled_at)
+
+    def _on_signal(self, scheduled_at: datetime) -> None:
+        with self._lock:
+            if self._window_end is None or scheduled_at < self._window_end:
+                heapq.heappush(self._heap, scheduled_at)
+        if self._wake is not None:
+            self._wake.set()
+
+    # --- deadlines ---
+    def _load_window(self, db: Session, now: datetime) -> None:
+        window_end = now + timedelta(seconds=max(1, settings.reminder_max_sleep_seconds))
+        rows = (
+            db.query(TicketReminder.scheduled_at)
+            .filter(TicketReminder.sent == False, TicketReminder.scheduled_at < window_end)  # noqa: E712
+            .order_by(TicketReminder.scheduled_at.asc())
+            .limit(LOAD_LIMIT)
+            .all()
+        )
+        with self._lock:
+            # keep deadlines signalled while we were loading
+            heap = [r.scheduled_at for r in rows] + [d for d in self._heap if d > now]
+            heapq.heapify(heap)
+            self._heap = heap
+            # Truncated load: the window ends where our knowledge ends
+            self._window_end = rows[-1].scheduled_at if len(rows) >= LOAD_LIMIT else window_end
+
+    def next_wakeup(self) -> datetime:
+        with self._lock:
+            assert self._window_end is not None
+            if self._heap and self._heap[0] < self._window_end:
+                return self._heap[0]
+            return self._window_end
+
+    def _pop_due(self, now: datetime) -> None:
+        with self._lock:
+            while self._heap and self._heap[0] <= now:
+                heapq.heappop(self._heap)
+
+    def tick(self, now: datetime) -> list[tuple[str, dict]]:
+        """One pass of DB work: fire what's due, reload the window if needed.
+        Returns (email, WS frame) to push."""
+        with self._lock:
+            reload = self._window_end is None or now >= self._window_end
+            due = bool(self._heap) and self._heap[0] <= now
+        started = time.perf_counter()
+        error: BaseException | None = None
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            _process_standard(db, now)
-            fired = _fire_due(db, now)
-            db.commit()
-            for r, msg in fired:
-                await _send_notification(r.user_email, msg)
-        except Exception:
-            try:
-                db.rollback()
-            except Exception:
-                pass
+            frames: list[tuple[str, dict]] = []
+            backlog = False
+            if reload or due:
+                # Drain in batches until the queue is empty or the time budget is spent
+                batch = max(1, settings.reminder_batch_size)
+                budget = max(0, settings.reminder_drain_budget_ms) / 1000.0
+                fired_count = 0
+                while True:
+                    rows = _fire_due(db, now, batch)
+                    deltas: dict[str, int] = {}
+                    for n in rows:
+                        deltas[n.user_email] = deltas.get(n.user_email, 0) + 1
+                    unread = bump_unread(db, deltas)
+                    db.commit()
+                    push_unread(unread, deltas)
+                    frames.extend((n.user_email, notification_frame(n)) for n in rows)
+                    fired_count += len(rows)
+                    if len(rows) < batch:
+                        break
+                    if time.perf_counter() - started >= budget:
+                        backlog = True
+                        break
+                _stats["drains"] += 1
+                _stats["fired_total"] += fired_count
+                _stats["last_drain_fired"] = fired_count
+                _stats["last_drain_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                if backlog:
+                    _stats["budget_exhausted"] += 1
+            if reload:
+                self._load_window(db, now)
+            else:
+                self._pop_due(now)
+            if backlog:
+                with self._lock:
+                    heapq.heappush(self._heap, now)  # continue right after pushing these frames
+            return frames
+        except Exception as e:
+            error = e
+            db.rollback()
+            # retry soon instead of spinning
+            with self._lock:
+                self._window_end = now + timedelta(seconds=30)
+            raise
         finally:
-            try:
-                db.close()
-            except Exception:
-                pass
-        await asyncio.sleep(SCAN_INTERVAL_SECONDS)
+            db.close()
+            record_run("reminders", now, (time.perf_counter() - started) * 1000, error)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reminders")
+        try:
+            while True:
+                now = datetime.utcnow()
+                try:
+                    frames = await self._loop.run_in_executor(self._executor, self.tick, now)
+                    if frames:
+                        await ws_manager.send_many(frames)
+                except Exception:
+                    pass
+                # clear first: signals arriving from here on set the event again
+                self._wake.clear()
+                delay = max(0.0, (self.next_wakeup() - datetime.utcnow()).total_seconds())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # JobRunner cancels / restarts this task on leadership changes and crashes;
+            # let the worker finish a running tick and exit instead of leaking it
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+scheduler = ReminderScheduler()
+
+
+def notify_reminder_scheduled(scheduled_at: datetime | None) -> None:
+    """Wake the scheduler early: a reminder due at `scheduled_at` was inserted/rescheduled
+    (call after commit)."""
+    if scheduled_at is not None:
+        scheduler.notify(scheduled_at)
+
+
+async def reminder_loop():
+    await asyncio.sleep(3)
+    await scheduler.run()
+
+
+def snapshot() -> dict:
+    return {"lag_seconds": reminder_lag.snapshot(), **_stats,
+            "batch_size": settings.reminder_batch_size, "budget_ms": settings.reminder_drain_budget_ms}
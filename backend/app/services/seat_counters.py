@@ -0,0 +1,77 @@
+"""Consistency check / repair for the denormalized flights.seats_sold counter.
+
+seats_sold is maintained atomically by the purchase (create_ticket), cancel
+(cancel_ticket) and refund (flight cancellation) paths; this recomputes it from
+paid tickets:
+    python -m app.services.seat_counters check
+    python -m app.services.seat_counters repair
+"""
+from __future__ import annotations
+import argparse
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+_PAID = "SELECT flight_id, count(*) AS cnt FROM tickets WHERE status = 'paid' GROUP BY flight_id"
+
+_CHECK = text(
+    f"""
+    SELECT f.id, f.seats_sold, COALESCE(t.cnt, 0) AS actual
+    FROM flights f LEFT JOIN ({_PAID}) t ON t.flight_id = f.id
+    WHERE f.seats_sold <> COALESCE(t.cnt, 0)
+    ORDER BY f.id
+    """
+)
+
+_REPAIR = text(
+    f"""
+    UPDATE flights f SET seats_sold = x.actual
+    FROM (
+        SELECT f2.id, COALESCE(t.cnt, 0) AS actual
+        FROM flights f2 LEFT JOIN ({_PAID}) t ON t.flight_id = f2.id
+        WHERE f2.seats_sold <> COALESCE(t.cnt, 0)
+    ) x
+    WHERE x.id = f.id
+    RETURNING f.id
+    """
+)
+
+
+def check(db: Session) -> list[dict]:
+    """Flights whose seats_sold differs from their paid tickets count."""
+    return [dict(r) for r in db.execute(_CHECK).mappings()]
+
+
+def repair(db: Session) -> int:
+    """Fix every drifted counter (caller commits). Returns the number of flights updated."""
+    return len(db.execute(_REPAIR).all())
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.seat_counters")
+    parser.add_argument("cmd", choices=["check", "repair"])
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+    db = SessionLocal()
+    try:
+        if args.cmd == "check":
+            drift = check(db)
+            for d in drift[:50]:
+                print(f"[seat_counters] flight {d['id']}: seats_sold={d['seats_sold']} actual={d['actual']}")
+            print(f"[seat_counters] {len(drift)} flight(s) out of sync")
+            if drift:
+                raise SystemExit(1)
+        else:
+            fixed = repair(db)
+            db.commit()
+            print(f"[seat_counters] repaired {fixed} flight(s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
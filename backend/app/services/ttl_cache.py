@@ -0,0 +1,46 @@
+"""Small in-process TTL cache with single-flight loading.
+
+Concurrent callers asking for the same missing/expired key wait for one loader call
+instead of each hitting the database (sync routes run in the threadpool, hence
+threading locks).
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl = ttl_seconds
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _fresh(self, key: Hashable):
+        hit = self._data.get(key)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit
+        return None
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        hit = self._fresh(key)
+        if hit is not None:
+            return hit[1]
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # another caller may have refreshed it while we waited
+            hit = self._fresh(key)
+            if hit is not None:
+                return hit[1]
+            value = loader()
+            if self.ttl > 0:
+                self._data[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
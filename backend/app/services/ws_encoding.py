@@ -0,0 +1,73 @@
+"""WebSocket payload encodings negotiated per socket.
+
+  json     - text frames, json.dumps (default, what browsers get unless they ask otherwise)
+  deflate  - binary frames: raw DEFLATE (wbits=-15) of the JSON text; decode in the browser
+             with DecompressionStream('deflate-raw')
+  msgpack  - binary frames: MessagePack with short keys (see SHORT_KEYS) for the hot
+             flight_seats / notification / unread_count events
+
+Clients pick one with ?encoding=... on the WS URL or with a first message
+{"type": "hello", "encoding": "..."}. Callers encode a payload once per encoding
+(FrameCache) and reuse the frame for every socket.
+"""
+from __future__ import annotations
+from typing import Any
+import json
+import zlib
+
+import msgpack
+
+ENCODINGS = ("json", "deflate", "msgpack")
+DEFAULT_ENCODING = "json"
+
+SHORT_KEYS = {
+    "type": "t",
+    "data": "d",
+    "flight_id": "f",
+    "seats_available": "s",
+    "id": "i",
+    "message": "m",
+    "created_at": "c",
+    "read": "r",
+    "unread": "u",
+    "delta": "x",
+}
+
+
+def normalize_encoding(value: str | None) -> str:
+    v = (value or "").strip().lower()
+    return v if v in ENCODINGS else DEFAULT_ENCODING
+
+
+def shorten_keys(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {SHORT_KEYS.get(k, k): shorten_keys(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [shorten_keys(v) for v in obj]
+    return obj
+
+
+def encode(payload: dict, encoding: str) -> str | bytes:
+    if encoding == "msgpack":
+        # datetimes, Decimals etc. -> same representation json.dumps(default=str) would give
+        return msgpack.packb(shorten_keys(payload), use_bin_type=True, default=str)
+    text = json.dumps(payload, ensure_ascii=False)
+    if encoding == "deflate":
+        c = zlib.compressobj(6, zlib.DEFLATED, -15)
+        return c.compress(text.encode("utf-8")) + c.flush()
+    return text
+
+
+class FrameCache:
+    """Encode a payload lazily, at most once per encoding (shared by all sockets of a send)."""
+    __slots__ = ("payload", "_frames")
+
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+        self._frames: dict[str, str | bytes] = {}
+
+    def get(self, encoding: str) -> str | bytes:
+        frame = self._frames.get(encoding)
+        if frame is None:
+            frame = self._frames[encoding] = encode(self.payload, encoding)
+        return frame
@@ -0,0 +1,46 @@
+from datetime import date, datetime
+
+from app.services import daily_metrics
+
+
+class _Db:
+    def __init__(self):
+        self.calls = []
+
+    def flush(self):
+        self.calls.append(("flush", None))
+
+    def execute(self, stmt, params=None):
+        self.calls.append((str(stmt), params))
+
+
+def test_purchase_and_refund_deltas_keyed_by_purchase_day():
+    db = _Db()
+    bought = datetime(2030, 5, 1, 23, 59)
+    daily_metrics.record_purchase(db, 7, bought, 2, 300.0)
+    daily_metrics.record_refund(db, 7, bought, 150.0)
+    (_, p1), (_, p2) = db.calls
+    assert p1 == {"day": date(2030, 5, 1), "company_id": 7, "passengers": 2, "revenue": 300.0,
+                  "flights": 0, "capacity": 0, "refunds": 0}
+    assert p2["day"] == date(2030, 5, 1)
+    assert (p2["passengers"], p2["revenue"], p2["refunds"]) == (-1, -150.0, 1)
+
+
+def test_flight_without_company_goes_to_bucket_zero_and_flushes_first():
+    db = _Db()
+    daily_metrics.record_purchase(db, None, datetime(2030, 1, 1), 1, 10.0)
+    assert db.calls[0][1]["company_id"] == 0
+
+    db = _Db()
+    daily_metrics.record_flight(db, 42, -1)
+    assert db.calls[0] == ("flush", None)
+    sql, params = db.calls[1]
+    assert "FROM flights WHERE id = :fid" in sql and params == {"fid": 42, "sign": -1}
+
+
+def test_stats_ranges_are_whole_days_including_today():
+    now = datetime(2026, 10, 19, 15, 30)
+    assert daily_metrics.stats_range("today", now) == (datetime(2026, 10, 19), datetime(2026, 10, 20))
+    assert daily_metrics.stats_range("week", now) == (datetime(2026, 10, 13), datetime(2026, 10, 20))
+    assert daily_metrics.stats_range("month", now) == (datetime(2026, 9, 20), datetime(2026, 10, 20))
+    assert daily_metrics.stats_range("all", now) == (None, None)
@@ -0,0 +1,46 @@
+import io
+import zipfile
+from decimal import Decimal
+
+from app.services.exports import stream_csv, stream_xlsx
+
+
+def test_stream_is_a_valid_xlsx_zip():
+    rows = [["confirmation_id", "price_paid"]] + [[f"F{i:07d}", Decimal("10.50")] for i in range(5000)]
+    rows.append(["<tag> & \x01ctrl", None])
+    data = b"".join(stream_xlsx(iter(rows), "Passengers"))
+    zf = zipfile.ZipFile(io.BytesIO(data))
+    assert zf.testzip() is None
+    assert set(zf.namelist()) == {
+        "[Content_Types].xml", "_rels/.rels", "xl/workbook.xml",
+        "xl/_rels/workbook.xml.rels", "xl/worksheets/sheet1.xml",
+    }
+    sheet = zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    assert sheet.count("<row>") == 5002
+    assert "<c><v>10.50</v></c>" in sheet
+    assert "&lt;tag&gt; &amp; ctrl" in sheet
+    assert 'name="Passengers"' in zf.read("xl/workbook.xml").decode("utf-8")
+
+
+def test_rows_are_consumed_lazily():
+    consumed = []
+
+    def rows():
+        for i in range(3):
+            consumed.append(i)
+            yield [i]
+
+    it = stream_xlsx(rows())
+    next(it)  # first local header goes out before any row is read
+    assert consumed == []
+    b"".join(it)
+    assert consumed == [0, 1, 2]
+
+
+def test_stream_csv_chunks_with_bom():
+    rows = [["a", "b"]] + [[i, None] for i in range(1200)]
+    chunks = list(stream_csv(rows, chunk_rows=500))
+    assert chunks[0] == "\ufeff".encode("utf-8")
+    assert len(chunks) == 1 + 3  # 1201 rows -> 500 + 500 + 201
+    text = b"".join(chunks).decode("utf-8-sig")
+    assert text.splitlines()[:2] == ["a,b", "0,"]
@@ -0,0 +1,82 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import flight_bulk
+from app.services.flight_bulk import BulkError, parse_filter, parse_op
+
+
+def test_parse_requires_filter_and_op():
+    with pytest.raises(BulkError, match="filter"):
+        parse_filter({})
+    with pytest.raises(BulkError, match="nothing to change"):
+        parse_op({})
+    with pytest.raises(BulkError, match="either"):
+        parse_op({"price": 10, "price_scale": 1.1})
+    with pytest.raises(BulkError, match="seats_total"):
+        parse_op({"seats_total": 0})
+    assert len(parse_filter({"origin": "ALA", "departure_from": "2026-11-01", "departure_to": "2026-11-30"})) == 3
+    assert parse_op({"price_scale": "1.1", "shift_minutes": 30}).describe() == "price: x1.1, departure/arrival shifted by +30 min"
+
+
+def test_update_sql_enforces_rules_in_where():
+    sql = flight_bulk._update_sql(parse_op({"seats_total": 100, "shift_minutes": -60}))
+    assert "seats_sold <= :seats_total" in sql
+    assert "> :now" in sql
+    assert "seats_available = GREATEST(:seats_total - seats_sold, 0)" in sql
+    assert "seats_sold <= :seats_total" not in flight_bulk._update_sql(parse_op({"price": 5}))
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def mappings(self):
+        return self
+
+
+class _Db:
+    def __init__(self, locked, updated):
+        self.results = [locked, updated]
+        self.upserts = []
+
+    def execute(self, stmt, params=None):
+        if self.results:
+            return _Result(self.results.pop(0))
+        self.upserts.append(params)
+
+
+def test_apply_reports_skipped_and_moves_rollup():
+    now = datetime(2026, 10, 1)
+    locked = [SimpleNamespace(id=1, departure=datetime(2026, 11, 1, 23), seats_sold=5),
+              SimpleNamespace(id=2, departure=datetime(2026, 11, 2), seats_sold=150)]
+    updated = [{"id": 1, "company_id": 7, "flight_number": "KC1", "departure": datetime(2026, 11, 2, 1),
+                "seats_total": 100, "seats_available": 95,
+                "old_departure": datetime(2026, 11, 1, 23), "old_seats_total": 180}]
+    db = _Db(locked, updated)
+    result = flight_bulk.apply(db, [], parse_op({"seats_total": 100, "shift_minutes": 120}), [7], now)
+    assert result["matched"] == 2 and result["updated"] == [1]
+    assert result["skipped"] == [{"id": 2, "reason": "seats_total cannot be less than already sold seats"}]
+    (rows,) = db.upserts
+    assert [(r["day"], r["company_id"], r["flights"], r["capacity"]) for r in rows] == [
+        (date(2026, 11, 1), 7, -1, -180), (date(2026, 11, 2), 7, 1, 100)]
+
+
+def test_apply_skips_prices_out_of_column_range():
+    now = datetime(2026, 10, 1)
+    locked = [SimpleNamespace(id=1, departure=datetime(2026, 11, 1), price=100, seats_sold=5),
+              SimpleNamespace(id=2, departure=datetime(2026, 11, 2), price=2_000_000, seats_sold=0),
+              SimpleNamespace(id=3, departure=datetime(2026, 11, 3), price=900_000, seats_sold=50_000)]
+    op = parse_op({"price_scale": 100})
+    assert "price * CAST(:price_scale AS numeric), 2) < :max_price" in flight_bulk._update_sql(op)
+    db = _Db(locked, [{"id": 1, "company_id": 7, "flight_number": "KC1", "departure": locked[0].departure,
+                       "seats_total": 100, "seats_available": 95,
+                       "old_departure": locked[0].departure, "old_seats_total": 100}])
+    result = flight_bulk.apply(db, [], op, [7], now)
+    assert result["updated"] == [1]
+    assert result["skipped"] == [{"id": 2, "reason": "new price out of range"},
+                                 {"id": 3, "reason": "new price out of range"}]
@@ -0,0 +1,78 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from app.services import flight_import
+from app.services.flight_import import RowError, expand_schedule, iter_file_rows, validate_row
+
+ROW = {
+    "airline": "Aero", "flight_number": "AE100", "origin": "ALA", "destination": "NQZ",
+    "departure": "2026-11-01T08:15:00", "arrival": "2026-11-01T09:50:00",
+    "price": "120.5", "seats_total": "180",
+}
+
+
+def test_validate_row_defaults_and_errors():
+    values = validate_row(ROW)
+    assert values[4] == datetime(2026, 11, 1, 8, 15)
+    assert values[6:] == (120.5, 180, 180, 0)
+    assert validate_row({**ROW, "departure": "2026-11-01T08:15:00+05:00"})[4] == datetime(2026, 11, 1, 3, 15)
+    with pytest.raises(RowError, match="arrival"):
+        validate_row({**ROW, "arrival": "2026-11-01T08:00:00"})
+    with pytest.raises(RowError, match="seats_available"):
+        validate_row({**ROW, "seats_available": "200"})
+    with pytest.raises(RowError, match="airline"):
+        validate_row({**ROW, "airline": " "})
+
+
+def test_iter_file_rows_reports_line_numbers():
+    csv_data = "airline,flight_number\nAero,AE1\nAero,AE2\n".encode()
+    assert [n for n, _ in iter_file_rows(io.BytesIO(csv_data), "csv")] == [2, 3]
+    nd = b'{"airline": "Aero"}\n\nnot json\n[1]\n'
+    rows = list(iter_file_rows(io.BytesIO(nd), "ndjson"))
+    assert rows[0] == (1, {"airline": "Aero"})
+    assert [(n, type(r)) for n, r in rows[1:]] == [(3, RowError), (4, RowError)]
+
+
+def test_expand_schedule_weekdays():
+    spec = {**ROW, "start_date": "2026-11-02", "days": 14, "departure_time": "08:15",
+            "duration_minutes": 95, "weekdays": [0, 4]}  # 2026-11-02 is a Monday
+    rows = list(expand_schedule(spec))
+    assert [r["departure"].day for r in rows] == [2, 6, 9, 13]
+    assert rows[0]["arrival"] == datetime(2026, 11, 2, 9, 50)
+    with pytest.raises(RowError, match="days"):
+        list(expand_schedule({**spec, "days": 5000}))
+
+
+def test_report_caps_errors(monkeypatch):
+    monkeypatch.setattr(flight_import, "MAX_REPORTED_ERRORS", 2)
+    report = flight_import.ImportReport()
+    for line in range(5):
+        report.reject(line, "bad")
+    assert report.as_dict()["rejected"] == 5
+    assert len(report.errors) == 2 and report.as_dict()["errors_truncated"]
+
+
+def test_iter_file_rows_undecodable_and_malformed_rows_are_row_errors():
+    csv_data = (
+        "﻿airline,flight_number\n".encode()
+        + "Аэро,AE1\n".encode("cp1251")
+        + b"Aero,AE2\n"
+        + b"Aero," + b"x" * 200_000 + b"\n"  # over csv.field_size_limit()
+        + b"Aero,AE4\n"
+    )
+    rows = list(iter_file_rows(io.BytesIO(csv_data), "csv"))
+    assert [(n, type(r)) for n, r in rows] == [(2, RowError), (3, dict), (4, RowError), (5, dict)]
+    assert "UTF-8" in str(rows[0][1])
+    assert rows[3][1] == {"airline": "Aero", "flight_number": "AE4"}
+
+    nd = b'{"airline": "Aero"}\n' + '{"airline": "Аэро"}\n'.encode("cp1251")
+    assert [type(r) for _, r in iter_file_rows(io.BytesIO(nd), "ndjson")] == [dict, RowError]
+
+
+def test_iter_file_rows_unreadable_csv_header():
+    from app.services.flight_import import ImportFileError
+
+    with pytest.raises(ImportFileError, match="UTF-8"):
+        list(iter_file_rows(io.BytesIO("авиакомпания,рейс\n".encode("cp1251")), "csv"))
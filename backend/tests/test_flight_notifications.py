@@ -0,0 +1,55 @@
+from app.services.flight_notifications import format_template
+
+
+def test_format_template_escapes_literal_percent():
+    t = format_template("Your flight X1 was updated: price: 10% off", "%2$s")
+    assert t == "Your flight X1 was updated: price: 10%% off%2$s"
+
+
+class _Result:
+    def __init__(self, row=None, rows=()):
+        self.row, self.rows = row, list(rows)
+
+    def first(self):
+        return self.row
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class _Db:
+    def __init__(self, claimed):
+        self.claimed = claimed
+        self.statements = []
+
+    def flush(self):
+        pass
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.statements.append(sql)
+        if sql.startswith("UPDATE flights SET cancelled_at"):
+            return _Result(row=self.claimed)
+        if "INSERT INTO notifications" in sql:
+            return _Result(rows=[{"id": 1, "user_email": "a@x", "tickets": 2}])
+        return _Result()
+
+
+def test_cancel_flight_is_constant_statements_and_idempotent():
+    from datetime import datetime
+    from types import SimpleNamespace
+    from app.services.flight_notifications import cancel_flight
+
+    db = _Db(claimed=None)
+    assert cancel_flight(db, 5, datetime(2030, 1, 1)) is None
+    assert len(db.statements) == 1
+
+    db = _Db(claimed=SimpleNamespace(flight_number="KC1"))
+    rows = cancel_flight(db, 5, datetime(2030, 1, 1))
+    assert rows == [{"id": 1, "user_email": "a@x", "tickets": 2}]
+    assert len(db.statements) == 5
+    assert "UPDATE tickets SET status = 'refunded'" in db.statements[3]
+    assert db.statements[4].startswith("DELETE FROM ticket_reminders")
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.services.jobs import JobRunner
+
+
+def test_leader_only_jobs_follow_leadership():
+    async def scenario():
+        started: list[str] = []
+
+        def factory(name):
+            async def job():
+                started.append(name)
+                await asyncio.sleep(3600)
+            return job
+
+        r = JobRunner()
+        r.register("reminders", factory("reminders"))
+        r.register("lag", factory("lag"), leader_only=False)
+
+        r._supervise(False)  # follower: only per-process jobs
+        await asyncio.sleep(0)
+        assert started == ["lag"]
+
+        r._supervise(True)  # took over leadership
+        await asyncio.sleep(0)
+        assert sorted(started) == ["lag", "reminders"]
+        snap = {j["name"]: j["running"] for j in r.snapshot()["jobs"]}
+        assert snap == {"reminders": True, "lag": True}
+
+        r._supervise(False)  # lost the lock -> leader-only job stopped
+        await asyncio.sleep(0)
+        snap = {j["name"]: j["running"] for j in r.snapshot()["jobs"]}
+        assert snap == {"reminders": False, "lag": True}
+        for j in r._jobs.values():
+            if j.task:
+                j.task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_crashed_job_is_restarted():
+    async def scenario():
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            await asyncio.sleep(3600)
+
+        r = JobRunner()
+        r.register("flaky", flaky)
+        r._supervise(True)
+        await asyncio.sleep(0)
+        r._supervise(True)
+        await asyncio.sleep(0)
+        assert len(calls) == 2
+        r._jobs["flaky"].task.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import time
+
+from app.api.deps import Principal
+from app.services import manager_scope
+
+
+def _principal(company_ids, age=0.0):
+    return Principal("m@example.com", ["company_manager"], company_ids, time.time() - age)
+
+
+def test_fresh_claim_is_trusted_without_db(monkeypatch):
+    def load(db, email):
+        raise AssertionError("unexpected company_managers lookup")
+
+    monkeypatch.setattr(manager_scope, "load_company_ids", load)
+    manager_scope.invalidate_all()
+    time.sleep(0.01)
+    assert manager_scope.manager_company_ids(None, _principal([3, 5])) == [3, 5]
+
+
+def test_stale_or_invalidated_claim_falls_back_to_cache(monkeypatch):
+    calls = []
+
+    def load(db, email):
+        calls.append(email)
+        return [7]
+
+    monkeypatch.setattr(manager_scope, "load_company_ids", load)
+    manager_scope.invalidate_all()
+    old = _principal([3], age=10_000)
+    assert manager_scope.manager_company_ids(None, old) == [7]
+    assert manager_scope.manager_company_ids(None, old) == [7]
+    assert calls == ["m@example.com"]
+
+    fresh = _principal([3], age=1)
+    manager_scope.invalidate("m@example.com")  # mapping changed after the token was issued
+    assert manager_scope.manager_company_ids(None, fresh) == [7]
+    assert len(calls) == 2
@@ -0,0 +1,11 @@
+from app.services.metrics import Histogram
+
+
+def test_histogram_buckets_and_stats():
+    h = Histogram([10, 100])
+    for v in (1, 10, 50, 1000):
+        h.observe(v)
+    snap = h.snapshot()
+    assert snap["buckets"] == {"<=10": 2, "<=100": 1, ">100": 1}
+    assert snap["count"] == 4
+    assert snap["max"] == 1000
@@ -0,0 +1,18 @@
+from datetime import date, datetime
+
+from app.services.notification_retention import _add_months, _partition_name, purge_expired
+
+
+def test_add_months_wraps_year():
+    assert _add_months(date(2025, 11, 1), 1) == date(2025, 12, 1)
+    assert _add_months(date(2025, 12, 1), 1) == date(2026, 1, 1)
+    assert _add_months(date(2025, 1, 1), 14) == date(2026, 3, 1)
+
+
+def test_partition_name():
+    assert _partition_name(date(2025, 3, 1)) == "notifications_p202503"
+
+
+def test_purge_disabled_when_retention_zero():
+    # No DB access when retention is disabled
+    assert purge_expired(None, datetime(2025, 1, 1), 0) == []  # type: ignore[arg-type]
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+from app.core.config import settings
+from app.services.notification_ws import NotificationConnectionManager, CLOSE_IDLE_TIMEOUT, CLOSE_TOO_MANY_CONNECTIONS
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent: list[str] = []
+        self.closed_code: int | None = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.closed_code = code
+
+
+def test_per_user_cap_evicts_oldest(monkeypatch):
+    monkeypatch.setattr(settings, "ws_max_connections_per_user", 2)
+
+    async def scenario():
+        m = NotificationConnectionManager()
+        a, b, c = FakeSocket(), FakeSocket(), FakeSocket()
+        for ws in (a, b, c):
+            await m.connect("u@example.com", ws)
+        return m, a, b, c
+
+    m, a, b, c = asyncio.run(scenario())
+    assert a.closed_code == CLOSE_TOO_MANY_CONNECTIONS
+    assert b.closed_code is None and c.closed_code is None
+    assert m.snapshot()["connections"] == 2
+
+
+def test_ping_and_reap():
+    async def scenario():
+        m = NotificationConnectionManager()
+        alive, dead = FakeSocket(), FakeSocket()
+        await m.connect("a@example.com", alive)
+        await m.connect("b@example.com", dead)
+        m._state[dead].last_seen -= 100
+        await m.ping_and_reap(max_silence=30)
+        return m, alive, dead
+
+    m, alive, dead = asyncio.run(scenario())
+    assert dead.closed_code == CLOSE_IDLE_TIMEOUT
+    assert json.loads(alive.sent[-1])["type"] == "ping"
+    snap = m.snapshot()
+    assert snap["connections"] == 1
+    assert snap["reaped_total"] == 1
+    assert snap["messages_total"] == 1
+
+
+def test_send_many_skips_offline_users_and_keeps_order():
+    async def scenario():
+        m = NotificationConnectionManager()
+        ws = FakeSocket()
+        await m.connect("on@example.com", ws)
+        await m.send_many([
+            ("on@example.com", {"type": "notification", "data": {"id": 1}}),
+            ("off@example.com", {"type": "notification", "data": {"id": 2}}),
+            ("on@example.com", {"type": "unread_count", "data": {"unread": 3}}),
+        ])
+        return ws
+
+    ws = asyncio.run(scenario())
+    assert [json.loads(x)["type"] for x in ws.sent] == ["notification", "unread_count"]
+
+
+def test_broadcast_encodes_once_per_encoding(monkeypatch):
+    import app.services.ws_encoding as enc
+    calls: list[str] = []
+    real_encode = enc.encode
+
+    def counting_encode(payload, encoding):
+        calls.append(encoding)
+        return real_encode(payload, encoding)
+
+    monkeypatch.setattr(enc, "encode", counting_encode)
+
+    class BinSocket(FakeSocket):
+        async def send_bytes(self, data: bytes):
+            self.sent.append(data)  # type: ignore[arg-type]
+
+    async def scenario():
+        m = NotificationConnectionManager()
+        sockets = [BinSocket() for _ in range(6)]
+        for i, ws in enumerate(sockets):
+            await m.connect(f"u{i}@example.com", ws, ["json", "msgpack", "deflate"][i % 3])
+        await m.broadcast({"type": "flight_seats", "data": {"flight_id": 7, "seats_available": 3}})
+        return sockets
+
+    sockets = asyncio.run(scenario())
+    assert sorted(calls) == ["deflate", "json", "msgpack"]
+    assert isinstance(sockets[0].sent[0], str)
+    assert isinstance(sockets[1].sent[0], bytes)
+
+
+def test_stream_subscribers_follow_topics():
+    async def scenario():
+        m = NotificationConnectionManager()
+        seats_only = m.subscribe("a@example.com", {"seats"})
+        both = m.subscribe("a@example.com", {"notifications", "seats"})
+        await m.send_to_user("a@example.com", {"type": "notification", "data": {"id": 1}})
+        await m.broadcast({"type": "flight_seats", "data": {"flight_id": 1, "seats_available": 0}})
+        snap = m.snapshot()
+        m.unsubscribe(seats_only)
+        m.unsubscribe(both)
+        return seats_only, both, snap, m.snapshot()
+
+    seats_only, both, snap, after = asyncio.run(scenario())
+    assert seats_only.queue.qsize() == 1
+    assert both.queue.qsize() == 2
+    assert snap["streams"] == 2 and after["streams"] == 0
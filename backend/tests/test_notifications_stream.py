@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_stream_requires_token():
+    r = client.get("/notifications/stream")
+    assert r.status_code == 401
+
+
+def test_sse_event_format():
+    from app.api.routes.notifications import _sse_event
+    frame = _sse_event({"type": "notification", "data": {"id": 42, "message": "hi"}})
+    assert frame == 'id: 42\nevent: notification\ndata: {"id": 42, "message": "hi"}\n\n'
+    seats = _sse_event({"type": "flight_seats", "data": {"flight_id": 1, "seats_available": 2}})
+    assert seats.startswith("event: flight_seats\n")
@@ -0,0 +1,18 @@
+from sqlalchemy.dialects import postgresql
+
+from app.api.routes.company import _MANIFEST_COLUMNS, _manifest_stmt
+
+
+def _sql(stmt):
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    return str(compiled), compiled.params
+
+
+def test_manifest_orders_and_searches_on_c_collation():
+    sql, params = _sql(_manifest_stmt(7, None, *_MANIFEST_COLUMNS))
+    assert 'ORDER BY tickets.confirmation_id COLLATE "C"' in sql
+    assert "LIKE" not in sql
+
+    sql, params = _sql(_manifest_stmt(7, " fa_1% ", *_MANIFEST_COLUMNS))
+    assert "ESCAPE '/'" in sql
+    assert sorted(v for k, v in params.items() if k.startswith("param")) == ["FA/_1/%%", "fa/_1/%%"]
@@ -0,0 +1,80 @@
+import asyncio
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.services import password_hashing
+
+
+def test_verify_in_pool_and_rehash_of_deprecated_scheme(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_workers", 1)
+    old = CryptContext(schemes=["bcrypt"]).hash("secret")
+
+    async def run():
+        try:
+            ok, new_hash = await password_hashing.verify("secret", old)
+            bad = await password_hashing.verify("nope", old)
+            return ok, new_hash, bad
+        finally:
+            password_hashing.shutdown()
+
+    ok, new_hash, bad = asyncio.run(run())
+    assert ok and new_hash.startswith("$argon2")
+    assert bad == (False, None)
+
+
+def test_queue_cap_rejects_with_busy(monkeypatch):
+    monkeypatch.setattr(settings, "password_hash_workers", 0)
+    monkeypatch.setattr(settings, "password_hash_queue_max", 2)
+
+    async def run():
+        calls = [password_hashing.hash_password(f"pw{i}") for i in range(4)]
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, password_hashing.HashingBusy) for r in results) == 2
+    assert all(r.startswith("$argon2") for r in results if isinstance(r, str))
+    assert password_hashing.snapshot()["inflight"] == 0
+
+
+def test_login_releases_db_before_hashing_and_fails_fast_when_full(monkeypatch):
+    from types import SimpleNamespace
+
+    import pytest
+    from fastapi import HTTPException
+
+    from app.api.routes import auth
+
+    events = []
+
+    class _Query:
+        def filter(self, *a):
+            return self
+
+        def first(self):
+            events.append("query")
+            return SimpleNamespace(id=1, role="user", is_active=True, hashed_password="h")
+
+    class _Db:
+        def query(self, *a):
+            return _Query()
+
+        def rollback(self):
+            events.append("rollback")
+
+    async def fake_verify(plain, hashed):
+        events.append("verify")
+        return False, None
+
+    monkeypatch.setattr(password_hashing, "verify", fake_verify)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(auth._login(_Db(), "a@x.io", "pw"))
+    assert e.value.status_code == 401
+    assert events == ["query", "rollback", "verify"]
+
+    events.clear()
+    monkeypatch.setattr(settings, "password_hash_queue_max", 1)
+    monkeypatch.setattr(password_hashing, "_inflight", 1)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(auth._login(_Db(), "a@x.io", "pw"))
+    assert e.value.status_code == 503 and events == []
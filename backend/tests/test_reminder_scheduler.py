@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+
+from app.services.reminder_scheduler import ReminderScheduler, create_standard_reminders
+
+
+def test_signal_brings_next_wakeup_forward():
+    s = ReminderScheduler()
+    now = datetime(2030, 1, 1, 12, 0)
+    s._window_end = now + timedelta(minutes=10)
+    s._heap = [now + timedelta(minutes=5)]
+    assert s.next_wakeup() == now + timedelta(minutes=5)
+
+    s._on_signal(now + timedelta(minutes=1))
+    assert s.next_wakeup() == now + timedelta(minutes=1)
+
+    # Beyond the loaded window: picked up on the next window reload instead
+    s._on_signal(now + timedelta(hours=3))
+    assert s.next_wakeup() == now + timedelta(minutes=1)
+
+
+def test_pop_due_keeps_future_deadlines():
+    s = ReminderScheduler()
+    now = datetime(2030, 1, 1, 12, 0)
+    s._window_end = now + timedelta(minutes=10)
+    for m in (3, -1, 0, 7):
+        s._on_signal(now + timedelta(minutes=m))
+    s._pop_due(now)
+    assert s.next_wakeup() == now + timedelta(minutes=3)
+
+
+def test_standard_reminders_skip_past_deadlines():
+    class _Db:
+        def __init__(self):
+            self.rows = None
+
+        def execute(self, stmt, rows):
+            self.rows = rows
+
+    class _T:
+        def __init__(self, id):
+            self.id = id
+            self.user_email = "a@x.io"
+
+    now = datetime(2030, 1, 1, 12, 0)
+    db = _Db()
+    first = create_standard_reminders(db, [_T(1), _T(2)], now + timedelta(hours=5), now)
+    # 24h-before is already past -> only the 2h reminder, one per ticket
+    assert [(r["ticket_id"], r["hours_before"]) for r in db.rows] == [(1, 2), (2, 2)]
+    assert first == now + timedelta(hours=3)
+
+    db = _Db()
+    assert create_standard_reminders(db, [_T(1)], now + timedelta(hours=1), now) is None
+    assert db.rows is None
+
+
+class _Session:
+    commits = 0
+
+    def commit(self):
+        _Session.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _patch_drain(monkeypatch, batches):
+    from types import SimpleNamespace
+    from app.services import reminder_scheduler as rs
+
+    calls = []
+
+    def fake_fire(db, now, limit):
+        calls.append(limit)
+        n = batches.pop(0) if batches else 0
+        return [SimpleNamespace(id=i, user_email=f"u{i % 3}@x.io", type="reminder", message="m",
+                                created_at=now, read=False) for i in range(n)]
+
+    monkeypatch.setattr(rs, "SessionLocal", _Session)
+    monkeypatch.setattr(rs, "_fire_due", fake_fire)
+    monkeypatch.setattr(rs, "bump_unread", lambda db, deltas: {})
+    monkeypatch.setattr(rs, "push_unread", lambda values, deltas: None)
+    monkeypatch.setattr(rs, "record_run", lambda *a, **k: None)
+    return calls
+
+
+def test_tick_drains_until_queue_empty(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "reminder_batch_size", 10)
+    monkeypatch.setattr(settings, "reminder_drain_budget_ms", 60_000)
+    calls = _patch_drain(monkeypatch, [10, 10, 4])
+    s = ReminderScheduler()
+    now = datetime(2030, 1, 1, 12, 0)
+    s._window_end = now + timedelta(minutes=10)
+    s._heap = [now - timedelta(seconds=1)]
+    frames = s.tick(now)
+    assert calls == [10, 10, 10]
+    assert len(frames) == 24
+    assert s._heap == []
+
+
+def test_tick_budget_exhausted_reschedules_immediately(monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "reminder_batch_size", 5)
+    monkeypatch.setattr(settings, "reminder_drain_budget_ms", 0)
+    calls = _patch_drain(monkeypatch, [5, 5, 5])
+    s = ReminderScheduler()
+    now = datetime(2030, 1, 1, 12, 0)
+    s._window_end = now + timedelta(minutes=10)
+    s._heap = [now]
+    frames = s.tick(now)
+    assert calls == [5]  # one batch, then yield
+    assert len(frames) == 5
+    assert s.next_wakeup() == now
+
+
+def test_load_window_bounded_by_max_sleep(monkeypatch):
+    from app.core.config import settings
+
+    class _Query:
+        def __getattr__(self, name):
+            return lambda *a, **k: self
+
+        def all(self):
+            return []
+
+    class _Db:
+        def query(self, *a):
+            return _Query()
+
+    monkeypatch.setattr(settings, "reminder_max_sleep_seconds", 60)
+    s = ReminderScheduler()
+    now = datetime(2030, 1, 1, 12, 0)
+    s._load_window(_Db(), now)
+    # reminders created by other workers are seen at the latest one reload later
+    assert s.next_wakeup() == now + timedelta(seconds=60)
+
+
+def test_run_shuts_down_executor_when_cancelled(monkeypatch):
+    import asyncio
+    from app.services import reminder_scheduler as rs
+
+    monkeypatch.setattr(rs.ReminderScheduler, "tick", lambda self, now: [])
+    s = ReminderScheduler()
+    s._window_end = datetime.utcnow() + timedelta(hours=1)
+
+    async def cycle():
+        task = asyncio.create_task(s.run())
+        await asyncio.sleep(0.05)
+        executor = s._executor
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return executor
+
+    executor = asyncio.run(cycle())
+    assert executor._shutdown
+    assert s._executor is None
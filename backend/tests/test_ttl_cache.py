@@ -0,0 +1,35 @@
+import threading
+import time
+
+from app.services.ttl_cache import TTLCache
+
+
+def test_single_flight_and_expiry():
+    cache = TTLCache(0.2)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"v": len(calls)}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("all", loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert all(r == {"v": 1} for r in results)
+
+    time.sleep(0.25)
+    assert cache.get_or_load("all", loader) == {"v": 2}
+    cache.invalidate("all")
+    assert cache.get_or_load("all", loader) == {"v": 3}
+
+
+def test_zero_ttl_disables_caching():
+    cache = TTLCache(0)
+    n = iter(range(10))
+    assert cache.get_or_load("k", lambda: next(n)) == 0
+    assert cache.get_or_load("k", lambda: next(n)) == 1
@@ -0,0 +1,32 @@
+import json
+import zlib
+
+import msgpack
+
+from app.services.ws_encoding import encode, normalize_encoding, shorten_keys
+
+
+def test_normalize_encoding_defaults_to_json():
+    assert normalize_encoding(None) == "json"
+    assert normalize_encoding("MsgPack") == "msgpack"
+    assert normalize_encoding("gzip") == "json"
+
+
+def test_msgpack_frame_uses_short_keys():
+    from datetime import datetime
+
+    payload = {"type": "notification", "data": {"id": 1, "created_at": datetime(2030, 1, 1), "read": False}}
+    frame = encode(payload, "msgpack")
+    assert isinstance(frame, bytes)
+    assert msgpack.unpackb(frame) == {"t": "notification", "d": {"i": 1, "c": "2030-01-01 00:00:00", "r": False}}
+
+
+def test_short_keys_for_seat_updates():
+    payload = {"type": "flight_seats", "data": {"flight_id": 7, "seats_available": 3}}
+    assert shorten_keys(payload) == {"t": "flight_seats", "d": {"f": 7, "s": 3}}
+
+
+def test_deflate_roundtrip():
+    payload = {"type": "notification", "data": {"message": "Привет"}}
+    frame = encode(payload, "deflate")
+    assert json.loads(zlib.decompress(frame, -15).decode("utf-8")) == payload
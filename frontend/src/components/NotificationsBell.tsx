@@ -25,14 +25,29 @@ export default function NotificationsBell({ onAnyAction }: Props) {
   const containerRef = useRef<HTMLDivElement | null>(null)
   const [markingAll, setMarkingAll] = useState(false)
 
-  const loadList = async () => {
+  // Highest notification id seen so far: since_id for incremental fetches and WS resume token
+  const lastIdRef = useRef(0)
+  const trackIds = (list: NotificationItem[]) => {
+    for (const n of list) if (n.id > lastIdRef.current) lastIdRef.current = n.id
+  }
+
+  const loadList = async (full = false) => {
     setLoading(true)
     setError(null)
     try {
-      const r = await api.get('/notifications/')
-      setItems(r.data || [])
-      const unread = (r.data || []).filter((x: NotificationItem) => !x.read).length
-      setUnreadCount(unread)
+      const incremental = !full && lastIdRef.current > 0
+      const r = await api.get('/notifications/', { params: incremental ? { since_id: lastIdRef.current } : {} })
+      const fresh: NotificationItem[] = r.data || []
+      trackIds(fresh)
+      if (incremental) {
+        setItems(prev => {
+          const known = new Set(prev.map(p => p.id))
+          return [...fresh.filter(n => !known.has(n.id)), ...prev].slice(0, 200)
+        })
+      } else {
+        setItems(fresh)
+        setUnreadCount(fresh.filter(x => !x.read).length)
+      }
     } catch (e: any) {
   setError(extractErrorMessage(e?.response?.data) || 'Load error')
     } finally { setLoading(false) }
@@ -62,7 +77,9 @@ export default function NotificationsBell({ onAnyAction }: Props) {
   const wsBase = apiBase.replace(/^http/, 'ws')
   // Correct endpoint pattern in backend: /ws/notifications (router.websocket("/ws/notifications"))
   const fallback = `${wsBase}/ws/notifications?token=${encodeURIComponent(token)}`
-  const url = explicit ? `${explicit}?token=${encodeURIComponent(token)}` : fallback
+  const baseUrl = explicit ? `${explicit}?token=${encodeURIComponent(token)}` : fallback
+  // Ask the server to replay what we missed while disconnected
+  const url = lastIdRef.current > 0 ? `${baseUrl}&resume=${lastIdRef.current}` : baseUrl
     const ws = new WebSocket(url)
     wsRef.current = ws
     ws.onopen = () => {
@@ -72,12 +89,14 @@ export default function NotificationsBell({ onAnyAction }: Props) {
       try {
         const payload = JSON.parse(ev.data)
         if (payload?.type === 'notification' && payload.data) {
+          const isNew = payload.data.id > lastIdRef.current
+          trackIds([payload.data])
           setItems(prev => {
             // De-duplicate by id
             if (prev.find(p => p.id === payload.data.id)) return prev
             return [payload.data, ...prev].slice(0, 200)
           })
-          if (!payload.data.read) setUnreadCount(c => c + 1)
+          if (isNew && !payload.data.read) setUnreadCount(c => c + 1)
         } else if (payload?.type === 'flight_seats' && payload.data) {
           // Global event for other components
             window.dispatchEvent(new CustomEvent('flight_seats_update', { detail: payload.data }))
@@ -87,10 +106,21 @@ export default function NotificationsBell({ onAnyAction }: Props) {
         } else if (payload?.type === 'notification_mark_all') {
             setItems(prev => prev.map(i => ({ ...i, read: true })))
             setUnreadCount(0)
+        } else if (payload?.type === 'ping') {
+            // Server heartbeat: silent sockets get reaped
+            ws.send(JSON.stringify({ type: 'pong' }))
+        } else if (payload?.type === 'resume' && payload.data?.truncated) {
+            // Too much missed while offline -> full reload
+            loadList(true)
+        } else if (payload?.type === 'unread_count' && payload.data) {
+            // Authoritative server counter (pushed after every change)
+            setUnreadCount(Math.max(0, payload.data.unread || 0))
         }
       } catch { /* ignore */ }
     }
-    ws.onclose = () => {
+    ws.onclose = (ev) => {
+      // 4429: evicted by the per-user connection cap (too many tabs) -> don't fight for the slot
+      if (ev.code === 4429) return
       scheduleReconnect()
     }
     ws.onerror = () => {
@@ -133,10 +163,13 @@ export default function NotificationsBell({ onAnyAction }: Props) {
     } catch {/* ignore */} finally { setMarkingAll(false) }
   }
 
-  // Poll only the unread counter
+  // Poll only the unread counter, and only while WS is down (server pushes unread_count otherwise)
   useEffect(() => {
     loadCount()
-    pollingRef.current = window.setInterval(loadCount, 30000) // 30s
+    pollingRef.current = window.setInterval(() => {
+      if (wsRef.current?.readyState === WebSocket.OPEN) return
+      loadCount()
+    }, 30000) // 30s
     return () => { if (pollingRef.current) window.clearInterval(pollingRef.current) }
   }, [])
 
@@ -172,7 +205,7 @@ export default function NotificationsBell({ onAnyAction }: Props) {
             <strong style={{ fontSize: 14 }}>Notifications</strong>
             <div style={{ marginLeft: 'auto', display: 'flex', gap: 6 }}>
               <button onClick={markAll} disabled={markingAll || unreadCount === 0} className='btn btn-outline' style={{ fontSize: 12, padding:'4px 10px' }}>{markingAll ? '...' : 'Mark all read'}</button>
-              <button onClick={loadList} disabled={loading} className='btn btn-outline' style={{ fontSize: 12, padding:'4px 10px' }}>↻</button>
+              <button onClick={() => loadList(true)} disabled={loading} className='btn btn-outline' style={{ fontSize: 12, padding:'4px 10px' }}>↻</button>
             </div>
           </div>
           {error && <div style={{ color: 'red', padding: '6px 10px' }}>{error}</div>}
@@ -501,9 +501,9 @@ function StatsSection() {
           <button type='button' className='btn btn-outline btn-xs' disabled={loading} onClick={async ()=>{
             try {
               const r = await api.get('/admin/stats/export', { params:{ range, fmt:'xlsx' }, responseType:'blob' })
-              const blob = new Blob([r.data], { type:'application/vnd.ms-excel' })
+              const blob = new Blob([r.data], { type:'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' })
               const url = URL.createObjectURL(blob)
-              const a = document.createElement('a'); a.href=url; a.download=`service_stats_${range}.xml`; a.click(); URL.revokeObjectURL(url)
+              const a = document.createElement('a'); a.href=url; a.download=`service_stats_${range}.xlsx`; a.click(); URL.revokeObjectURL(url)
             } catch {}
           }}>Export Excel</button>
         </div>
@@ -66,6 +66,7 @@ export default function CompanyDashboard() {
   })
   const [passengers, setPassengers] = useState<Record<number, Passenger[]>>({})
   const [loadingPassengers, setLoadingPassengers] = useState<Record<number, boolean>>({})
+  const [passengersNext, setPassengersNext] = useState<Record<number, string | null>>({})
   const [editingId, setEditingId] = useState<number|null>(null)
   const [editForm, setEditForm] = useState<FlightEditForm | null>(null)
   const [savingEdit, setSavingEdit] = useState(false)
@@ -76,7 +77,7 @@ export default function CompanyDashboard() {
   const [companyNames, setCompanyNames] = useState<string[]>([])
   const [isAdmin, setIsAdmin] = useState(false)
   const [isManager, setIsManager] = useState(false)
-  const [flightFilter, setFlightFilter] = useState<'all'|'active'|'completed'>('all')
+  const [flightFilter, setFlightFilter] = useState<'all'|'active'|'completed'|'cancelled'>('all')
   const [adjustingSeats, setAdjustingSeats] = useState<Record<number, boolean>>({})
   const [page, setPage] = useState(1)
   const [pageSize, setPageSize] = useState(25)
@@ -153,15 +154,14 @@ export default function CompanyDashboard() {
     }
   }
 
-  const togglePassengers = async (fid: number) => {
-    if (passengers[fid]) {
-      setPassengers((prev: Record<number, Passenger[]>) => { const copy = { ...prev }; delete copy[fid]; return copy })
-      return
-    }
+  // Manifest is keyset-paginated: { items, next_after }
+  const loadPassengers = async (fid: number, after?: string) => {
     setLoadingPassengers((prev: Record<number, boolean>) => ({ ...prev, [fid]: true }))
     try {
-      const r = await api.get(`/company/flights/${fid}/passengers`)
-      setPassengers((prev: Record<number, Passenger[]>) => ({ ...prev, [fid]: r.data || [] }))
+      const r = await api.get(`/company/flights/${fid}/passengers`, { params: { limit: 200, after } })
+      const items: Passenger[] = r.data?.items || []
+      setPassengers((prev: Record<number, Passenger[]>) => ({ ...prev, [fid]: after ? [...(prev[fid] || []), ...items] : items }))
+      setPassengersNext((prev: Record<number, string | null>) => ({ ...prev, [fid]: r.data?.next_after ?? null }))
     } catch (e: any) {
   alert(extractErrorMessage(e?.response?.data) || 'Passengers load failed')
     } finally {
@@ -169,6 +169,14 @@ export default function CompanyDashboard() {
     }
   }
 
+  const togglePassengers = async (fid: number) => {
+    if (passengers[fid]) {
+      setPassengers((prev: Record<number, Passenger[]>) => { const copy = { ...prev }; delete copy[fid]; return copy })
+      return
+    }
+    await loadPassengers(fid)
+  }
+
   useEffect(() => { load() }, [page, pageSize, sort, flightFilter])
   useEffect(() => { loadStats() }, [statsRange])
   useEffect(() => { loadCompanyInfo() }, [])
@@ -239,7 +247,7 @@ export default function CompanyDashboard() {
     } finally { setSavingEdit(false) }
   }
   const deleteFlight = async (fid:number) => {
-  if(!confirm('Delete flight? All tickets will be refunded.')) return
+  if(!confirm('Cancel flight? All tickets will be refunded.')) return
   setDeleting((prev: Record<number, boolean>)=>({ ...prev, [fid]: true }))
     try {
       await api.delete(`/company/flights/${fid}`)
@@ -343,7 +351,7 @@ export default function CompanyDashboard() {
       <div className='glass glass-pad anim-fade-up-delayed' style={{ marginBottom:28 }}>
       <h3 style={{ marginTop:0, marginBottom:14 }}>{companyNames.length === 1 ? <span style={{ fontWeight:700 }}>{companyNames[0]} flights</span> : (companyNames.length>1 ? 'Company flights' : 'My flights')}</h3>
   <div style={{ display:'flex', gap:8, flexWrap:'wrap', marginBottom:10, alignItems:'center' }}>
-        {(['all','active','completed'] as const).map(filt => {
+        {(['all','active','completed','cancelled'] as const).map(filt => {
           const active = flightFilter===filt
           return (
             <button key={filt} onClick={()=>{ setFlightFilter(filt); setPage(1) }} className={active? 'btn btn-xs':'btn btn-outline btn-xs'}>{filt}</button>
@@ -431,10 +439,10 @@ export default function CompanyDashboard() {
                 <button type='button' className='btn btn-outline btn-xs' onClick={async ()=>{
                   try {
                     const r = await api.get(`/company/flights/${f.id}/passengers/export`, { params:{ fmt:'xlsx' }, responseType:'blob' })
-                    const blob = new Blob([r.data], { type: 'application/vnd.ms-excel' })
+                    const blob = new Blob([r.data], { type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet' })
                     const url = URL.createObjectURL(blob)
                     const a = document.createElement('a')
-                    a.href = url; a.download = `passengers_f${f.id}.xml`; a.click()
+                    a.href = url; a.download = `passengers_f${f.id}.xlsx`; a.click()
                     URL.revokeObjectURL(url)
                   } catch {}
                 }}>Excel</button>
@@ -449,6 +457,9 @@ export default function CompanyDashboard() {
                 {passengers[f.id].map(p => (
                   <li key={p.confirmation_id}>{p.user_email} — {p.status}</li>
                 ))}
+                {passengersNext[f.id] && (
+                  <li><button type='button' className='btn btn-outline btn-xs' onClick={()=>loadPassengers(f.id, passengersNext[f.id] || undefined)}>More</button></li>
+                )}
               </ul>
             )}
             {editingId===f.id && editForm && (